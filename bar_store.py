@@ -0,0 +1,390 @@
+"""คลังแท่งราคา OHLCV บน disk สำหรับ screener — เก็บเป็น NumPy structured array (.npy) แยกไฟล์ต่อ
+interval/ticker อ่านกลับแบบ memory-map รอบสแกนถัดไปดึงจาก yfinance เฉพาะแท่งที่ใหม่กว่าแท่งล่าสุดที่มี
+แล้ว merge ต่อท้าย (แท่งล่าสุดของรอบก่อนที่ยังไม่ปิดจะถูกแทนด้วยค่าใหม่) แทนการโหลดทั้งเดือนทุก 5 นาที
+
+ใช้งาน:
+    frames = load_bars(tickers, "1d", period="1mo")            # dict ticker -> DataFrame
+    frames = load_bars(tickers, "5m", period="2d", prepost=True)
+
+หลาย timeframe จากข้อมูลฐานชุดเดียว (load_timeframes): ดึงแค่แท่ง 5 นาทีรวม pre/after-market ต่อ ticker
+กับ daily ย้อนยาว (ซึ่งแทบไม่ต้องดึงใหม่) แล้วสร้าง daily ช่วงตลาดปกติ, แท่ง intraday ช่วงปกติ และแท่ง extended
+ด้วยการ resample ในเครื่อง ทุกคน (scan movers, scan gaps, technicals) จึงอ่าน snapshot เดียวกัน"""
+
+import os
+import time
+import threading
+from datetime import time as dtime
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+BAR_STORE_DIR = os.getenv("BAR_STORE_DIR", "cache/bars")
+
+# ticker ที่ยังไม่มีในคลังโหลดย้อนหลังเท่านี้ครั้งแรก (คงที่ต่อ interval ไม่ขึ้นกับ period ที่ผู้เรียกขอ
+# ทุกคนที่อ่าน interval เดียวกันจึงได้ประวัติยาวเท่ากัน) — 5m ของ Yahoo ย้อนได้ไม่เกิน 60 วัน
+INITIAL_PERIOD = {"1d": "1y", "5m": "10d"}
+DEFAULT_INITIAL_PERIOD = "1mo"
+# เก็บย้อนหลังสูงสุดกี่วันต่อ interval (ตัดของเก่าทิ้งตอน merge ไฟล์จะไม่โตไม่สิ้นสุด)
+# แท่งล่าสุดเก่ากว่านี้ = ห่างหายไปนาน โหลดใหม่ทั้งชุดแทนการต่อเพิ่ม
+RETENTION_DAYS = {"1d": 400, "5m": 14}
+DEFAULT_RETENTION_DAYS = 30
+
+MARKET_TZ = "America/New_York"
+COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+BAR_DTYPE = np.dtype([("ts", "i8")] + [(c.lower(), "f8") for c in COLUMNS])
+
+_PERIOD_DAYS = {"d": 1, "wk": 7, "mo": 31, "y": 366}
+
+# ข้อมูลฐานของ load_timeframes
+BASE_INTERVAL = "5m"
+DAILY_INTERVAL = "1d"
+REGULAR_OPEN = dtime(9, 30)
+REGULAR_CLOSE = dtime(16, 0)
+# series ที่อัปเดตไปแล้วภายในกี่วินาทีถือว่าสด ไม่ดึงซ้ำ (scan แล้วตามด้วย technicals ของ ticker เดียวกันในรอบเดียว)
+BAR_FRESH_SECONDS = int(os.getenv("BAR_FRESH_SECONDS", "60"))
+
+# ล็อกเฉพาะช่วง merge+เขียนไฟล์ (download ทำนอกล็อก ให้ scan แบบแบ่ง chunk ดึงหลายก้อนพร้อมกันได้)
+_lock = threading.Lock()
+# yf.download เก็บผลระหว่างดึงไว้ใน global ของ yfinance เรียกพร้อมกันหลาย thread ผลจะปนกัน
+# จึงให้ download ทีละก้อน (ภายในก้อน yfinance ยังดึงหลาย ticker ขนานกันเองด้วย threads=True)
+_download_lock = threading.Lock()
+# (series, ticker) -> time.monotonic() ที่อัปเดตล่าสุดใน process นี้
+_synced = {}
+
+
+def _is_intraday(interval):
+    return interval.endswith("m") or interval.endswith("h")
+
+
+def _series_name(interval, prepost):
+    return f"{interval}_prepost" if prepost else interval
+
+
+def _path(interval, prepost, ticker):
+    return os.path.join(BAR_STORE_DIR, _series_name(interval, prepost), f"{ticker.upper()}.npy")
+
+
+def period_days(period):
+    """แปลง period แบบ yfinance ("6d", "1mo", "1y") เป็นจำนวนวัน"""
+    for suffix in sorted(_PERIOD_DAYS, key=len, reverse=True):
+        if period.endswith(suffix):
+            return int(period[:-len(suffix)]) * _PERIOD_DAYS[suffix]
+    raise ValueError(f"unsupported period: {period}")
+
+
+def _read_array(interval, prepost, ticker):
+    path = _path(interval, prepost, ticker)
+    if not os.path.exists(path):
+        return None
+    try:
+        return np.load(path, mmap_mode="r")
+    except (OSError, ValueError) as e:
+        print(f"⚠️ BarStore: อ่าน {path} ไม่ได้ ({e}) จะโหลดใหม่ทั้งหมด")
+        return None
+
+
+def _write_array(interval, prepost, ticker, arr):
+    path = _path(interval, prepost, ticker)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp.npy"
+    np.save(tmp, arr)
+    os.replace(tmp, path)  # เขียนทับแบบ atomic ไม่ให้ reader เห็นไฟล์ครึ่งๆ
+
+
+def _frame_to_array(df):
+    df = df.dropna(subset=["Close"])
+    index = df.index
+    if index.tz is not None:
+        index = index.tz_convert("UTC").tz_localize(None)
+    arr = np.empty(len(df), dtype=BAR_DTYPE)
+    arr["ts"] = np.asarray(index, dtype="datetime64[ns]").view("i8")  # index อาจเป็นหน่วย us ตาม pandas 2
+    for c in COLUMNS:
+        arr[c.lower()] = df[c].to_numpy(dtype="f8")
+    return arr
+
+
+def _array_to_frame(arr, interval, dtype="float64"):
+    # ส่ง datetime64 ตรงๆ (pd.to_datetime กับ int ที่อ่านจาก memmap ไปทางแปลงแบบ object ช้ามาก)
+    index = pd.DatetimeIndex(np.asarray(arr["ts"]).astype("datetime64[ns]"))
+    if _is_intraday(interval):
+        # ให้หน้าตาเหมือนที่ yf.download คืน (เวลาตลาด New York) โค้ดที่ใช้ .date/.time จะได้ไม่เพี้ยน
+        index = index.tz_localize("UTC").tz_convert(MARKET_TZ)
+    return pd.DataFrame({c: np.asarray(arr[c.lower()], dtype=dtype) for c in COLUMNS}, index=index)
+
+
+def ticker_frame(data, ticker):
+    """ดึง DataFrame ของ ticker เดียวจากผล yf.download (group_by="ticker" อาจได้หรือไม่ได้ MultiIndex)"""
+    if data is None or data.empty:
+        return None
+    if isinstance(data.columns, pd.MultiIndex):
+        if ticker not in data.columns.get_level_values(0):
+            return None
+        data = data[ticker]
+    if not set(COLUMNS).issubset(data.columns):
+        return None
+    return data
+
+
+def _merge(old, new, interval):
+    """ต่อแท่งใหม่ท้ายของเดิม: แท่งเดิมที่เวลา >= แท่งแรกของชุดใหม่ถูกแทนที่ (แท่งที่ยังไม่ปิดของรอบก่อน)"""
+    if old is not None and len(old) and len(new):
+        old = old[old["ts"] < new["ts"][0]]
+        merged = np.concatenate([old, new])
+    elif len(new):
+        merged = new
+    else:
+        merged = np.asarray(old) if old is not None else new
+
+    retention = RETENTION_DAYS.get(interval, DEFAULT_RETENTION_DAYS)
+    if len(merged):
+        cutoff = merged["ts"][-1] - retention * 86400 * 10**9
+        merged = merged[merged["ts"] >= cutoff]
+    return merged
+
+
+def download(tickers, interval, prepost=False, **window):
+    """yf.download แบบ group_by="ticker" ผ่าน _download_lock — ทุกโมดูลที่ดึงจาก yfinance ต้องเรียกผ่านตัวนี้
+    (ดึงพร้อมกับ bar_store จาก thread อื่น เช่น market snapshot ใน webhook ผลจะไม่ปนกัน)"""
+    with _download_lock:
+        return yf.download(tickers=" ".join(tickers), interval=interval, prepost=prepost,
+                           group_by="ticker", threads=True, progress=False, **window)
+
+
+def update_bars(tickers, interval, prepost=False, max_age=0):
+    """ดึงเฉพาะแท่งที่ยังไม่มีในคลัง: ticker ใหม่/ห่างหายเกิน retention โหลดเต็ม INITIAL_PERIOD
+    ที่เหลือโหลดตั้งแต่วันของแท่งล่าสุดที่มี (batch เดียวกันทั้งกลุ่ม) คืนจำนวนแท่งที่ดึงมา
+    max_age > 0: ข้าม ticker ที่ process นี้อัปเดตไปแล้วภายใน max_age วินาที"""
+    series = _series_name(interval, prepost)
+    if max_age:
+        now = time.monotonic()
+        tickers = [t for t in tickers if now - _synced.get((series, t), float("-inf")) >= max_age]
+        if not tickers:
+            return 0
+
+    period = INITIAL_PERIOD.get(interval, DEFAULT_INITIAL_PERIOD)
+    retention = RETENTION_DAYS.get(interval, DEFAULT_RETENTION_DAYS)
+    window_start = pd.Timestamp.now(tz="UTC").tz_localize(None) - pd.Timedelta(days=retention)
+
+    full, incremental = [], {}
+    for ticker in tickers:
+        arr = _read_array(interval, prepost, ticker)
+        if arr is None or not len(arr) or pd.Timestamp(int(arr["ts"][-1])) < window_start:
+            full.append(ticker)
+        else:
+            incremental[ticker] = pd.Timestamp(int(arr["ts"][-1]))
+
+    fetched = 0
+    batches = []
+    if full:
+        batches.append((full, {"period": period}))
+    if incremental:
+        # เริ่มจากวันของแท่งล่าสุด (yfinance รับ start เป็นวัน) — แท่งของวันนั้นที่ซ้ำจะถูกแทนตอน merge
+        start = min(incremental.values()).normalize()
+        if not _is_intraday(interval):
+            start -= pd.Timedelta(days=1)
+        batches.append((list(incremental), {"start": start.strftime("%Y-%m-%d")}))
+
+    for group, window in batches:
+        try:
+            data = download(group, interval, prepost, **window)
+        except Exception as e:
+            print(f"⚠️ BarStore: download {interval} error ({e}) ใช้ข้อมูลเดิมในคลัง")
+            continue
+        for ticker in group:
+            df = ticker_frame(data, ticker)
+            if df is None:
+                continue
+            new = _frame_to_array(df)
+            fetched += len(new)
+            with _lock:
+                _write_array(interval, prepost, ticker,
+                             _merge(_read_array(interval, prepost, ticker), new, interval))
+            _synced[(series, ticker)] = time.monotonic()
+        del data
+
+    print(f"🗄️ BarStore {series}: ดึงใหม่ {fetched} แท่ง "
+          f"(โหลดเต็ม {len(full)} ตัว, ต่อเพิ่ม {len(incremental)} ตัว)")
+    return fetched
+
+
+def read_bars(ticker, interval, prepost=False, period=None, dtype="float64"):
+    """อ่านแท่งของ ticker จากคลัง (ไม่ยิง network) คืน DataFrame ว่างถ้าไม่มี
+    dtype = ชนิดของคอลัมน์ราคา/volume ที่คืน (เช่น "float32" ตอนสแกน universe ใหญ่ ประหยัด memory ครึ่งหนึ่ง)
+    period ตัดให้เหลือเท่าที่ yf.download(period=...) จะคืน: intraday นับเป็นจำนวนวันเทรด ("6d" = 6 session
+    ล่าสุด), daily นับเป็นวันปฏิทินย้อนจากแท่งล่าสุด"""
+    arr = _read_array(interval, prepost, ticker)
+    if arr is None or not len(arr):
+        return pd.DataFrame(columns=COLUMNS)
+
+    if period is None:
+        return _array_to_frame(arr, interval, dtype)
+
+    days = period_days(period)
+    if not _is_intraday(interval):
+        cutoff = arr["ts"][-1] - days * 86400 * 10**9
+        return _array_to_frame(arr[np.searchsorted(arr["ts"], cutoff):], interval, dtype)
+
+    df = _array_to_frame(arr, interval, dtype)
+    dates = df.index.normalize()
+    keep = dates.unique()[-days:]
+    return df[dates >= keep[0]]
+
+
+def load_bars(tickers, interval, period, prepost=False, dtype="float64"):
+    """อัปเดตคลังแบบ incremental แล้วคืน dict ticker -> DataFrame ย้อนหลังเท่ากับ period"""
+    if not tickers:
+        return {}
+    update_bars(tickers, interval, prepost)
+    return {t: read_bars(t, interval, prepost, period=period, dtype=dtype) for t in tickers}
+
+
+_DAY_NS = 86400 * 10**9
+_MINUTE_NS = 60 * 10**9
+_REGULAR_MINUTES = (REGULAR_OPEN.hour * 60 + REGULAR_OPEN.minute, REGULAR_CLOSE.hour * 60 + REGULAR_CLOSE.minute)
+
+
+def regular_session(df):
+    """เฉพาะแท่ง intraday ช่วงตลาดปกติ (09:30-16:00 New York)"""
+    if df.empty:
+        return df
+    minutes = df.index.hour * 60 + df.index.minute
+    return df[(minutes >= _REGULAR_MINUTES[0]) & (minutes < _REGULAR_MINUTES[1])]
+
+
+def _local_clock(ts):
+    """ts (ns UTC) -> (เที่ยงคืนของวันที่ New York เป็น ns แบบ tz-naive, นาทีของวัน) ของแต่ละแท่ง"""
+    local = pd.DatetimeIndex(np.asarray(ts).astype("datetime64[ns]")).tz_localize("UTC").tz_convert(MARKET_TZ)
+    local = np.asarray(local.tz_localize(None), dtype="datetime64[ns]").view("i8")
+    day = local - local % _DAY_NS
+    return day, (local - day) // _MINUTE_NS
+
+
+def _reduce_days(day, columns):
+    """รวมแท่งที่เรียงตามเวลาเป็นแท่งละวัน (day เรียงแล้ว) คืน (วัน, dict คอลัมน์ -> array รายวัน)"""
+    if not len(day):
+        return day, {c: columns[c][:0] for c in COLUMNS}
+    starts = np.flatnonzero(np.r_[True, day[1:] != day[:-1]])
+    ends = np.r_[starts[1:], len(day)] - 1
+    return day[starts], {
+        "Open": columns["Open"][starts],
+        "High": np.fmax.reduceat(columns["High"], starts),
+        "Low": np.fmin.reduceat(columns["Low"], starts),
+        "Close": columns["Close"][ends],
+        "Volume": np.add.reduceat(np.nan_to_num(columns["Volume"]), starts),
+    }
+
+
+def _session_bars(day, minutes, columns):
+    """แกนของ resample_sessions ทำงานบน array: คืน (วัน, dict คอลัมน์ -> array) เรียงตามวัน"""
+    regular = (minutes >= _REGULAR_MINUTES[0]) & (minutes < _REGULAR_MINUTES[1])
+    days, bars = _reduce_days(day[regular], {c: v[regular] for c, v in columns.items()})
+    pending = ~np.isin(day, days)
+    if pending.any():
+        extra_days, extra = _reduce_days(day[pending], {c: v[pending] for c, v in columns.items()})
+        days = np.concatenate([days, extra_days])
+        order = np.argsort(days, kind="stable")
+        days = days[order]
+        bars = {c: np.concatenate([bars[c], extra[c]])[order] for c in COLUMNS}
+    return days, bars
+
+
+def _days_frame(days, bars, dtype="float64"):
+    return pd.DataFrame({c: np.asarray(bars[c], dtype=dtype) for c in COLUMNS},
+                        index=pd.DatetimeIndex(days.astype("datetime64[ns]")))
+
+
+def resample_sessions(df):
+    """รวมแท่ง intraday (รวม pre/after-market) เป็นแท่ง daily หนึ่งแท่งต่อ session จากแท่งช่วงตลาดปกติ
+    session ที่ยังไม่มีแท่งช่วงปกติ (pre-market ของวันนี้) ใช้แท่ง extended แทน — เหมือนแถว "วันนี้"
+    ที่ daily ของ Yahoo คืนระหว่าง pre-market ให้แท่งสุดท้ายเป็นราคาล่าสุด และแท่งรองสุดท้ายเป็นราคาปิดจริง"""
+    if df.empty:
+        return pd.DataFrame(columns=COLUMNS)
+    day, minutes = _local_clock(np.asarray(df.index.tz_convert("UTC").tz_localize(None), dtype="datetime64[ns]"))
+    days, bars = _session_bars(day, minutes, {c: df[c].to_numpy(dtype="f8") for c in COLUMNS})
+    return _days_frame(days, bars)
+
+
+def _base_splice_date(ticker):
+    """วันแรกที่ daily จะ resample จากแท่ง 5 นาทีในคลัง (session ที่สอง — session แรกอาจถูกตัดครึ่งตอนตัด retention)
+    วันก่อนหน้านั้นใช้ daily ย้อนยาว None = ยังไม่มีแท่ง 5 นาที"""
+    arr = _read_array(BASE_INTERVAL, True, ticker)
+    if arr is None or not len(arr):
+        return None
+    # 5m ทั้งวันรวม pre/after-market ไม่เกิน 192 แท่ง อ่านแค่ช่วงต้นไฟล์พอ
+    days = np.unique(_local_clock(arr["ts"][:400])[0])
+    return pd.Timestamp(int(days[1] if len(days) > 1 else days[0]))
+
+
+def update_base(tickers):
+    """อัปเดตข้อมูลฐานของ load_timeframes: แท่ง 5 นาทีรวม pre/after-market (ดึงต่อเพิ่มทุกรอบ ยกเว้นเพิ่งดึง
+    ภายใน BAR_FRESH_SECONDS) และ daily ย้อนยาว เฉพาะ ticker ที่ daily ในคลังยังไม่ถึงวันที่เริ่มใช้แท่ง 5 นาที
+    (ปกติประมาณทุก 2 สัปดาห์ต่อ ticker ไม่ใช่ทุกรอบ)"""
+    update_bars(tickers, BASE_INTERVAL, prepost=True, max_age=BAR_FRESH_SECONDS)
+
+    stale = []
+    for ticker in tickers:
+        daily = _read_array(DAILY_INTERVAL, False, ticker)
+        splice = _base_splice_date(ticker)
+        if daily is None or not len(daily) or (splice is not None and pd.Timestamp(int(daily["ts"][-1])) < splice):
+            stale.append(ticker)
+    if stale:
+        update_bars(stale, DAILY_INTERVAL)
+
+
+def _last_sessions(day, sessions):
+    """mask ของแท่งที่อยู่ใน sessions วันเทรดล่าสุด (นับแบบ period ของ yf.download)"""
+    if not len(day):
+        return np.zeros(0, dtype=bool)
+    return day >= np.unique(day)[-sessions:][0]
+
+
+def read_timeframes(ticker, daily_period="1mo", intraday_period="6d", extended_period="2d", dtype="float64"):
+    """อ่านทุก timeframe ของ ticker จากคลัง (ไม่ยิง network) คืน dict:
+    daily    — แท่งรายวันช่วงตลาดปกติ ย้อนหลัง daily_period (วันปฏิทิน) ส่วนต้นจาก daily ย้อนยาว ส่วนท้ายจาก resample
+    intraday — แท่ง 5 นาทีเฉพาะช่วงตลาดปกติ intraday_period session ล่าสุด
+    extended — แท่ง 5 นาทีรวม pre/after-market extended_period session ล่าสุด
+    (ทำงานบน structured array ในคลังตรงๆ สร้าง DataFrame แค่ตอนคืนผล — ถูกเรียกทีละ ticker ทั้ง universe)"""
+    base = _read_array(BASE_INTERVAL, True, ticker)
+    if base is None:
+        base = np.empty(0, dtype=BAR_DTYPE)
+    long_daily = _read_array(DAILY_INTERVAL, False, ticker)
+    if long_daily is None:
+        long_daily = np.empty(0, dtype=BAR_DTYPE)
+
+    day, minutes = _local_clock(base["ts"])
+    days, bars = _session_bars(day, minutes, {c: base[c.lower()] for c in COLUMNS})
+
+    # daily ของ Yahoo บางเวอร์ชันมาแบบเที่ยงคืน New York (เก็บเป็น UTC) ปัดให้เป็นวันที่เหมือน session
+    long_days = long_daily["ts"] - long_daily["ts"] % _DAY_NS
+    if len(days) and len(long_days):
+        splice = days[1] if len(days) > 1 else days[0]
+        old, new = long_days < splice, days >= splice
+        days = np.concatenate([long_days[old], days[new]])
+        bars = {c: np.concatenate([long_daily[c.lower()][old], bars[c][new]]) for c in COLUMNS}
+    elif not len(days):
+        days, bars = long_days, {c: long_daily[c.lower()] for c in COLUMNS}
+    if len(days) and daily_period:
+        keep = days >= days[-1] - period_days(daily_period) * _DAY_NS
+        days, bars = days[keep], {c: v[keep] for c, v in bars.items()}
+
+    regular = (minutes >= _REGULAR_MINUTES[0]) & (minutes < _REGULAR_MINUTES[1])
+    intraday = np.flatnonzero(regular)[_last_sessions(day[regular], period_days(intraday_period))]
+    extended = _last_sessions(day, period_days(extended_period))
+    return {
+        "daily": _days_frame(days, bars, dtype),
+        "intraday": _array_to_frame(base[intraday], BASE_INTERVAL, dtype),
+        "extended": _array_to_frame(base[extended], BASE_INTERVAL, dtype),
+    }
+
+
+def load_timeframes(tickers, daily_period="1mo", intraday_period="6d", extended_period="2d", dtype="float64"):
+    """อัปเดตข้อมูลฐานครั้งเดียวแล้วคืน {"daily": {ticker: df}, "intraday": {...}, "extended": {...}}"""
+    result = {"daily": {}, "intraday": {}, "extended": {}}
+    if not tickers:
+        return result
+    update_base(tickers)
+    for ticker in tickers:
+        for name, df in read_timeframes(ticker, daily_period, intraday_period, extended_period, dtype).items():
+            result[name][ticker] = df
+    return result
@@ -0,0 +1,215 @@
+"""Benchmark: screener ทั้งเส้นทาง (bar_store -> columnar table -> sharded top-K) บน universe สังเคราะห์หลายขนาด
+ไม่ยิง network — yf.download ถูกแทนด้วยตัวปลอมที่คืนข้อมูลหน้าตาเดียวกับ yf.download(group_by="ticker")
+(MultiIndex columns) จากชุดสังเคราะห์ที่มีทั้ง gap, NaN, แท่งหาย และ ticker ที่ถูก halt
+
+วัดต่อขนาด universe:
+  scan_movers / scan_premarket_gaps  — cold (คลังว่าง โหลดเต็ม) และ warm (รอบถัดไป ต่อเพิ่มเฉพาะแท่งใหม่)
+  _pace_normalized_volume_ratio      — ทีละ ticker (สูตรอ้างอิง) เทียบ pace_normalized_volume_ratios
+บันทึก wall time และ peak RSS แล้วพิมพ์/เขียนผลเป็น JSON ไว้เทียบก่อน-หลังแก้
+
+รัน:  python benchmarks/bench_screener.py [--sizes 100 500 2000] [--seed 7] [--output bench.json]"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import platform
+import argparse
+import subprocess
+import contextlib
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bar_store
+import indicator_state
+import scan_tables
+import screener
+
+SESSIONS = 10
+DAILY_DAYS = 260
+FIELDS = ["Open", "High", "Low", "Close", "Volume"]
+HALTED_SHARE = 0.02       # ถูก halt กลางวันนี้ (หลังจากนั้นไม่มีแท่ง)
+GAP_SHARE = 0.05          # gap แรงช่วง pre-market วันนี้
+MISSING_SHARE = 0.02      # แท่งหายแบบสุ่ม
+NAN_SHARE = 0.01          # แท่งที่มีแต่ NaN
+
+
+def _last_session():
+    """วันทำการล่าสุด (ให้ข้อมูลสังเคราะห์ "สด" ตาม retention ของ bar_store)"""
+    return pd.bdate_range(end=pd.Timestamp.now(tz=bar_store.MARKET_TZ).tz_localize(None).normalize(), periods=1)[0]
+
+
+def _to_multiindex(index, values, tickers):
+    """values [bar, ticker, field] -> DataFrame columns (ticker, field) แบบที่ yf.download(group_by="ticker") คืน"""
+    columns = pd.MultiIndex.from_product([tickers, FIELDS])
+    return pd.DataFrame(values.reshape(len(index), -1), index=index, columns=columns)
+
+
+def synthetic_universe(n_tickers, seed=7):
+    """คืน (daily, intraday) แบบ MultiIndex: daily ย้อน DAILY_DAYS วัน, intraday 5 นาทีรวม pre/after-market
+    SESSIONS session โดย session สุดท้าย ("วันนี้") มีข้อมูลถึงกลางวัน"""
+    rng = np.random.default_rng(seed)
+    tickers = [f"T{i:05d}" for i in range(n_tickers)]
+    last = _last_session()
+
+    days = pd.bdate_range(end=last, periods=DAILY_DAYS)
+    base = rng.uniform(2, 200, size=n_tickers)
+    closes = base * np.exp(np.cumsum(rng.normal(0, 0.02, size=(len(days), n_tickers)), axis=0))
+    daily = np.empty((len(days), n_tickers, len(FIELDS)))
+    daily[..., 0] = closes * (1 + rng.normal(0, 0.005, closes.shape))
+    daily[..., 1] = closes * 1.01
+    daily[..., 2] = closes * 0.99
+    daily[..., 3] = closes
+    daily[..., 4] = rng.integers(10_000, 5_000_000, size=closes.shape)
+
+    sessions = pd.bdate_range(end=last, periods=SESSIONS)
+    offsets = pd.timedelta_range("04:00:00", "19:55:00", freq="5min")
+    index = pd.DatetimeIndex([d + o for d in sessions for o in offsets]).tz_localize(bar_store.MARKET_TZ)
+    start = closes[-SESSIONS]
+    walk = start * np.exp(np.cumsum(rng.normal(0, 0.002, size=(len(index), n_tickers)), axis=0))
+
+    today = index.normalize() == index[-1].normalize()
+    gappers = rng.random(n_tickers) < GAP_SHARE
+    walk[np.ix_(today, gappers)] *= rng.choice([0.9, 1.1], size=gappers.sum())
+
+    volume = rng.integers(0, 50_000, size=walk.shape).astype("float64")
+    extended = (index.hour < 9) | ((index.hour == 9) & (index.minute < 30)) | (index.hour >= 16)
+    volume[extended] *= 0.05
+
+    intraday = np.empty((len(index), n_tickers, len(FIELDS)))
+    intraday[..., 0] = intraday[..., 1] = intraday[..., 2] = intraday[..., 3] = walk
+    intraday[..., 1] *= 1.002
+    intraday[..., 2] *= 0.998
+    intraday[..., 4] = volume
+
+    # วันนี้มีข้อมูลถึงประมาณ 13:00; ticker ที่ถูก halt หยุดตั้งแต่ 11:00
+    intraday[today & (index.hour >= 13)] = np.nan
+    halted = rng.random(n_tickers) < HALTED_SHARE
+    intraday[np.ix_(today & (index.hour >= 11), halted)] = np.nan
+    intraday[rng.random(walk.shape) < MISSING_SHARE] = np.nan
+    nan_rows = rng.random(walk.shape) < NAN_SHARE
+    intraday[nan_rows, 3] = np.nan
+
+    cutoff = today & (index.hour >= 13)
+    return (_to_multiindex(days, daily, tickers),
+            _to_multiindex(index[~cutoff], intraday[~cutoff], tickers))
+
+
+class FakeDownload:
+    """แทน yf.download: คืนส่วนของชุดสังเคราะห์ตาม tickers/interval/prepost/period/start ที่ถูกขอ"""
+
+    def __init__(self, daily, intraday):
+        self.daily = daily
+        self.intraday = intraday
+        self.calls = 0
+
+    def __call__(self, tickers, interval, prepost=False, period=None, start=None, **kwargs):
+        self.calls += 1
+        names = tickers.split()
+        data = self.daily if interval == "1d" else self.intraday
+        if start is not None:
+            start = pd.Timestamp(start)
+            if data.index.tz is not None:
+                start = start.tz_localize(data.index.tz)
+            data = data[data.index >= start]
+        elif period is not None:
+            data = data[data.index >= data.index[-1] - pd.Timedelta(days=bar_store.period_days(period))]
+        if interval != "1d" and not prepost:
+            data = bar_store.regular_session(data)
+        return data.loc[:, names]
+
+
+def _measure(fn):
+    """คืน (ผลลัพธ์, วินาที, peak RSS MB ระหว่างรัน)"""
+    with screener._PeakRssSampler() as sampler:
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+    return result, elapsed, sampler.peak_mb
+
+
+def _record(results, size, name, phase, elapsed, peak_mb, **extra):
+    row = {"size": size, "name": name, "phase": phase, "seconds": round(elapsed, 4), "peak_rss_mb": round(peak_mb, 1)}
+    row.update(extra)
+    results.append(row)
+    print(f"{size:>6} | {name:<34} {phase:<6} | {elapsed:8.3f}s | peak RSS {peak_mb:7.0f} MB", file=sys.stderr)
+
+
+def bench_size(n, seed, results):
+    daily, intraday = synthetic_universe(n, seed)
+    tickers = list(daily.columns.get_level_values(0).unique())
+    fake = FakeDownload(daily, intraday)
+
+    with tempfile.TemporaryDirectory() as store, \
+            patch("bar_store.BAR_STORE_DIR", store), \
+            patch("bar_store.yf.download", fake), \
+            patch("indicator_state._store", indicator_state.IndicatorStateStore(os.path.join(store, "state.json"))), \
+            patch("screen_rules.get_float_m", return_value=None):
+        for phase in ("cold", "warm"):
+            for name, scan in (("scan_movers", screener.scan_movers),
+                               ("scan_premarket_gaps", screener.scan_premarket_gaps)):
+                bar_store._synced.clear()  # รอบใหม่ของ scheduler = ต้องต่อเพิ่มแท่งจริง ไม่ใช่ข้ามเพราะเพิ่งดึง
+                calls = fake.calls
+                found, elapsed, peak = _measure(lambda: scan(tickers))
+                _record(results, n, name, phase, elapsed, peak, returned=len(found),
+                        passed=screener.last_scan_stats.get("passed"), downloads=fake.calls - calls)
+
+        frames = bar_store.load_timeframes(tickers)["intraday"]
+
+    _, elapsed, peak = _measure(lambda: {t: scan_tables._pace_normalized_volume_ratio(df) for t, df in frames.items()})
+    _record(results, n, "_pace_normalized_volume_ratio", "loop", elapsed, peak)
+    _, elapsed, peak = _measure(lambda: scan_tables.pace_normalized_volume_ratios(frames))
+    _record(results, n, "pace_normalized_volume_ratios", "vector", elapsed, peak)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(sizes, seed):
+    results = []
+    for n in sizes:
+        bench_size(n, seed, results)
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "seed": seed,
+            "sizes": sizes,
+            "scan_chunk_size": scan_tables.SCAN_CHUNK_SIZE,
+            "scan_workers": scan_tables.SCAN_WORKERS,
+            "scan_dtype": scan_tables.SCAN_DTYPE,
+        },
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 500, 2000])
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="เขียน JSON ลงไฟล์ (ไม่ระบุ = พิมพ์ออก stdout)")
+    args = parser.parse_args()
+
+    # log ของ screener/bar_store ไป stderr ให้ stdout เหลือแต่ JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run(args.sizes, args.seed)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 บันทึกผลลง {args.output}", file=sys.stderr)
+    else:
+        print(json.dumps(report, indent=2))
@@ -0,0 +1,47 @@
+"""ยิงงาน I/O หลายแหล่งพร้อมกัน (Finnhub, StockTwits, SEC, yfinance ฯลฯ) แทนการเรียกทีละตัวต่อกัน
+แต่ละงานมี deadline ของตัวเอง + มี deadline รวมทั้งชุด งานที่ช้าเกินหรือ error จะได้ค่า default แทน
+(เช่น score 0 / "N/A") เพื่อไม่ให้แหล่งข้อมูลเดียวที่ค้างมาถ่วงการวิเคราะห์ทั้ง ticker"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# run_news_bot ประมวลผลหลาย ticker พร้อมกัน แต่ละตัวยิง ~9 งาน ต้องมี worker พอไม่ให้งานไปต่อคิว
+# จนกิน deadline ของตัวเองก่อนได้เริ่มจริง
+MAX_WORKERS = int(os.getenv("FETCH_MAX_WORKERS", "48"))
+
+# ใช้ pool กลางตัวเดียวทั้ง process และไม่รอ thread ที่เลย deadline ให้จบ (ปล่อยให้มันจบเองเบื้องหลัง
+# ด้วย timeout ของ request ตัวเอง) — ถ้าใช้ `with ThreadPoolExecutor()` ตอนออกจะถูกบังคับรอทุก thread
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="fetch")
+
+
+def gather_with_deadlines(tasks, defaults, timeouts=None, default_timeout=10.0, total_timeout=20.0):
+    """รันทุกงานใน tasks พร้อมกัน
+
+    tasks: dict ชื่อ -> callable ที่ไม่รับ argument
+    defaults: dict ชื่อ -> ค่าที่ใช้แทนเมื่องานนั้น timeout หรือ error
+    timeouts: dict ชื่อ -> วินาที (deadline รายงาน นับจากตอนเริ่มยิงพร้อมกัน) ไม่ระบุ = default_timeout
+    total_timeout: deadline รวมของทั้งชุด (งานไหนยังไม่เสร็จเมื่อครบเวลานี้ถือว่า late หมด)
+
+    Returns: (results, late) — results คือ dict ชื่อ -> ค่า, late คือ list ชื่องานที่ใช้ค่า default
+    """
+    timeouts = timeouts or {}
+    start = time.monotonic()
+    overall_deadline = start + total_timeout
+
+    futures = {name: _executor.submit(fn) for name, fn in tasks.items()}
+
+    results, late = {}, []
+    for name, future in futures.items():
+        deadline = min(start + timeouts.get(name, default_timeout), overall_deadline)
+        remaining = max(0.0, deadline - time.monotonic())
+        try:
+            results[name] = future.result(timeout=remaining)
+        except Exception as e:
+            future.cancel()
+            results[name] = defaults.get(name)
+            late.append(name)
+            reason = "timeout" if not future.done() or future.cancelled() else f"error: {e}"
+            print(f"⏱️ {name}: ใช้ค่า default ({reason})")
+
+    return results, late
@@ -1,4 +1,5 @@
 import os
+import threading
 import psycopg2
 import psycopg2.extras
 import psycopg2.pool
@@ -13,19 +14,24 @@ DB_NAME = os.environ.get("DB_NAME")
 DB_PASS = os.environ.get("DB_PASS")
 
 _pool = None
+_pool_lock = threading.Lock()
 
 
 def _get_pool():
+    """pool เดียวของ process ใช้ร่วมกันได้หลาย thread (worker ของ news pipeline)
+    สร้างครั้งแรกใต้ล็อก กันสอง thread สร้าง pool ซ้อนกันแล้วอันหนึ่งรั่ว"""
     global _pool
     if _pool is None and all([DB_HOST, DB_USER, DB_NAME, DB_PASS]):
-        _pool = psycopg2.pool.SimpleConnectionPool(
-            1, 10,
-            host=DB_HOST,
-            port=DB_PORT,
-            user=DB_USER,
-            password=DB_PASS,
-            dbname=DB_NAME,
-        )
+        with _pool_lock:
+            if _pool is None:
+                _pool = psycopg2.pool.ThreadedConnectionPool(
+                    1, 10,
+                    host=DB_HOST,
+                    port=DB_PORT,
+                    user=DB_USER,
+                    password=DB_PASS,
+                    dbname=DB_NAME,
+                )
     return _pool
 
 CREATE_TABLE_SQL = """
@@ -46,8 +52,30 @@ ALTER TABLE predictions ADD COLUMN IF NOT EXISTS target_price NUMERIC;
 ALTER TABLE predictions ADD COLUMN IF NOT EXISTS stop_loss_price NUMERIC;
 ALTER TABLE predictions ADD COLUMN IF NOT EXISTS time_horizon_days INTEGER;
 ALTER TABLE predictions ADD COLUMN IF NOT EXISTS confluence_count INTEGER;
+ALTER TABLE predictions ADD COLUMN IF NOT EXISTS first_touch TEXT;
+ALTER TABLE predictions ADD COLUMN IF NOT EXISTS first_touch_at TIMESTAMPTZ;
+ALTER TABLE predictions ADD COLUMN IF NOT EXISTS mfe_pct NUMERIC;
+ALTER TABLE predictions ADD COLUMN IF NOT EXISTS mae_pct NUMERIC;
+ALTER TABLE predictions ADD COLUMN IF NOT EXISTS path_evaluated_at TIMESTAMPTZ;
+
+CREATE TABLE IF NOT EXISTS news_ingest_state (
+    symbol TEXT PRIMARY KEY,
+    last_time_published TEXT,
+    seen_urls TEXT[] NOT NULL DEFAULT '{}',
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS float_table (
+    symbol TEXT PRIMARY KEY,
+    float_m NUMERIC,
+    shares_outstanding_m NUMERIC,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
 """
 
+# จำนวน URL ข่าวที่จำไว้ต่อ ticker (พอสำหรับกันข่าวซ้ำในนาทีเดียวกับ time_from ไม่ให้ array โตไม่จำกัด)
+MAX_SEEN_URLS = 200
+
 
 def get_connection():
     """ดึง connection จาก pool (ไม่ได้เปิดใหม่ทุกครั้ง) ใช้คู่กับ release_connection() เสมอ"""
@@ -72,14 +100,14 @@ def release_connection(conn):
 
 
 def init_db():
-    """สร้างตาราง predictions ถ้ายังไม่มี"""
+    """สร้างตาราง predictions + news_ingest_state + float_table ถ้ายังไม่มี"""
     conn = get_connection()
     if not conn:
         return
     try:
         with conn, conn.cursor() as cur:
             cur.execute(CREATE_TABLE_SQL)
-        print("✅ DB: predictions table ready")
+        print("✅ DB: predictions/news_ingest_state/float_table tables ready")
     except Exception as e:
         print(f"❌ DB Init Error: {e}")
     finally:
@@ -155,6 +183,184 @@ def update_verification(id, end_price, is_correct):
         release_connection(conn)
 
 
+def update_verifications(results):
+    """อัปเดตผลสอบหลายแถวใน statement เดียว results: list of (id, end_price, is_correct)"""
+    if not results:
+        return
+    conn = get_connection()
+    if not conn:
+        return
+
+    sql = """
+        UPDATE predictions AS p
+        SET end_price = v.end_price, is_correct = v.is_correct, status = 'VERIFIED'
+        FROM (VALUES %s) AS v (id, end_price, is_correct)
+        WHERE p.id = v.id
+    """
+    try:
+        with conn, conn.cursor() as cur:
+            psycopg2.extras.execute_values(cur, sql, results, template="(%s::integer, %s::numeric, %s::boolean)",
+                                           page_size=1000)
+        print(f"☁️ DB: Verified {len(results)} predictions")
+    except Exception as e:
+        print(f"❌ Error updating verifications: {e}")
+    finally:
+        release_connection(conn)
+
+
+def get_path_candidates(rescore=False, max_age_days=730):
+    """คำทำนายที่ครบ horizon แล้วสำหรับ path_evaluator (ไม่เก่ากว่า max_age_days ซึ่งเกินกว่านั้นไม่มีแท่ง intraday)
+    rescore=False เอาเฉพาะที่ยังไม่เคยประเมิน / True = ทั้งหมด (ประเมินประวัติใหม่หลังเปลี่ยนกติกา)"""
+    conn = get_connection()
+    if not conn:
+        return []
+
+    sql = """
+        SELECT id, symbol, created_at, time_horizon_days, start_price, predicted_direction,
+               target_price, stop_loss_price
+        FROM predictions
+        WHERE created_at + (COALESCE(time_horizon_days, 1) || ' days')::interval <= NOW()
+          AND created_at >= NOW() - (%s || ' days')::interval
+    """
+    if not rescore:
+        sql += " AND path_evaluated_at IS NULL"
+    try:
+        with conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.execute(sql, (max_age_days,))
+            return [dict(row) for row in cur.fetchall()]
+    except Exception as e:
+        print(f"❌ Error fetching path candidates: {e}")
+        return []
+    finally:
+        release_connection(conn)
+
+
+def save_path_results(results):
+    """บันทึกผลของ path_evaluator หลายแถวใน statement เดียว
+    results: list of (id, first_touch, first_touch_at, mfe_pct, mae_pct)"""
+    if not results:
+        return
+    conn = get_connection()
+    if not conn:
+        return
+
+    sql = """
+        UPDATE predictions AS p
+        SET first_touch = v.first_touch, first_touch_at = v.first_touch_at,
+            mfe_pct = v.mfe_pct, mae_pct = v.mae_pct, path_evaluated_at = NOW()
+        FROM (VALUES %s) AS v (id, first_touch, first_touch_at, mfe_pct, mae_pct)
+        WHERE p.id = v.id
+    """
+    try:
+        with conn, conn.cursor() as cur:
+            psycopg2.extras.execute_values(
+                cur, sql, results, page_size=1000,
+                template="(%s::integer, %s::text, %s::timestamptz, %s::numeric, %s::numeric)")
+        print(f"☁️ DB: Saved path evaluation for {len(results)} predictions")
+    except Exception as e:
+        print(f"❌ Error saving path evaluation: {e}")
+    finally:
+        release_connection(conn)
+
+
+def get_news_cursor(symbol):
+    """high-water mark ของข่าวที่วิเคราะห์ไปแล้ว: {"last_time_published": str, "seen_urls": list (เก่า -> ใหม่)}
+    คืน None ถ้ายังไม่เคยวิเคราะห์ ticker นี้ (หรือต่อ DB ไม่ได้ -> ดึงข่าวเต็มตามเดิม)"""
+    conn = get_connection()
+    if not conn:
+        return None
+
+    sql = "SELECT last_time_published, seen_urls FROM news_ingest_state WHERE symbol = %s"
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute(sql, (symbol,))
+            row = cur.fetchone()
+        if row is None:
+            return None
+        return {"last_time_published": row[0], "seen_urls": list(row[1] or [])}
+    except Exception as e:
+        print(f"❌ Error fetching news cursor: {e}")
+        return None
+    finally:
+        release_connection(conn)
+
+
+def save_news_cursor(symbol, last_time_published, seen_urls):
+    """บันทึก high-water mark ใหม่ seen_urls เรียงเก่า -> ใหม่ (เก็บแค่ MAX_SEEN_URLS ตัวท้ายสุด)"""
+    conn = get_connection()
+    if not conn:
+        return
+
+    sql = """
+        INSERT INTO news_ingest_state (symbol, last_time_published, seen_urls, updated_at)
+        VALUES (%s, %s, %s, NOW())
+        ON CONFLICT (symbol) DO UPDATE
+        SET last_time_published = EXCLUDED.last_time_published,
+            seen_urls = EXCLUDED.seen_urls,
+            updated_at = NOW()
+    """
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute(sql, (symbol, last_time_published, seen_urls[-MAX_SEEN_URLS:]))
+    except Exception as e:
+        print(f"❌ Error saving news cursor: {e}")
+    finally:
+        release_connection(conn)
+
+
+def get_float_rows():
+    """โหลด float ทั้งตาราง: dict symbol -> {"float_m", "shares_outstanding_m", "updated_at"}
+    คืน None ถ้าต่อ DB ไม่ได้ (แยกจากตารางว่าง {} ให้ caller ไปใช้ไฟล์ local แทน)"""
+    conn = get_connection()
+    if not conn:
+        return None
+
+    sql = "SELECT symbol, float_m, shares_outstanding_m, updated_at FROM float_table"
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute(sql)
+            return {
+                symbol: {
+                    "float_m": float(float_m) if float_m is not None else None,
+                    "shares_outstanding_m": float(shares) if shares is not None else None,
+                    "updated_at": updated_at.isoformat() if updated_at else None,
+                }
+                for symbol, float_m, shares, updated_at in cur.fetchall()
+            }
+    except Exception as e:
+        print(f"❌ Error fetching float table: {e}")
+        return None
+    finally:
+        release_connection(conn)
+
+
+def save_float_rows(rows):
+    """upsert float หลาย symbol ใน statement เดียว rows: dict symbol -> {"float_m", "shares_outstanding_m"}"""
+    if not rows:
+        return
+    conn = get_connection()
+    if not conn:
+        return
+
+    sql = """
+        INSERT INTO float_table (symbol, float_m, shares_outstanding_m, updated_at)
+        VALUES %s
+        ON CONFLICT (symbol) DO UPDATE
+        SET float_m = EXCLUDED.float_m,
+            shares_outstanding_m = EXCLUDED.shares_outstanding_m,
+            updated_at = NOW()
+    """
+    values = [(symbol, r.get("float_m"), r.get("shares_outstanding_m")) for symbol, r in rows.items()]
+    try:
+        with conn, conn.cursor() as cur:
+            psycopg2.extras.execute_values(cur, sql, values, template="(%s, %s, %s, NOW())")
+        print(f"☁️ DB: Saved float for {len(values)} symbols")
+    except Exception as e:
+        print(f"❌ Error saving float table: {e}")
+    finally:
+        release_connection(conn)
+
+
 def get_accuracy_stats():
     """ดึงสถิติความแม่นยำ"""
     conn = get_connection()
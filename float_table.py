@@ -0,0 +1,111 @@
+"""ตาราง float/shares outstanding ของทั้ง universe โหลดไว้ใน memory ให้ screener หาตัวคูณ float ได้ทันที
+(เดิมยิง Finnhub stock/profile2 ทุกตัวที่ผ่านเกณฑ์ในทุกรอบสแกน 5 นาที ทั้งที่ float เปลี่ยนแค่ไม่กี่ครั้งต่อปี)
+
+รีเฟรชแบบ bulk วันละครั้งนอกเวลาตลาด (scheduler -> refresh_float_table) เก็บลง Postgres (float_table)
+และไฟล์ local FLOAT_TABLE_PATH ไว้ใช้ตอนต่อ DB ไม่ได้ ticker ที่ยังไม่มีในตารางได้ตัวคูณ 1.0
+และถูกจดไว้ให้รอบรีเฟรชถัดไปดึงเพิ่ม (ไม่ยิง Finnhub ระหว่างสแกน)"""
+
+import os
+import json
+import threading
+from datetime import datetime, timezone
+
+from db_handler import get_float_rows, save_float_rows
+from get_fundamentals import get_float_data, float_multiplier_from_float, FINNHUB_API_KEY
+
+FLOAT_TABLE_PATH = os.getenv("FLOAT_TABLE_PATH", "cache/float_table.json")
+# ตารางเก่ากว่านี้ถือว่าค้าง (ให้ scheduler รีเฟรชทันทีตอนเริ่ม)
+FLOAT_TABLE_MAX_AGE_HOURS = 36
+
+_table = None
+_missing = set()
+_lock = threading.Lock()
+
+
+def _read_local():
+    try:
+        with open(FLOAT_TABLE_PATH, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _write_local(table):
+    directory = os.path.dirname(FLOAT_TABLE_PATH)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = FLOAT_TABLE_PATH + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(table, f)
+    os.replace(tmp, FLOAT_TABLE_PATH)
+
+
+def load_float_table(force=False):
+    """โหลดตารางเข้า memory (Postgres ก่อน ต่อไม่ได้ใช้ไฟล์ local) ครั้งเดียวต่อ process"""
+    global _table
+    with _lock:
+        if _table is None or force:
+            rows = get_float_rows()
+            _table = rows if rows else _read_local()
+            print(f"📦 Float table: โหลด {len(_table)} symbols")
+        return _table
+
+
+def get_float_m(ticker):
+    """float (ล้านหุ้น) จากตาราง (ไม่ยิง network) ticker ที่ยังไม่มีได้ None และถูกจดไว้ให้รอบรีเฟรชถัดไป"""
+    row = load_float_table().get(ticker.upper())
+    if row is None:
+        with _lock:
+            _missing.add(ticker.upper())
+        return None
+    return row.get("float_m")
+
+
+def get_float_multiplier(ticker):
+    """ตัวคูณ momentum จาก float ในตาราง (ไม่ยิง network) ticker ที่ยังไม่มีได้ 1.0"""
+    return float_multiplier_from_float(get_float_m(ticker))
+
+
+def is_stale():
+    """True ถ้าตารางว่างหรือรีเฟรชล่าสุดเก่ากว่า FLOAT_TABLE_MAX_AGE_HOURS"""
+    table = load_float_table()
+    stamps = [r["updated_at"] for r in table.values() if r.get("updated_at")]
+    if not stamps:
+        return True
+    latest = datetime.fromisoformat(max(stamps))
+    if latest.tzinfo is None:
+        latest = latest.replace(tzinfo=timezone.utc)
+    return (datetime.now(timezone.utc) - latest).total_seconds() > FLOAT_TABLE_MAX_AGE_HOURS * 3600
+
+
+def refresh_float_table(tickers):
+    """ดึง float ของ tickers (+ ตัวที่ screener ถามแล้วไม่เจอ) จาก Finnhub ทีละตัวตาม quota
+    แล้วบันทึกลง Postgres + ไฟล์ local ในครั้งเดียว ตัวที่ดึงไม่ได้คงค่าเดิมในตารางไว้
+    (ข้าม cache profile2 24 ชม. ของ _finnhub_get ไม่งั้นรอบรีเฟรชได้ค่าเก่าเดิมกลับมา)"""
+    if not FINNHUB_API_KEY:
+        print("⚠️ ไม่มี FINNHUB_API_KEY ข้ามการรีเฟรช float table")
+        return 0
+
+    with _lock:
+        symbols = list(dict.fromkeys([t.upper() for t in tickers] + sorted(_missing)))
+
+    print(f"📦 Float table: รีเฟรช {len(symbols)} symbols...")
+    now = datetime.now(timezone.utc).isoformat()
+    fresh = {}
+    for symbol in symbols:
+        info = get_float_data(symbol, use_cache=False)
+        if info and info["float_m"] is not None:
+            fresh[symbol] = {**info, "updated_at": now}
+
+    save_float_rows(fresh)
+    table = dict(load_float_table())
+    table.update(fresh)
+    _write_local(table)
+
+    global _table
+    with _lock:
+        _table = table
+        _missing.difference_update(fresh)
+
+    print(f"✅ Float table: อัปเดต {len(fresh)}/{len(symbols)} symbols")
+    return len(fresh)
@@ -1,9 +1,12 @@
 """SEC EDGAR (ฟรี 100% ไม่ต้อง key) — เช็คว่าบริษัทยื่นเอกสารที่เกี่ยว 'เพิ่มทุน/dilution' เร็วๆนี้ไหม
 เป็นสาเหตุหลักที่หุ้นซิ่งราคาร่วงกะทันหันหลังพุ่งแรง (บริษัทรีบออกหุ้นเพิ่มทุนตอนราคาดี)"""
 
-import requests
+import http_client
 from datetime import datetime, timedelta
 
+from ttl_cache import cache_get, cache_set
+from rate_limiter import acquire
+
 SEC_HEADERS = {"User-Agent": "InvesterProject research@example.com"}
 TICKER_MAP_URL = "https://www.sec.gov/files/company_tickers.json"
 SUBMISSIONS_URL = "https://data.sec.gov/submissions/CIK{cik}.json"
@@ -13,6 +16,9 @@ SUBMISSIONS_URL = "https://data.sec.gov/submissions/CIK{cik}.json"
 DILUTIVE_FORMS = {"S-1", "S-3", "424B3", "424B5"}
 LOOKBACK_DAYS = 30
 
+TICKER_MAP_CACHE_TTL = 7 * 24 * 3600
+FILINGS_CACHE_TTL = 3600
+
 _ticker_cik_cache = None
 
 
@@ -21,10 +27,16 @@ def _load_ticker_cik_map():
     if _ticker_cik_cache is not None:
         return _ticker_cik_cache
 
+    _ticker_cik_cache = cache_get("sec_ticker_map", "all")
+    if _ticker_cik_cache is not None:
+        return _ticker_cik_cache
+
     try:
-        res = requests.get(TICKER_MAP_URL, headers=SEC_HEADERS, timeout=15)
+        acquire("sec")
+        res = http_client.get(TICKER_MAP_URL, headers=SEC_HEADERS, timeout=15)
         data = res.json()
         _ticker_cik_cache = {v["ticker"].upper(): v["cik_str"] for v in data.values()}
+        cache_set("sec_ticker_map", "all", _ticker_cik_cache, TICKER_MAP_CACHE_TTL)
     except Exception as e:
         print(f"❌ SEC Ticker Map Error: {e}")
         _ticker_cik_cache = {}
@@ -37,14 +49,23 @@ def get_recent_dilutive_filings(ticker, days=LOOKBACK_DAYS):
     if not ticker or ticker == "GENERAL":
         return []
 
+    cache_key = f"{ticker.upper()}:{days}"
+    cached_filings = cache_get("sec_filings", cache_key)
+    if cached_filings is not None:
+        return [tuple(f) for f in cached_filings]
+
     cik_map = _load_ticker_cik_map()
     cik = cik_map.get(ticker.upper())
     if not cik:
         return []
 
+    if not acquire("sec", timeout=15):
+        print(f"⏳ SEC quota เต็ม ข้าม {ticker}")
+        return []
+
     try:
         url = SUBMISSIONS_URL.format(cik=str(cik).zfill(10))
-        res = requests.get(url, headers=SEC_HEADERS, timeout=15)
+        res = http_client.get(url, headers=SEC_HEADERS, timeout=15)
         recent = res.json()["filings"]["recent"]
     except Exception as e:
         print(f"❌ SEC Submissions Error ({ticker}): {e}")
@@ -58,13 +79,18 @@ def get_recent_dilutive_filings(ticker, days=LOOKBACK_DAYS):
             if filing_date >= cutoff:
                 results.append((date_str, form))
 
+    # cache แม้เป็น list ว่าง (ไม่มี filing ก็เป็นคำตอบที่ถูกต้อง) — กรณี error return ไปก่อนถึงตรงนี้แล้ว
+    cache_set("sec_filings", cache_key, results, FILINGS_CACHE_TTL)
     return results
 
 
 def get_dilution_risk_score(ticker):
     """คะแนนความเสี่ยง dilution: -2 = มี 424B3/424B5 (กำลังขายจริง) ภายใน 30 วัน (เสี่ยงสูง)
     -1 = มีแค่ S-1/S-3 (จดทะเบียนไว้ ยังไม่ได้ขายจริง) 0 = ไม่พบ"""
-    filings = get_recent_dilutive_filings(ticker)
+    return dilution_score_from_filings(get_recent_dilutive_filings(ticker))
+
+
+def dilution_score_from_filings(filings):
     if not filings:
         return 0
 
@@ -76,7 +102,10 @@ def get_dilution_risk_score(ticker):
 
 def get_dilution_context(ticker):
     """string สำหรับใส่ใน prompt AI"""
-    filings = get_recent_dilutive_filings(ticker)
+    return format_dilution_context(get_recent_dilutive_filings(ticker))
+
+
+def format_dilution_context(filings):
     if not filings:
         return f"Dilution Risk: No S-1/S-3/424B filings in last {LOOKBACK_DAYS} days"
 
@@ -1,31 +1,64 @@
 import os
-import requests
+import http_client
 from datetime import date, timedelta
 from dotenv import load_dotenv
 
+from ttl_cache import cache_get, cache_set
+from rate_limiter import acquire
+
 load_dotenv()
 
 FINNHUB_API_KEY = os.getenv("FINNHUB_API_KEY")
 FINNHUB_BASE = "https://finnhub.io/api/v1"
 
+# อายุ cache (วินาที) ต่อ endpoint ตามความถี่ที่ข้อมูลเปลี่ยนจริง
+FINNHUB_CACHE_TTL = {
+    "stock/metric": 12 * 3600,
+    "stock/profile2": 24 * 3600,        # float/shares outstanding เปลี่ยนแค่ไม่กี่ครั้งต่อปี
+    "calendar/earnings": 6 * 3600,
+    "stock/insider-transactions": 3 * 3600,
+    "stock/recommendation": 6 * 3600,
+}
+FINNHUB_DEFAULT_CACHE_TTL = 3600
+
 
-def _finnhub_get(path, params=None):
+def _finnhub_get(path, params=None, use_cache=True):
+    """GET Finnhub ผ่าน ttl_cache (use_cache=False = ข้ามค่าที่ cache ไว้ ยิงจริงแล้วเขียนทับ cache ด้วยค่าใหม่)"""
     if not FINNHUB_API_KEY:
         return None
-    params = params or {}
+    params = dict(params or {})
+    cache_key = f"{path}?{sorted(params.items())}"
+    cached_data = cache_get("finnhub", cache_key) if use_cache else None
+    if cached_data is not None:
+        return cached_data
+
+    # รอ quota ไม่เกิน timeout ของ request เอง (ถูกเรียกใน fan-out ที่มี deadline อยู่แล้ว)
+    if not acquire("finnhub", timeout=10):
+        print(f"⏳ Finnhub quota เต็ม ข้าม {path}")
+        return None
+
     params["token"] = FINNHUB_API_KEY
     try:
-        res = requests.get(f"{FINNHUB_BASE}/{path}", params=params, timeout=10)
-        return res.json()
+        res = http_client.get(f"{FINNHUB_BASE}/{path}", params=params, timeout=10)
+        data = res.json()
     except Exception as e:
         print(f"❌ Finnhub Error ({path}): {e}")
         return None
 
+    # ไม่ cache คำตอบ error (เช่น {"error": "API limit reached."}) รอบหน้าจะได้ลองใหม่
+    if not (isinstance(data, dict) and "error" in data):
+        cache_set("finnhub", cache_key, data, FINNHUB_CACHE_TTL.get(path, FINNHUB_DEFAULT_CACHE_TTL))
+    return data
+
 
 def get_fundamentals(ticker):
     """ดึงข้อมูลพื้นฐาน: P/E, EPS, Margin, ฯลฯ จาก Finnhub (free tier)"""
-    data = _finnhub_get("stock/metric", {"symbol": ticker, "metric": "all"})
-    if not data or "metric" not in data:
+    return format_fundamentals(_finnhub_get("stock/metric", {"symbol": ticker, "metric": "all"}))
+
+
+def format_fundamentals(data):
+    """แปลง payload ของ stock/metric เป็น string (แยกจากตัวดึง เพื่อให้ SignalSnapshot ใช้ payload ที่ดึงไว้แล้วได้)"""
+    if not isinstance(data, dict) or "metric" not in data:
         return "Fundamentals: N/A"
 
     m = data["metric"]
@@ -43,16 +76,24 @@ def get_fundamentals(ticker):
     return " | ".join(parts)
 
 
-def get_earnings_calendar(ticker):
-    """เช็คว่ามีวันประกาศงบใกล้ๆ ไหม (ภายใน 14 วัน)"""
+def earnings_calendar_params(ticker):
+    """params ของ calendar/earnings ช่วง 14 วันข้างหน้า"""
     today = date.today()
     future = today + timedelta(days=14)
-    data = _finnhub_get("calendar/earnings", {
+    return {
         "symbol": ticker,
         "from": today.isoformat(),
         "to": future.isoformat(),
-    })
-    if not data or not data.get("earningsCalendar"):
+    }
+
+
+def get_earnings_calendar(ticker):
+    """เช็คว่ามีวันประกาศงบใกล้ๆ ไหม (ภายใน 14 วัน)"""
+    return format_earnings_calendar(_finnhub_get("calendar/earnings", earnings_calendar_params(ticker)))
+
+
+def format_earnings_calendar(data):
+    if not isinstance(data, dict) or not data.get("earningsCalendar"):
         return "No upcoming earnings within 14 days."
 
     next_event = data["earningsCalendar"][0]
@@ -61,11 +102,28 @@ def get_earnings_calendar(ticker):
 
 def get_insider_sentiment(ticker):
     """สรุปทิศทาง insider buy/sell ล่าสุด"""
-    data = _finnhub_get("stock/insider-transactions", {"symbol": ticker})
-    if not data or not data.get("data"):
+    return format_insider_sentiment(_finnhub_get("stock/insider-transactions", {"symbol": ticker}))
+
+
+def _insider_transactions(data):
+    """รายการ insider ล่าสุด 10 รายการ payload ที่ไม่ใช่ dict ที่มี data (เช่น {"error": ...}) ได้ []"""
+    if not isinstance(data, dict) or not isinstance(data.get("data"), list):
+        return []
+    return data["data"][:10]
+
+
+def _latest_recommendation(data):
+    """recommendation ล่าสุด (dict) payload ที่ไม่ใช่ list ที่ไม่ว่าง (เช่น {"error": ...}) ได้ None"""
+    if not isinstance(data, list) or not data or not isinstance(data[0], dict):
+        return None
+    return data[0]
+
+
+def format_insider_sentiment(data):
+    transactions = _insider_transactions(data)
+    if not transactions:
         return "Insider Activity: N/A"
 
-    transactions = data["data"][:10]
     buys = sum(1 for t in transactions if t.get("change", 0) > 0)
     sells = sum(1 for t in transactions if t.get("change", 0) < 0)
 
@@ -74,20 +132,26 @@ def get_insider_sentiment(ticker):
 
 def get_analyst_recommendation(ticker):
     """สรุป consensus ของนักวิเคราะห์ล่าสุด"""
-    data = _finnhub_get("stock/recommendation", {"symbol": ticker})
-    if not data:
+    return format_analyst_recommendation(_finnhub_get("stock/recommendation", {"symbol": ticker}))
+
+
+def format_analyst_recommendation(data):
+    latest = _latest_recommendation(data)
+    if latest is None:
         return "Analyst Rating: N/A"
 
-    latest = data[0]
     return (f"Analyst Rating: Buy={latest.get('buy', 0)} "
             f"Hold={latest.get('hold', 0)} Sell={latest.get('sell', 0)} "
             f"StrongBuy={latest.get('strongBuy', 0)} StrongSell={latest.get('strongSell', 0)}")
 
 
-def get_float_data(ticker):
+def get_float_data(ticker, use_cache=True):
     """ดึง shares outstanding + float (ล้านหุ้น) จาก Finnhub — float ต่ำ = ขยับรุนแรงกว่าด้วยแรงซื้อเท่ากัน"""
-    data = _finnhub_get("stock/profile2", {"symbol": ticker})
-    if not data or "floatingShare" not in data:
+    return float_data_from_profile(_finnhub_get("stock/profile2", {"symbol": ticker}, use_cache=use_cache))
+
+
+def float_data_from_profile(data):
+    if not isinstance(data, dict) or "floatingShare" not in data:
         return None
     return {
         "shares_outstanding_m": data.get("shareOutstanding"),
@@ -97,7 +161,10 @@ def get_float_data(ticker):
 
 def get_float_context(ticker):
     """string สำหรับใส่ใน prompt AI"""
-    info = get_float_data(ticker)
+    return format_float_context(get_float_data(ticker))
+
+
+def format_float_context(info):
     if not info or info["float_m"] is None:
         return "Float: N/A"
     return f"Float: {info['float_m']:.1f}M shares (Shares Outstanding: {info['shares_outstanding_m']:.1f}M)"
@@ -105,12 +172,15 @@ def get_float_context(ticker):
 
 def get_float_momentum_multiplier(ticker):
     """แปลง float เป็นตัวคูณ momentum score (ไม่ใช่ direction — float ไม่บอกขึ้น/ลง
-    แค่บอกว่า 'ขยับแรงได้ง่ายแค่ไหน') ใช้ใน screener ตอนจัดอันดับหุ้นซิ่ง"""
+    แค่บอกว่า 'ขยับแรงได้ง่ายแค่ไหน') ยิง Finnhub ทุกครั้ง — screener ใช้ float_table แทน"""
     info = get_float_data(ticker)
-    if not info or info["float_m"] is None:
-        return 1.0
+    return float_multiplier_from_float(info["float_m"] if info else None)
+
 
-    float_m = info["float_m"]
+def float_multiplier_from_float(float_m):
+    """เกณฑ์แบ่งช่วง float (ล้านหุ้น) -> ตัวคูณ ไม่รู้ float = 1.0 (ไม่ให้/ไม่หักคะแนน)"""
+    if float_m is None:
+        return 1.0
     if float_m < 20:
         return 1.5    # float ต่ำมาก (<20M) ขยับแรงง่ายสุด
     if float_m < 50:
@@ -125,20 +195,25 @@ def get_fundamental_signal_score(ticker):
     if not ticker or ticker == "GENERAL" or not FINNHUB_API_KEY:
         return 0
 
+    insider_data = _finnhub_get("stock/insider-transactions", {"symbol": ticker})
+    rec_data = _finnhub_get("stock/recommendation", {"symbol": ticker})
+    return fundamental_score_from_data(insider_data, rec_data)
+
+
+def fundamental_score_from_data(insider_data, rec_data):
+    """คำนวณคะแนน -2..+2 จาก payload insider-transactions + recommendation ที่ดึงมาแล้ว"""
     score = 0
 
-    insider_data = _finnhub_get("stock/insider-transactions", {"symbol": ticker})
-    if insider_data and insider_data.get("data"):
-        transactions = insider_data["data"][:10]
+    transactions = _insider_transactions(insider_data)
+    if transactions:
         net = sum(t.get("change", 0) for t in transactions)
         if net > 0:
             score += 1
         elif net < 0:
             score -= 1
 
-    rec_data = _finnhub_get("stock/recommendation", {"symbol": ticker})
-    if rec_data:
-        latest = rec_data[0]
+    latest = _latest_recommendation(rec_data)
+    if latest is not None:
         bullish = latest.get("buy", 0) + latest.get("strongBuy", 0)
         bearish = latest.get("sell", 0) + latest.get("strongSell", 0)
         if bullish > bearish:
@@ -164,3 +239,27 @@ def get_fundamental_context(ticker):
         get_analyst_recommendation(ticker),
     ]
     return "\n".join(lines)
+
+
+def get_fundamental_payload_fetchers(ticker):
+    """ตัวดึง payload ดิบของ Finnhub แต่ละ endpoint (ชื่อ -> callable) ให้ SignalSnapshot ยิงพร้อมกันครั้งเดียว
+    แล้วใช้ payload ชุดเดียวกันสร้างทั้ง context string และ score (เดิม insider/recommendation ถูกยิงซ้ำ 2 รอบ)"""
+    return {
+        "finnhub_metric": lambda: _finnhub_get("stock/metric", {"symbol": ticker, "metric": "all"}),
+        "finnhub_profile": lambda: _finnhub_get("stock/profile2", {"symbol": ticker}),
+        "finnhub_earnings": lambda: _finnhub_get("calendar/earnings", earnings_calendar_params(ticker)),
+        "finnhub_insider": lambda: _finnhub_get("stock/insider-transactions", {"symbol": ticker}),
+        "finnhub_recommendation": lambda: _finnhub_get("stock/recommendation", {"symbol": ticker}),
+    }
+
+
+def build_fundamental_context(metric, profile, earnings, insider, recommendation):
+    """เหมือน get_fundamental_context แต่สร้างจาก payload ที่ดึงมาแล้ว (ไม่ยิง API เพิ่ม)"""
+    lines = [
+        format_fundamentals(metric),
+        format_float_context(float_data_from_profile(profile)),
+        format_earnings_calendar(earnings),
+        format_insider_sentiment(insider),
+        format_analyst_recommendation(recommendation),
+    ]
+    return "\n".join(lines)
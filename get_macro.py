@@ -1,8 +1,10 @@
 import os
-import requests
-import yfinance as yf
+import http_client
 from dotenv import load_dotenv
 
+from ttl_cache import cache_get, cache_set
+from bar_store import download
+
 load_dotenv()
 
 FRED_API_KEY = os.getenv("FRED_API_KEY")
@@ -14,29 +16,79 @@ FRED_SERIES = {
     "CPI (Inflation)": "CPIAUCSL",
     "Unemployment Rate": "UNRATE",
 }
+# series ทั้งหมดเป็นรายเดือน cache ไว้ 1 วันก็สดพอ
+FRED_CACHE_TTL = 24 * 3600
+
 
+# ดัชนีหลักสำหรับ market context — ดึงพร้อม VIX ใน yf.download ครั้งเดียวต่อรอบ
+MARKET_INDICES = {
+    "S&P 500": "^GSPC",
+    "Bitcoin": "BTC-USD",
+}
+VIX_SYMBOL = "^VIX"
+# สั้นกว่ารอบสแกน 5 นาทีเล็กน้อย: 1 snapshot ต่อรอบ ใช้ร่วมกันทั้ง prompt, macro score ทุก ticker
+# และข้าม process ระหว่าง scheduler กับ webhook (ผ่าน ttl_cache บน disk)
+MARKET_SNAPSHOT_TTL = 240
+
+
+def _download_index_closes():
+    """ราคาปิด 2 แท่งล่าสุดของทุก index ในการเรียก yf.download ครั้งเดียว คืน dict symbol -> [prev, last]"""
+    symbols = list(MARKET_INDICES.values()) + [VIX_SYMBOL]
+    data = download(symbols, "1d", period="5d")
+    closes = {}
+    for symbol in symbols:
+        try:
+            # BTC เทรดวันหยุดด้วย แถวของ ^GSPC/^VIX วันนั้นเป็น NaN ต้อง dropna แยกรายตัว
+            series = data[symbol]["Close"].dropna()
+        except KeyError:
+            continue
+        if not series.empty:
+            closes[symbol] = [float(v) for v in series.iloc[-2:]]
+    return closes
+
+
+def get_market_snapshot():
+    """ภาพรวมตลาดของรอบนี้ (index closes, VIX, FRED) สร้างครั้งเดียวแล้วใช้ร่วมกันจนหมดอายุ
+
+    Returns dict:
+        indices: ชื่อ index -> [prev_close, last_close]
+        vix: ค่า VIX ล่าสุด (None ถ้าดึงไม่ได้)
+        fred: ชื่อ series -> observation ล่าสุด (None ถ้าไม่ได้ตั้ง FRED_API_KEY)
+    """
+    snapshot = cache_get("market_snapshot", "latest")
+    if snapshot is not None:
+        return snapshot
 
-def _get_vix_value():
     try:
-        df = yf.Ticker("^VIX").history(period="5d")
-        return None if df.empty else float(df["Close"].iloc[-1])
-    except Exception:
-        return None
+        closes = _download_index_closes()
+    except Exception as e:
+        print(f"⚠️ Market Snapshot Error: {e}")
+        closes = {}
+
+    vix_closes = closes.get(VIX_SYMBOL)
+    snapshot = {
+        "indices": {name: closes[symbol] for name, symbol in MARKET_INDICES.items() if symbol in closes},
+        "vix": vix_closes[-1] if vix_closes else None,
+        "fred": {name: _fred_latest(series_id) for name, series_id in FRED_SERIES.items()} if FRED_API_KEY else None,
+    }
+    if closes:
+        cache_set("market_snapshot", "latest", snapshot, MARKET_SNAPSHOT_TTL)
+    return snapshot
 
 
-def get_vix():
-    """ดึงดัชนีความกลัวตลาด VIX จาก yfinance (ฟรี)"""
-    vix = _get_vix_value()
+def get_vix(snapshot=None):
+    """ดัชนีความกลัวตลาด VIX (จาก market snapshot ของรอบนี้)"""
+    vix = (snapshot or get_market_snapshot())["vix"]
     if vix is None:
         return "VIX: N/A"
     level = "HIGH FEAR" if vix > 25 else "LOW FEAR" if vix < 15 else "NEUTRAL"
     return f"VIX: {vix:.1f} ({level})"
 
 
-def get_macro_signal_score():
+def get_macro_signal_score(snapshot=None):
     """แปลง VIX เป็นคะแนนสัญญาณเชิงปริมาณ (-2..+2) สำหรับ confluence scoring
     VIX ต่ำ (<15) = risk-on/bullish, VIX สูง (>25) = risk-off/bearish"""
-    vix = _get_vix_value()
+    vix = (snapshot or get_market_snapshot())["vix"]
     if vix is None:
         return 0
     if vix < 15:
@@ -49,6 +101,10 @@ def get_macro_signal_score():
 def _fred_latest(series_id):
     if not FRED_API_KEY:
         return None
+    cached_obs = cache_get("fred", series_id)
+    if cached_obs is not None:
+        return cached_obs
+
     params = {
         "series_id": series_id,
         "api_key": FRED_API_KEY,
@@ -57,24 +113,27 @@ def _fred_latest(series_id):
         "limit": 1,
     }
     try:
-        res = requests.get(FRED_BASE, params=params, timeout=10).json()
+        res = http_client.get(FRED_BASE, params=params, timeout=10).json()
         obs = res.get("observations", [])
-        return obs[0] if obs else None
     except Exception as e:
         print(f"❌ FRED Error ({series_id}): {e}")
         return None
 
+    latest = obs[0] if obs else None
+    cache_set("fred", series_id, latest, FRED_CACHE_TTL)
+    return latest
 
-def get_macro_context():
+
+def get_macro_context(snapshot=None):
     """รวมข้อมูล Macro (Fed Rate, CPI, Unemployment, VIX) เป็น context string"""
-    lines = [get_vix()]
+    snapshot = snapshot or get_market_snapshot()
+    lines = [get_vix(snapshot)]
 
-    if not FRED_API_KEY:
+    if snapshot["fred"] is None:
         lines.append("Macro data (Fed/CPI/Unemployment) unavailable (FRED_API_KEY not set).")
         return "\n".join(lines)
 
-    for name, series_id in FRED_SERIES.items():
-        obs = _fred_latest(series_id)
+    for name, obs in snapshot["fred"].items():
         if obs:
             lines.append(f"{name}: {obs['value']} (as of {obs['date']})")
         else:
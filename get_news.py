@@ -1,16 +1,232 @@
 # main_news.py
-import time
-import requests
+import os
+import http_client
+from concurrent.futures import ThreadPoolExecutor, as_completed
 # 👇 Import เพิ่ม: get_current_price และ save_prediction
-from services import analyze_content, send_line_push, get_current_price, get_market_context, ALPHA_VANTAGE_API_KEY, IMPACT_THRESHOLD
-from db_handler import save_prediction
+from services import analyze_content, get_llm_gate_stats, send_line_push, get_current_price, get_quotes, get_market_context, ALPHA_VANTAGE_API_KEY, IMPACT_THRESHOLD
+from get_macro import get_market_snapshot
+from db_handler import save_prediction, get_news_cursor, save_news_cursor
+from ttl_cache import cache_get, cache_set
+from rate_limiter import acquire
 
-def run_news_bot():
+# สั้นกว่ารอบสแกน 5 นาทีเล็กน้อย: รอบปกติยังได้ข่าวใหม่ แต่ /scan จาก webhook หรือ restart ที่ซ้อนกันใช้ cache ได้
+NEWS_CACHE_TTL = 240
+# จำนวน ticker ที่ประมวลผลพร้อมกัน (throughput จริงถูกคุมด้วย quota ใน rate_limiter)
+NEWS_PIPELINE_WORKERS = int(os.getenv("NEWS_PIPELINE_WORKERS", "4"))
+# จำนวน ticker ต่อ 1 LLM call (1 = วิเคราะห์ทีละตัวแบบ pipeline ค่าเริ่มต้น; >1 = โหมด batch ต้องเปิดเอง
+# เพราะโหมด batch ดึงข่าวทุกตัวให้เสร็จก่อน การดึงของตัวถัดไปจึงไม่ทับกับเวลารอ LLM แบบ pipeline)
+NEWS_LLM_BATCH_SIZE = int(os.getenv("NEWS_LLM_BATCH_SIZE", "1"))
+
+
+def fetch_news_feed(ticker, time_from=None):
+    """ดึงข่าว NEWS_SENTIMENT ล่าสุดของ ticker (1 request) คืน list ของข่าว
+    time_from (YYYYMMDDTHHMM) = ขอเฉพาะข่าวตั้งแต่เวลานี้ (high-water mark ของรอบก่อน)"""
+    cache_key = f"{ticker}:{time_from or ''}"
+    cached_feed = cache_get("alphavantage_news", cache_key)
+    if cached_feed is not None:
+        return cached_feed
+
+    # ✅ แก้ไข 1: ขอ max limit = 50 ไปเลย (ใช้ 1 request เท่าเดิม ไม่เสียของ)
+    url = f"https://www.alphavantage.co/query?function=NEWS_SENTIMENT&tickers={ticker}&sort=LATEST&limit=50&apikey={ALPHA_VANTAGE_API_KEY}"
+    if time_from:
+        url += f"&time_from={time_from}"
+
+    acquire("alphavantage")
+    try:
+        res = http_client.get(url).json()
+    except Exception as e:
+        print(f"❌ API Error: {e}")
+        return []
+
+    all_feed = res.get("feed", [])
+    # ตอบ "Information"/"Note" (โควต้าหมด) จะไม่มี feed -> ไม่ cache ให้รอบหน้าลองใหม่
+    if "feed" in res:
+        cache_set("alphavantage_news", cache_key, all_feed, NEWS_CACHE_TTL)
+    return all_feed
+
+
+def filter_unseen_news(all_feed, cursor):
+    """ตัดข่าวที่เคยวิเคราะห์ไปแล้วออก (time_from ละเอียดแค่ระดับนาที ข่าวในนาทีเดียวกันจึงอาจกลับมาซ้ำ)"""
+    if not cursor:
+        return all_feed
+    seen = set(cursor["seen_urls"])
+    last = cursor["last_time_published"] or ""
+    return [n for n in all_feed
+            if n.get("url") not in seen and n.get("time_published", "") >= last]
+
+
+def advance_news_cursor(ticker, cursor, new_feed):
+    """เลื่อน high-water mark ไปที่ข่าวล่าสุดที่เพิ่งวิเคราะห์"""
+    seen_urls = list(cursor["seen_urls"]) if cursor else []
+    # feed เรียง LATEST มาก่อน -> กลับด้านให้ seen_urls เรียงเก่า -> ใหม่
+    seen_urls += [n["url"] for n in reversed(new_feed) if n.get("url")]
+    times = [n.get("time_published", "") for n in new_feed]
+    if cursor and cursor["last_time_published"]:
+        times.append(cursor["last_time_published"])
+    save_news_cursor(ticker, max(times), seen_urls)
+
+
+def select_relevant_news(ticker, all_feed):
+    """✅ แก้ไข 2: ระบบคัดกรองข่าว (Smart Filter) — เรียงตาม relevance ของ ticker แล้วเอา 10 อันดับแรก"""
+    if not all_feed:
+        return []
+
+    print(f"   - [{ticker}] Found {len(all_feed)} raw news items.")
+
+    # วนลูปเช็คความเกี่ยวข้อง (Relevance Score)
+    sorted_feed = []
+    for news in all_feed:
+        # หา score ของ ticker ปัจจุบันในข่าวนี้
+        ticker_relevance = 0.0
+        for topic in news.get('ticker_sentiment', []):
+            if topic['ticker'] == ticker:
+                ticker_relevance = float(topic['relevance_score'])
+                break
+
+        # เก็บไว้เพื่อเรียงลำดับ
+        sorted_feed.append((ticker_relevance, news))
+
+    # เรียงจากมากไปน้อย (Score สูงสุดขึ้นก่อน)
+    sorted_feed.sort(key=lambda x: x[0], reverse=True)
+
+    # ตัดเอาเฉพาะ 10 อันดับแรกที่เกี่ยวข้องที่สุด
+    # (หรือเอาข่าวที่มี Score > 0.5 เท่านั้นก็ได้)
+    filtered_feed = [item[1] for item in sorted_feed[:10]]
+
+    print(f"   - [{ticker}] Filtered down to top {len(filtered_feed)} most relevant items.")
+    return filtered_feed
+
+
+def send_news_alert(ticker, analysis):
+    """บันทึกคำทำนายลง DB + ส่ง LINE (เฉพาะตัวที่ผ่าน IMPACT_THRESHOLD แล้ว)"""
+    score = analysis.get('impact_score', 0)
+    current_price = get_current_price(ticker)
+
+    # บันทึกลง DB
+    save_prediction(
+        symbol=ticker,
+        source_type="NEWS",
+        summary=analysis.get('summary_message'),
+        direction=analysis.get('predicted_direction', 'NEUTRAL'),
+        score=score,
+        current_price=current_price,
+        target_price=analysis.get('target_price'),
+        stop_loss_price=analysis.get('stop_loss_price'),
+        time_horizon_days=analysis.get('time_horizon_days'),
+        confluence_count=analysis.get('confluence_count')
+    )
+
+    # ส่ง LINE
+    direction_emoji = "📈" if analysis.get('predicted_direction') == "UP" else "📉"
+    msg = f"📰 ข่าวหุ้น: {ticker}\n"
+    msg += f"🔮 AI ทาย: {analysis.get('predicted_direction')} {direction_emoji}\n"
+    msg += f"🔥 ความแรง: {score}/10 (Confluence {analysis.get('confluence_count', 'N/A')}/6)\n"
+    msg += f"💰 ราคา: ${current_price}\n"
+    msg += f"🎯 เป้าหมาย: ${analysis.get('target_price', 'N/A')} | 🛑 ตัดขาดทุน: ${analysis.get('stop_loss_price', 'N/A')}\n"
+    msg += f"⏱️ กรอบเวลา: {analysis.get('time_horizon_days', 'N/A')} วัน\n"
+    msg += f"------------------\n{analysis.get('summary_message')}\n------------------\n💡 {analysis.get('reason')}"
+
+    send_line_push(msg)
+    print(f"✅ Alert sent for {ticker}")
+
+
+def fetch_ticker_news(ticker):
+    """ดึงข่าว -> ตัดข่าวที่เคยเห็น -> คัดกรอง ของ ticker เดียว (รันพร้อมกันหลายตัวใน run_news_bot)
+    คืน (cursor, new_feed, filtered_feed) หรือ None ถ้าไม่มีอะไรต้องวิเคราะห์"""
+    print(f"🔍 Checking News for: {ticker}")
+
+    # ดึงเฉพาะข่าวใหม่กว่า high-water mark ของรอบก่อน (ไม่จ่าย LLM/quota วิเคราะห์ข่าวเดิมซ้ำทุก 5 นาที)
+    cursor = get_news_cursor(ticker)
+    time_from = cursor["last_time_published"][:13] if cursor and cursor["last_time_published"] else None
+    new_feed = filter_unseen_news(fetch_news_feed(ticker, time_from), cursor)
+    if cursor and not new_feed:
+        print(f"⏭️ [{ticker}] ไม่มีข่าวใหม่ตั้งแต่ {cursor['last_time_published']} ข้ามการวิเคราะห์")
+        return None
+
+    filtered_feed = select_relevant_news(ticker, new_feed)
+    if not filtered_feed:
+        print(f"⚠️ [{ticker}] No relevant news found")
+        return None
+    return cursor, new_feed, filtered_feed
+
+
+def handle_news_analysis(ticker, cursor, new_feed, analysis):
+    """เลื่อน cursor + แจ้งเตือนตามผลวิเคราะห์ของ ticker เดียว"""
+    # เลื่อน high-water mark เฉพาะเมื่อวิเคราะห์สำเร็จ (AI ล่ม -> รอบหน้าจะได้ลองข่าวชุดนี้ใหม่)
+    if analysis is not None:
+        advance_news_cursor(ticker, cursor, new_feed)
+
+    score = analysis.get('impact_score', 0) if analysis else 0
+
+    if analysis and score > IMPACT_THRESHOLD:
+        send_news_alert(ticker, analysis)
+    else:
+        print(f"💤 [{ticker}] Impact low ({score})")
+
+
+def process_news_ticker(ticker, market_context, market_snapshot):
+    """ดึงข่าว -> คัดกรอง -> ให้ AI วิเคราะห์ -> แจ้งเตือน ของ ticker เดียว (โหมดไม่ batch)"""
+    fetched = fetch_ticker_news(ticker)
+    if fetched is None:
+        return
+    cursor, new_feed, filtered_feed = fetched
+
+    # 3. ส่งให้ AI วิเคราะห์ (เฉพาะเนื้อๆ เน้นๆ)
+    analysis = analyze_content("NEWS", ticker, filtered_feed, market_context=market_context,
+                               market_snapshot=market_snapshot)
+    handle_news_analysis(ticker, cursor, new_feed, analysis)
+
+
+def process_news_batch(fetched, market_context, market_snapshot):
+    """วิเคราะห์ข่าวหลาย ticker ใน LLM call เดียว แล้วเลื่อน cursor/แจ้งเตือนทีละตัว
+    fetched: dict ticker -> (cursor, new_feed, filtered_feed) จาก fetch_ticker_news"""
+    tickers = list(fetched)
+    analyses = analyze_content("NEWS", tickers, {t: fetched[t][2] for t in tickers},
+                               market_context=market_context, market_snapshot=market_snapshot)
+    # ราคาของทุกตัวที่จะแจ้งเตือนในก้อนนี้ดึงครั้งเดียว (send_news_alert อ่านจาก cache ของ quote_service)
+    alerting = [t for t in tickers if (analyses.get(t) or {}).get('impact_score', 0) > IMPACT_THRESHOLD]
+    if alerting:
+        get_quotes(alerting)
+    for ticker in tickers:
+        cursor, new_feed, _ = fetched[ticker]
+        try:
+            handle_news_analysis(ticker, cursor, new_feed, analyses.get(ticker))
+        except Exception as e:
+            print(f"❌ [{ticker}] News alert error: {e}")
+
+
+def run_news_batches(tickers, market_context, market_snapshot):
+    """โหมด batch: ดึงข่าวทุกตัวพร้อมกันก่อน แล้วส่งตัวที่มีข่าวใหม่ให้ AI ทีละก้อน NEWS_LLM_BATCH_SIZE ตัว
+    (prompt ส่วนกลาง — market context, สถิติ, บทเรียน — ส่งครั้งเดียวต่อก้อนแทนครั้งเดียวต่อ ticker)"""
+    fetched = {}
+    with ThreadPoolExecutor(max_workers=NEWS_PIPELINE_WORKERS, thread_name_prefix="news") as pool:
+        futures = {pool.submit(fetch_ticker_news, ticker): ticker for ticker in tickers}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"❌ [{futures[future]}] News pipeline error: {e}")
+                continue
+            if result is not None:
+                fetched[futures[future]] = result
+
+    # คงลำดับตาม target_ticker.txt
+    selected = [t for t in tickers if t in fetched]
+    for i in range(0, len(selected), NEWS_LLM_BATCH_SIZE):
+        chunk = selected[i:i + NEWS_LLM_BATCH_SIZE]
+        try:
+            process_news_batch({t: fetched[t] for t in chunk}, market_context, market_snapshot)
+        except Exception as e:
+            print(f"❌ News batch {chunk} error: {e}")
+
+
+def run_news_bot(market_snapshot=None):
     print("\n📰 --- STARTING NEWS BOT (Smart Filter Mode) ---")
     
-    # 1. ดึงภาพรวมตลาด
+    # 1. ดึงภาพรวมตลาด (snapshot เดียวต่อรอบ ใช้ทั้ง prompt และ macro score ของทุก ticker)
     print("🌍 Fetching Global Market Context...")
-    market_context = get_market_context()
+    market_snapshot = market_snapshot or get_market_snapshot()
+    market_context = get_market_context(market_snapshot)
 
     try:
         with open("target_ticker.txt", "r") as f:
@@ -19,90 +235,25 @@ def run_news_bot():
         print("❌ ไม่พบไฟล์ target_ticker.txt")
         return
 
-    for i, ticker in enumerate(tickers):
-        print(f"🔍 Checking News for: {ticker}")
-        
-        # ✅ แก้ไข 1: ขอ max limit = 50 ไปเลย (ใช้ 1 request เท่าเดิม ไม่เสียของ)
-        url = f"https://www.alphavantage.co/query?function=NEWS_SENTIMENT&tickers={ticker}&sort=LATEST&limit=50&apikey={ALPHA_VANTAGE_API_KEY}"
-        
-        try:
-            res = requests.get(url).json()
-            all_feed = res.get("feed", [])
-        except Exception as e:
-            print(f"❌ API Error: {e}")
-            all_feed = []
-
-        # ✅ แก้ไข 2: ระบบคัดกรองข่าว (Smart Filter)
-        filtered_feed = []
-        if all_feed:
-            print(f"   - Found {len(all_feed)} raw news items.")
-            
-            # วนลูปเช็คความเกี่ยวข้อง (Relevance Score)
-            sorted_feed = []
-            for news in all_feed:
-                # หา score ของ ticker ปัจจุบันในข่าวนี้
-                ticker_relevance = 0.0
-                for topic in news.get('ticker_sentiment', []):
-                    if topic['ticker'] == ticker:
-                        ticker_relevance = float(topic['relevance_score'])
-                        break
-                
-                # เก็บไว้เพื่อเรียงลำดับ
-                sorted_feed.append((ticker_relevance, news))
-            
-            # เรียงจากมากไปน้อย (Score สูงสุดขึ้นก่อน)
-            sorted_feed.sort(key=lambda x: x[0], reverse=True)
-            
-            # ตัดเอาเฉพาะ 10 อันดับแรกที่เกี่ยวข้องที่สุด
-            # (หรือเอาข่าวที่มี Score > 0.5 เท่านั้นก็ได้)
-            filtered_feed = [item[1] for item in sorted_feed[:10]]
-            
-            print(f"   - Filtered down to top {len(filtered_feed)} most relevant items.")
-
-        # 3. ส่งให้ AI วิเคราะห์ (เฉพาะเนื้อๆ เน้นๆ)
-        if filtered_feed:
-            analysis = analyze_content("NEWS", ticker, filtered_feed, market_context=market_context)
-            
-            score = analysis.get('impact_score', 0) if analysis else 0
-
-            if analysis and score > IMPACT_THRESHOLD:
-                current_price = get_current_price(ticker)
-
-                # บันทึกลง DB
-                save_prediction(
-                    symbol=ticker,
-                    source_type="NEWS",
-                    summary=analysis.get('summary_message'),
-                    direction=analysis.get('predicted_direction', 'NEUTRAL'),
-                    score=score,
-                    current_price=current_price,
-                    target_price=analysis.get('target_price'),
-                    stop_loss_price=analysis.get('stop_loss_price'),
-                    time_horizon_days=analysis.get('time_horizon_days'),
-                    confluence_count=analysis.get('confluence_count')
-                )
-
-                # ส่ง LINE
-                direction_emoji = "📈" if analysis.get('predicted_direction') == "UP" else "📉"
-                msg = f"📰 ข่าวหุ้น: {ticker}\n"
-                msg += f"🔮 AI ทาย: {analysis.get('predicted_direction')} {direction_emoji}\n"
-                msg += f"🔥 ความแรง: {score}/10 (Confluence {analysis.get('confluence_count', 'N/A')}/6)\n"
-                msg += f"💰 ราคา: ${current_price}\n"
-                msg += f"🎯 เป้าหมาย: ${analysis.get('target_price', 'N/A')} | 🛑 ตัดขาดทุน: ${analysis.get('stop_loss_price', 'N/A')}\n"
-                msg += f"⏱️ กรอบเวลา: {analysis.get('time_horizon_days', 'N/A')} วัน\n"
-                msg += f"------------------\n{analysis.get('summary_message')}\n------------------\n💡 {analysis.get('reason')}"
-                
-                send_line_push(msg)
-                print(f"✅ Alert sent for {ticker}")
-            else:
-                print(f"💤 Impact low ({score})")
-        else:
-            print("⚠️ No relevant news found")
-
-        if i < len(tickers) - 1:
-            print("⏳ Waiting 15s...")
-            time.sleep(15)
+    gate_before = get_llm_gate_stats()
+
+    # 2. ประมวลผลหลาย ticker พร้อมกัน (แทน time.sleep(15) คั่นทีละตัว) — การดึงข้อมูลของตัวถัดไป
+    # ทับซ้อนกับเวลารอ LLM ของตัวก่อนหน้า ส่วน quota ของแต่ละเจ้าคุมด้วย rate_limiter เท่านั้น
+    if NEWS_LLM_BATCH_SIZE <= 1:
+        with ThreadPoolExecutor(max_workers=NEWS_PIPELINE_WORKERS, thread_name_prefix="news") as pool:
+            futures = {pool.submit(process_news_ticker, ticker, market_context, market_snapshot): ticker
+                       for ticker in tickers}
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"❌ [{futures[future]}] News pipeline error: {e}")
+    else:
+        run_news_batches(tickers, market_context, market_snapshot)
+
+    gate_after = get_llm_gate_stats()
+    print(f"🚦 LLM pre-gate: ข้าม {gate_after['skipped'] - gate_before['skipped']} ticker, "
+          f"เรียกจริง {gate_after['called'] - gate_before['called']} ticker")
 
 if __name__ == "__main__":
     run_news_bot()
-
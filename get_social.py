@@ -1,7 +1,7 @@
 # main_social.py
 import time
-import requests
-from services import analyze_content, send_line_push, get_current_price, TWITTER_BEARER_TOKEN, IMPACT_THRESHOLD
+import http_client
+from services import analyze_content, send_line_push, get_quotes, TWITTER_BEARER_TOKEN, IMPACT_THRESHOLD
 from db_handler import save_prediction
 
 def run_social_bot():
@@ -23,6 +23,7 @@ def run_social_bot():
         return
 
     headers = {"Authorization": f"Bearer {TWITTER_BEARER_TOKEN}"}
+    alerts = []
     
     for user in target_users:
         print(f"🔍 Checking Tweets: {user['handle']}")
@@ -30,7 +31,7 @@ def run_social_bot():
         url = f"https://api.twitter.com/2/users/{user['id']}/tweets?max_results=5&exclude=retweets,replies"
         
         try:
-            res = requests.get(url, headers=headers)
+            res = http_client.get(url, headers=headers)
             tweets = res.json().get("data", [])
         except Exception as e:
             print(f"❌ API Error: {e}")
@@ -45,41 +46,49 @@ def run_social_bot():
                 detected_ticker = analysis.get('specific_stock')
                 if not detected_ticker or detected_ticker == "GENERAL":
                     detected_ticker = user['default_stock']
-
-                # 2. ดึงราคาของหุ้นตัวนั้น
-                current_price = get_current_price(detected_ticker)
-
-                # 3. บันทึกลง DB
-                save_prediction(
-                    symbol=detected_ticker,
-                    source_type="TWEET",
-                    summary=analysis.get('summary_message'),
-                    direction=analysis.get('predicted_direction', 'NEUTRAL'),
-                    score=score,
-                    current_price=current_price,
-                    target_price=analysis.get('target_price'),
-                    stop_loss_price=analysis.get('stop_loss_price'),
-                    time_horizon_days=analysis.get('time_horizon_days')
-                )
-
-                # 4. ส่ง LINE
-                direction_emoji = "📈" if analysis.get('predicted_direction') == "UP" else "📉"
-                msg = f"⚡ FLASH UPDATE 🐦\n"
-                msg += f"🗣️ ต้นทาง: {user['handle']}\n"
-                msg += f"🎯 กระทบ: {detected_ticker} ({analysis.get('affected_sector')})\n"
-                msg += f"🔮 AI ทาย: {analysis.get('predicted_direction')} {direction_emoji}\n"
-                msg += f"🌊 ความแรง: {'🔴'*score} ({score}/10)\n"
-                msg += f"💰 ราคาตอนทาย: ${current_price}\n"
-                msg += f"🎯 เป้าหมาย: ${analysis.get('target_price', 'N/A')} | 🛑 ตัดขาดทุน: ${analysis.get('stop_loss_price', 'N/A')}\n"
-                msg += f"⏱️ กรอบเวลา: {analysis.get('time_horizon_days', 'N/A')} วัน\n"
-                msg += f"────────────────\n{analysis.get('summary_message')}\n────────────────\n💡 {analysis.get('reason')}"
-                
-                send_line_push(msg)
-                print(f"✅ Alert sent & Saved for {user['handle']} -> {detected_ticker}")
+                alerts.append((user, analysis, detected_ticker))
             else:
                 print(f"💤 Impact low ({score})")
             
         time.sleep(2)
 
+    if not alerts:
+        return
+
+    # 2. ดึงราคาของทุกหุ้นที่ต้องแจ้งเตือนในครั้งเดียว (batch)
+    prices = get_quotes([ticker for _, _, ticker in alerts])
+
+    for user, analysis, detected_ticker in alerts:
+        score = analysis.get('impact_score', 0)
+        current_price = prices.get(detected_ticker.upper(), 0.0)
+
+        # 3. บันทึกลง DB
+        save_prediction(
+            symbol=detected_ticker,
+            source_type="TWEET",
+            summary=analysis.get('summary_message'),
+            direction=analysis.get('predicted_direction', 'NEUTRAL'),
+            score=score,
+            current_price=current_price,
+            target_price=analysis.get('target_price'),
+            stop_loss_price=analysis.get('stop_loss_price'),
+            time_horizon_days=analysis.get('time_horizon_days')
+        )
+
+        # 4. ส่ง LINE
+        direction_emoji = "📈" if analysis.get('predicted_direction') == "UP" else "📉"
+        msg = f"⚡ FLASH UPDATE 🐦\n"
+        msg += f"🗣️ ต้นทาง: {user['handle']}\n"
+        msg += f"🎯 กระทบ: {detected_ticker} ({analysis.get('affected_sector')})\n"
+        msg += f"🔮 AI ทาย: {analysis.get('predicted_direction')} {direction_emoji}\n"
+        msg += f"🌊 ความแรง: {'🔴'*score} ({score}/10)\n"
+        msg += f"💰 ราคาตอนทาย: ${current_price}\n"
+        msg += f"🎯 เป้าหมาย: ${analysis.get('target_price', 'N/A')} | 🛑 ตัดขาดทุน: ${analysis.get('stop_loss_price', 'N/A')}\n"
+        msg += f"⏱️ กรอบเวลา: {analysis.get('time_horizon_days', 'N/A')} วัน\n"
+        msg += f"────────────────\n{analysis.get('summary_message')}\n────────────────\n💡 {analysis.get('reason')}"
+
+        send_line_push(msg)
+        print(f"✅ Alert sent & Saved for {user['handle']} -> {detected_ticker}")
+
 if __name__ == "__main__":
     run_social_bot()
\ No newline at end of file
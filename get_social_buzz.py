@@ -2,17 +2,25 @@
 'ความฮือฮา' ของ retail trader ต่อหุ้นตัวหนึ่ง และหาหุ้นที่กำลัง trending ทั้งแพลตฟอร์ม
 (หุ้นซิ่งหลายตัวจะโผล่ใน trending ก่อนที่จะอยู่ใน watchlist ของเราด้วยซ้ำ)"""
 
-import requests
+import http_client
+
+from ttl_cache import cache_get, cache_set, cached
+from rate_limiter import acquire
 
 STOCKTWITS_BASE = "https://api.stocktwits.com/api/2"
 # StockTwits บล็อก default User-Agent ของ requests (Cloudflare bot protection) ต้องปลอมเป็น browser
 HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
 
+STREAM_CACHE_TTL = 60
+TRENDING_CACHE_TTL = 300
+
 
+@cached("stocktwits_trending", ttl=TRENDING_CACHE_TTL)
 def get_trending_symbols():
     """หุ้นที่กำลัง trending ทั้งแพลตฟอร์ม StockTwits ตอนนี้ (ไม่ผูกกับ watchlist ของเรา)"""
     try:
-        res = requests.get(f"{STOCKTWITS_BASE}/trending/symbols.json", headers=HEADERS, timeout=10)
+        acquire("stocktwits")
+        res = http_client.get(f"{STOCKTWITS_BASE}/trending/symbols.json", headers=HEADERS, timeout=10)
         data = res.json()
         return [s["symbol"] for s in data.get("symbols", [])]
     except Exception as e:
@@ -20,29 +28,49 @@ def get_trending_symbols():
         return []
 
 
+def get_stocktwits_messages(ticker):
+    """ดึง stream ข้อความล่าสุดของ ticker คืน list (None ถ้าดึงไม่ได้) ใช้ร่วมกันทั้ง score และ context"""
+    cached_messages = cache_get("stocktwits_stream", ticker)
+    if cached_messages is not None:
+        return cached_messages
+
+    if not acquire("stocktwits", timeout=10):
+        print(f"⏳ StockTwits quota เต็ม ข้าม {ticker}")
+        return None
+
+    try:
+        res = http_client.get(f"{STOCKTWITS_BASE}/streams/symbol/{ticker}.json", headers=HEADERS, timeout=10)
+        # เก็บแค่ส่วนที่ใช้จริง (sentiment) — payload เต็มมี user profile ฯลฯ ทำให้ cache บวมเปล่าๆ
+        messages = [{"entities": {"sentiment": (m.get("entities") or {}).get("sentiment")}}
+                    for m in res.json().get("messages", [])]
+    except Exception as e:
+        print(f"❌ StockTwits Stream Error ({ticker}): {e}")
+        return None
+
+    cache_set("stocktwits_stream", ticker, messages, STREAM_CACHE_TTL)
+    return messages
+
+
 def get_stocktwits_sentiment_score(ticker):
     """นับ sentiment ที่ผู้ใช้ StockTwits ติด tag เอง (Bullish/Bearish) จากข้อความล่าสุด
     คืนคะแนน -2..+2 สำหรับ confluence scoring (ทิศทางจริงจากฝูงชน ไม่ใช่แค่ปริมาณ buzz)"""
     if not ticker or ticker == "GENERAL":
         return 0
+    return stocktwits_score_from_messages(get_stocktwits_messages(ticker))
 
-    try:
-        res = requests.get(f"{STOCKTWITS_BASE}/streams/symbol/{ticker}.json", headers=HEADERS, timeout=10)
-        messages = res.json().get("messages", [])
-    except Exception as e:
-        print(f"❌ StockTwits Sentiment Error ({ticker}): {e}")
-        return 0
 
-    bullish, bearish = 0, 0
-    for m in messages:
-        sentiment = (m.get("entities") or {}).get("sentiment")
-        if not sentiment:
-            continue
-        if sentiment.get("basic") == "Bullish":
-            bullish += 1
-        elif sentiment.get("basic") == "Bearish":
-            bearish += 1
+def _count_sentiment(messages):
+    sentiments = [(m.get("entities") or {}).get("sentiment") for m in messages]
+    bullish = sum(1 for s in sentiments if s and s.get("basic") == "Bullish")
+    bearish = sum(1 for s in sentiments if s and s.get("basic") == "Bearish")
+    return bullish, bearish
+
+
+def stocktwits_score_from_messages(messages):
+    if not messages:
+        return 0
 
+    bullish, bearish = _count_sentiment(messages)
     if bullish == 0 and bearish == 0:
         return 0
 
@@ -54,15 +82,12 @@ def get_social_buzz_context(ticker):
     """string สำหรับใส่ใน prompt AI"""
     if not ticker or ticker == "GENERAL":
         return "Social Buzz: N/A"
+    return format_social_buzz(get_stocktwits_messages(ticker))
 
-    try:
-        res = requests.get(f"{STOCKTWITS_BASE}/streams/symbol/{ticker}.json", headers=HEADERS, timeout=10)
-        messages = res.json().get("messages", [])
-    except Exception:
-        return "Social Buzz: N/A"
 
-    sentiments = [(m.get("entities") or {}).get("sentiment") for m in messages]
-    bullish = sum(1 for s in sentiments if s and s.get("basic") == "Bullish")
-    bearish = sum(1 for s in sentiments if s and s.get("basic") == "Bearish")
+def format_social_buzz(messages):
+    if messages is None:
+        return "Social Buzz: N/A"
 
+    bullish, bearish = _count_sentiment(messages)
     return f"StockTwits (last {len(messages)} msgs): {bullish} Bullish, {bearish} Bearish"
@@ -0,0 +1,73 @@
+"""ข้อมูลเทคนิคอล (ราคา, SMA50, RSI14 แบบ Wilder, MACD, ATR, VWAP) — แยกออกจาก services.py ให้ SignalSnapshot
+ดึงข้อมูลดิบครั้งเดียวแล้วใช้สร้างทั้ง string สำหรับ prompt และ score สำหรับ confluence
+อ่านแถวที่ screener คำนวณไว้แล้วทั้ง universe (indicators.get_row) ก่อน ไม่มีค่อยคำนวณเองจาก bar_store"""
+
+import numpy as np
+
+import indicators
+from bar_store import load_timeframes
+
+
+def _column(df, name):
+    return df[name].to_numpy(dtype="float64")[:, None]
+
+
+def _compute_row(ticker):
+    """คำนวณ indicator ของ ticker เดียวจาก bar_store (ticker ที่ไม่ได้อยู่ในรอบสแกนล่าสุด เช่นมาจากข่าว)"""
+    bars = load_timeframes([ticker], daily_period="1y", intraday_period="1d")
+    daily, intraday = bars["daily"][ticker].dropna(), bars["intraday"][ticker].dropna()
+    intraday_arrays = None
+    if len(intraday):
+        intraday_arrays = (_column(intraday, "High"), _column(intraday, "Low"), _column(intraday, "Close"),
+                           _column(intraday, "Volume"), intraday.index.normalize().asi8)
+    table = indicators.indicator_table([ticker], _column(daily, "Close"), _column(daily, "High"),
+                                       _column(daily, "Low"), intraday_arrays)
+    return table.iloc[0].to_dict()
+
+
+def fetch_technical_data(ticker):
+    """ดึงราคา/SMA50/RSI/MACD/ATR/VWAP ดิบ คืนเป็น dict (ใช้ทั้งทำ string โชว์ และคำนวณ score)"""
+    if not ticker or ticker == "GENERAL":
+        return None
+    try:
+        row = indicators.get_row(ticker) or _compute_row(ticker)
+        # ประวัติไม่ถึง 50 วัน คำนวณ SMA50 ไม่ได้
+        if np.isnan(row["sma50"]):
+            return None
+        return {**row, "rsi": row["rsi14"]}
+    except Exception as e:
+        print(f"⚠️ Technical Data Error: {e}")
+        return None
+
+
+def format_technical_analysis(data):
+    """แปลง dict จาก fetch_technical_data เป็น (string สำหรับ prompt, score -2..+2 สำหรับ confluence)"""
+    if not data:
+        return "Not enough data", 0
+
+    trend = "BULLISH (Above SMA50)" if data["price"] > data["sma50"] else "BEARISH (Below SMA50)"
+    rsi_status = "Overbought (>70)" if data["rsi"] > 70 else "Oversold (<30)" if data["rsi"] < 30 else "Neutral"
+    text = f"Price: ${data['price']:.2f} | SMA50: ${data['sma50']:.2f} ({trend}) | RSI(14): {data['rsi']:.1f} ({rsi_status})"
+    if not np.isnan(data.get("macd_hist", np.nan)):
+        momentum = "Bullish" if data["macd_hist"] > 0 else "Bearish"
+        text += f" | MACD hist: {data['macd_hist']:+.2f} ({momentum})"
+    if not np.isnan(data.get("atr_pct", np.nan)):
+        text += f" | ATR(14): {data['atr_pct']:.1f}% of price"
+    if not np.isnan(data.get("vwap", np.nan)):
+        side = "above" if data["price"] > data["vwap"] else "below"
+        text += f" | VWAP: ${data['vwap']:.2f} (price {side})"
+
+    score = 1 if data["price"] > data["sma50"] else -1
+    if data["rsi"] < 30:
+        score += 1
+    elif data["rsi"] > 70:
+        score -= 1
+
+    return text, max(-2, min(2, score))
+
+
+def get_technical_analysis(ticker):
+    """ดึงข้อมูลเทคนิคอลครั้งเดียว คืน (string สำหรับ prompt, score -2..+2 สำหรับ confluence)"""
+    if not ticker or ticker == "GENERAL":
+        return "N/A", 0
+    return format_technical_analysis(fetch_technical_data(ticker))
@@ -0,0 +1,96 @@
+"""HTTP client กลางของทุกโมดูล: ใช้ requests.Session แยกต่อ host (keep-alive connection pool
+ไม่ต้องเปิด TCP+TLS ใหม่ทุก call) + timeout default เสมอ (socket ที่ค้างตัวเดียวจะไม่แช่ BlockingScheduler)
++ retry อัตโนมัติเมื่อเจอ 429/5xx ด้วย exponential backoff แบบสุ่ม jitter และเคารพ header Retry-After
+
+ใช้แทน requests.get/requests.post ตรงๆ:
+    res = http_client.get(url, params=..., headers=...)"""
+
+import os
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_TIMEOUT = float(os.getenv("HTTP_DEFAULT_TIMEOUT", "15"))
+MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+BACKOFF_BASE = 0.5        # วินาที: รอบแรกรอ ~0.5s, รอบสอง ~1s, รอบสาม ~2s (คูณ jitter)
+BACKOFF_MAX = 20.0
+MAX_RETRY_AFTER = 60.0    # ไม่ยอมรอตาม Retry-After นานเกินนี้ (ให้ caller ไปจัดการต่อเอง)
+POOL_MAXSIZE = 32         # connection ต่อ host (fan-out ของ SignalSnapshot ยิงหลาย request ขนานกัน)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def _get_session(url):
+    host = urlsplit(url).netloc
+    with _sessions_lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAXSIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[host] = session
+        return session
+
+
+def _backoff_delay(attempt):
+    """full jitter: สุ่ม 0..(BACKOFF_BASE * 2^attempt) กันหลาย thread retry พร้อมกันเป็นจังหวะเดียว"""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+def _retry_after_delay(res):
+    """อ่าน Retry-After (เป็นวินาที หรือ HTTP date) คืน None ถ้าไม่มี/อ่านไม่ออก"""
+    value = res.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        delay = float(value)
+    except ValueError:
+        try:
+            delay = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return None
+    return max(0.0, min(delay, MAX_RETRY_AFTER))
+
+
+def request(method, url, timeout=None, retries=MAX_RETRIES, **kwargs):
+    """เหมือน requests.request แต่ใช้ session ที่ pool ไว้ + timeout default + retry 429/5xx
+    คืน Response สุดท้าย (อาจยังเป็น 429/5xx ถ้า retry ครบแล้ว) หรือ raise ถ้าต่อไม่ได้เลย"""
+    session = _get_session(url)
+    timeout = timeout or DEFAULT_TIMEOUT
+
+    for attempt in range(retries + 1):
+        try:
+            res = session.request(method, url, timeout=timeout, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            # POST ที่ read timeout อาจถึงปลายทางแล้ว — retry ได้เฉพาะกรณีต่อไม่ติดตั้งแต่แรก
+            retryable = method.upper() == "GET" or not isinstance(e, requests.ReadTimeout)
+            if attempt == retries or not retryable:
+                raise
+            delay = _backoff_delay(attempt)
+            print(f"🔁 HTTP {method} {urlsplit(url).netloc} error ({e.__class__.__name__}) retry in {delay:.1f}s")
+        else:
+            if res.status_code not in RETRY_STATUSES or attempt == retries:
+                return res
+            delay = _retry_after_delay(res)
+            if delay is None:
+                delay = _backoff_delay(attempt)
+            print(f"🔁 HTTP {method} {urlsplit(url).netloc} -> {res.status_code} retry in {delay:.1f}s")
+        time.sleep(delay)
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
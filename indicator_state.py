@@ -0,0 +1,320 @@
+"""State ของ indicator daily แบบ incremental ต่อ ticker (SMA จากผลรวมวิ่ง, EMA/MACD, RSI/ATR แบบ Wilder)
+แต่ละรอบสแกนแค่ต่อแท่งที่ปิดแล้วที่ยังไม่เคยเห็น (ปกติวันละแท่ง) แล้ว "peek" แท่งของวันนี้ที่ยังไม่ปิด
+โดยไม่บันทึกลง state — ต้นทุนต่อรอบคงที่ไม่ขึ้นกับความยาวประวัติ (เดิมคำนวณใหม่ทั้งหน้าต่างทุกรอบ)
+
+state ถูกบันทึกลง INDICATOR_STATE_PATH (JSON) ให้รอบถัดไปและตอน restart ใช้ต่อได้ ticker ที่ยังไม่มี state
+หรือห่างหายจนประวัติในมือไม่ต่อกับแท่งล่าสุดที่ commit ไว้ จะสร้างใหม่จาก daily ย้อน HISTORY_PERIOD ใน bar_store
+ค่าที่ได้ต้องเท่ากับ indicators.indicator_table ที่คำนวณใหม่ทั้งชุดจากประวัติเดียวกัน"""
+
+import os
+import json
+import math
+import tempfile
+import threading
+from collections import deque
+
+import pandas as pd
+
+from bar_store import MARKET_TZ, read_timeframes
+
+INDICATOR_STATE_PATH = os.getenv("INDICATOR_STATE_PATH", "cache/indicator_state.json")
+HISTORY_PERIOD = "1y"
+STATE_COLUMNS = ["price", "sma20", "sma50", "ema12", "ema26", "rsi14", "atr14", "atr_pct",
+                 "macd", "macd_signal", "macd_hist"]
+
+NAN = float("nan")
+
+
+class RollingMean:
+    """SMA n แท่งจากผลรวมวิ่ง (คิดผลรวมใหม่จากหน้าต่างทุก n แท่ง กัน error สะสมของการบวกลบ float)"""
+
+    def __init__(self, n, window=()):
+        self.n = n
+        self.window = deque(window, maxlen=n)
+        self.total = math.fsum(self.window)
+        self.pushes = 0
+
+    def push(self, x):
+        if len(self.window) == self.n:
+            self.total -= self.window[0]
+        self.window.append(x)
+        self.total += x
+        self.pushes += 1
+        if self.pushes % self.n == 0:
+            self.total = math.fsum(self.window)
+
+    def value(self):
+        return self.total / self.n if len(self.window) == self.n else NAN
+
+    def peek(self, x):
+        """ค่าถ้าต่อ x เข้าไป (ไม่แก้ state)"""
+        if len(self.window) + 1 < self.n:
+            return NAN
+        oldest = self.window[0] if len(self.window) == self.n else 0.0
+        return (self.total - oldest + x) / self.n
+
+    def to_dict(self):
+        return {"n": self.n, "window": list(self.window)}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d["n"], d["window"])
+
+
+class Smoothed:
+    """ค่าเฉลี่ยแบบ recursive: EMA (alpha = 2/(n+1)) หรือ Wilder (alpha = 1/n) เริ่มจาก SMA ของ n ค่าแรก"""
+
+    def __init__(self, n, alpha, value=None, seed=()):
+        self.n = n
+        self.alpha = alpha
+        self.value_ = value
+        self.seed = list(seed)
+
+    def push(self, x):
+        if self.value_ is None:
+            self.seed.append(x)
+            if len(self.seed) == self.n:
+                self.value_ = math.fsum(self.seed) / self.n
+                self.seed = []
+        else:
+            self.value_ = self.alpha * x + (1 - self.alpha) * self.value_
+
+    def value(self):
+        return NAN if self.value_ is None else self.value_
+
+    def ready_after_peek(self):
+        return self.value_ is not None or len(self.seed) + 1 == self.n
+
+    def peek(self, x):
+        if self.value_ is None:
+            return (math.fsum(self.seed) + x) / self.n if len(self.seed) + 1 == self.n else NAN
+        return self.alpha * x + (1 - self.alpha) * self.value_
+
+    def to_dict(self):
+        return {"n": self.n, "alpha": self.alpha, "value": self.value_, "seed": self.seed}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d["n"], d["alpha"], d["value"], d["seed"])
+
+
+def ema_state(n):
+    return Smoothed(n, 2.0 / (n + 1))
+
+
+def wilder_state(n):
+    return Smoothed(n, 1.0 / n)
+
+
+def _rsi(avg_gain, avg_loss):
+    """สูตรเดียวกับ indicators.rsi (ไม่มีแท่งลง = 100, ไม่ขยับเลย = 50)"""
+    if math.isnan(avg_gain) or math.isnan(avg_loss):
+        return NAN
+    if avg_loss == 0:
+        return 100.0 if avg_gain > 0 else 50.0
+    return 100 - 100 / (1 + avg_gain / avg_loss)
+
+
+class IndicatorState:
+    """state ของ ticker เดียว push() = commit แท่ง daily ที่ปิดแล้ว, values(pending) = ค่าล่าสุด (+ แท่งที่ยังไม่ปิด)"""
+
+    def __init__(self):
+        self.last_ts = None
+        self.prev_close = None
+        self.sma = {20: RollingMean(20), 50: RollingMean(50)}
+        self.ema = {12: ema_state(12), 26: ema_state(26)}
+        self.signal = ema_state(9)
+        self.gain = wilder_state(14)
+        self.loss = wilder_state(14)
+        self.atr = wilder_state(14)
+
+    def _true_range(self, high, low):
+        if self.prev_close is None:
+            return high - low
+        return max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+
+    def push(self, ts, high, low, close):
+        for s in self.sma.values():
+            s.push(close)
+        for e in self.ema.values():
+            e.push(close)
+        if self.ema[26].value_ is not None:
+            self.signal.push(self.ema[12].value() - self.ema[26].value())
+        if self.prev_close is not None:
+            delta = close - self.prev_close
+            self.gain.push(max(delta, 0.0))
+            self.loss.push(max(-delta, 0.0))
+        self.atr.push(self._true_range(high, low))
+        self.prev_close = close
+        self.last_ts = ts
+
+    def values(self, pending=None):
+        """ค่า indicator ล่าสุด pending = (high, low, close) ของแท่งที่ยังไม่ปิด (คิดรวมแต่ไม่ commit)"""
+        if pending is None:
+            if self.prev_close is None:
+                return {c: NAN for c in STATE_COLUMNS}
+            line = self.ema[12].value() - self.ema[26].value()
+            row = {
+                "price": self.prev_close,
+                "sma20": self.sma[20].value(), "sma50": self.sma[50].value(),
+                "ema12": self.ema[12].value(), "ema26": self.ema[26].value(),
+                "rsi14": _rsi(self.gain.value(), self.loss.value()),
+                "atr14": self.atr.value(),
+                "macd": line, "macd_signal": self.signal.value(),
+            }
+        else:
+            high, low, close = pending
+            ema12, ema26 = self.ema[12].peek(close), self.ema[26].peek(close)
+            line = ema12 - ema26
+            signal = self.signal.peek(line) if self.ema[26].ready_after_peek() else NAN
+            if self.prev_close is None:
+                rsi = NAN
+            else:
+                delta = close - self.prev_close
+                rsi = _rsi(self.gain.peek(max(delta, 0.0)), self.loss.peek(max(-delta, 0.0)))
+            row = {
+                "price": close,
+                "sma20": self.sma[20].peek(close), "sma50": self.sma[50].peek(close),
+                "ema12": ema12, "ema26": ema26, "rsi14": rsi,
+                "atr14": self.atr.peek(self._true_range(high, low)),
+                "macd": line, "macd_signal": signal,
+            }
+        row["macd_hist"] = row["macd"] - row["macd_signal"]
+        row["atr_pct"] = row["atr14"] / row["price"] * 100 if row["price"] else NAN
+        return row
+
+    def to_dict(self):
+        return {
+            "last_ts": self.last_ts, "prev_close": self.prev_close,
+            "sma": {str(n): s.to_dict() for n, s in self.sma.items()},
+            "ema": {str(n): e.to_dict() for n, e in self.ema.items()},
+            "signal": self.signal.to_dict(), "gain": self.gain.to_dict(), "loss": self.loss.to_dict(),
+            "atr": self.atr.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        state = cls()
+        state.last_ts, state.prev_close = d["last_ts"], d["prev_close"]
+        state.sma = {int(n): RollingMean.from_dict(s) for n, s in d["sma"].items()}
+        state.ema = {int(n): Smoothed.from_dict(e) for n, e in d["ema"].items()}
+        state.signal = Smoothed.from_dict(d["signal"])
+        state.gain = Smoothed.from_dict(d["gain"])
+        state.loss = Smoothed.from_dict(d["loss"])
+        state.atr = Smoothed.from_dict(d["atr"])
+        return state
+
+
+def _bars(df):
+    """DataFrame daily -> list of (ts ns, high, low, close) ของแถวที่ครบ"""
+    df = df.dropna(subset=["High", "Low", "Close"])
+    return list(zip(df.index.as_unit("ns").asi8.tolist(), df["High"].astype(float).tolist(),
+                    df["Low"].astype(float).tolist(), df["Close"].astype(float).tolist()))
+
+
+def _revised(state, closed, tolerance=1e-4):
+    for ts, _, _, close in reversed(closed):
+        if ts == state.last_ts:
+            return abs(close - state.prev_close) > tolerance * abs(state.prev_close)
+        if ts < state.last_ts:
+            break
+    return False
+
+
+class IndicatorStateStore:
+    """state ของทุก ticker + ไฟล์ที่บันทึก update() เรียกพร้อมกันได้จากหลาย chunk ของการสแกน
+    (ล็อกเฉพาะตอนแตะ state ใน memory) ส่วนการเขียนไฟล์ทำครั้งเดียวต่อรอบผ่าน save_if_dirty()"""
+
+    def __init__(self, path=INDICATOR_STATE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._dirty = False
+        self._states = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r") as f:
+                return {t: IndicatorState.from_dict(d) for t, d in json.load(f).items()}
+        except (FileNotFoundError, ValueError, KeyError):
+            return {}
+
+    def save(self):
+        """เขียน state ทั้งหมดลงไฟล์แบบ atomic (ไฟล์ชั่วคราวชื่อไม่ซ้ำ + os.replace ทีละคน)"""
+        with self._save_lock:
+            with self._lock:
+                data = {t: s.to_dict() for t, s in self._states.items()}
+                self._dirty = False
+            directory = os.path.dirname(self.path) or "."
+            os.makedirs(directory, exist_ok=True)
+            f = tempfile.NamedTemporaryFile("w", dir=directory, suffix=".tmp", delete=False)
+            try:
+                with f:
+                    json.dump(data, f)
+                os.replace(f.name, self.path)
+            except BaseException:
+                with self._lock:
+                    self._dirty = True
+                if os.path.exists(f.name):
+                    os.remove(f.name)
+                raise
+
+    def save_if_dirty(self):
+        """บันทึกถ้ามี state เปลี่ยนตั้งแต่ครั้งก่อน (เรียกครั้งเดียวหลังทุก chunk ของการสแกนเสร็จ)"""
+        if not self._dirty:
+            return
+        try:
+            self.save()
+        except OSError as e:
+            print(f"⚠️ บันทึก indicator state ไม่ได้: {e}")
+
+    def _rebuild(self, ticker, cutoff, closed):
+        """สร้าง state ใหม่จากประวัติยาวในคลัง (อ่าน disk — เรียกนอกล็อก)"""
+        history = _bars(read_timeframes(ticker, daily_period=HISTORY_PERIOD)["daily"])
+        state = IndicatorState()
+        for bar in [b for b in history if b[0] < cutoff] or closed:
+            state.push(*bar)
+        return state
+
+    def update(self, daily, today=None):
+        """ต่อ state ด้วยแท่ง daily ที่ปิดแล้ว (วันก่อน today) ของ dict ticker -> DataFrame แล้วคืนค่าล่าสุด
+        (แท่งของวันนี้ขึ้นไปถือว่ายังไม่ปิด ใช้ peek) คืน DataFrame (index = ticker, คอลัมน์ = STATE_COLUMNS)
+        ไม่เขียนไฟล์เอง — ผู้เรียกสั่ง save_if_dirty() เมื่อจบรอบ"""
+        today = today if today is not None else pd.Timestamp.now(tz=MARKET_TZ).tz_localize(None).normalize()
+        cutoff = pd.Timestamp(today).as_unit("ns").value
+        rows = {}
+        for ticker, df in daily.items():
+            bars = _bars(df)
+            closed = [b for b in bars if b[0] < cutoff]
+            pending = bars[-1][1:] if bars and bars[-1][0] >= cutoff else None
+
+            with self._lock:
+                state = self._states.get(ticker)
+                new = [b for b in closed if state is None or b[0] > state.last_ts]
+                # สร้างใหม่จากประวัติยาวเมื่อ: ยังไม่มี state, ประวัติในมือไม่ต่อกับแท่งล่าสุดที่ commit ไว้ (ห่างหายนาน)
+                # หรือราคาปิดของแท่งนั้นเปลี่ยนไป (ปรับย้อนหลังจาก split/dividend)
+                rebuild = state is None or (new and closed[0][0] > state.last_ts) or _revised(state, closed)
+                if not rebuild:
+                    for bar in new:
+                        state.push(*bar)
+                    self._dirty = self._dirty or bool(new)
+                    rows[ticker] = state.values(pending)
+            if rebuild:
+                state = self._rebuild(ticker, cutoff, closed)
+                with self._lock:
+                    self._states[ticker] = state
+                    self._dirty = True
+                    rows[ticker] = state.values(pending)
+        return pd.DataFrame.from_dict(rows, orient="index", columns=STATE_COLUMNS)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = IndicatorStateStore()
+        return _store
@@ -0,0 +1,175 @@
+"""Indicator เทคนิคอลแบบ vectorized ทั้ง universe บน array 2 มิติ [เวลา, ticker]: SMA, EMA, RSI (Wilder), ATR, MACD, VWAP
+ทุกฟังก์ชันคิดทุก ticker พร้อมกัน (วนแค่ตามแกนเวลาสำหรับค่าที่ต้องทำแบบ recursive เช่น EMA/Wilder)
+
+array ราคาที่มีแท่งหายกลางทาง (NaN) ให้ pack() ก่อน — ย้ายค่าที่มีของแต่ละ ticker ไปชิดล่างตามลำดับเวลาเดิม
+(เหมือน .dropna() ทีละตัว) แถวสุดท้ายจึงเป็นค่าล่าสุดของทุก ticker
+
+screener คำนวณตารางค่าล่าสุดจากแท่งที่โหลดมาสแกนอยู่แล้ว แล้ว publish() ไว้ใน memory
+get_technicals อ่านแถวที่คำนวณไว้ (get_row) แทนการดึงประวัติราคาใหม่ทีละ ticker"""
+
+import os
+import time
+import threading
+
+import numpy as np
+import pandas as pd
+
+# แถวที่ publish ไว้นานกว่านี้ (วินาที) ถือว่าเก่า ให้ผู้อ่านคำนวณใหม่เอง
+INDICATOR_MAX_AGE = int(os.getenv("INDICATOR_MAX_AGE", "900"))
+
+INDICATOR_COLUMNS = ["price", "sma20", "sma50", "ema12", "ema26", "rsi14", "atr14", "atr_pct",
+                     "macd", "macd_signal", "macd_hist", "vwap"]
+
+_rows = {}
+_lock = threading.Lock()
+
+
+def pack(matrix, valid=None):
+    """ย้ายค่าที่ valid ของแต่ละคอลัมน์ไปชิดล่าง (คงลำดับเวลาเดิม) เติม NaN ด้านบน
+    valid = mask ร่วม (ใช้ mask เดียวกันกับ high/low/close ให้แถวยังตรงกัน) ไม่ระบุ = ค่าที่ไม่ใช่ NaN"""
+    matrix = np.asarray(matrix, dtype="float64")
+    if valid is None:
+        valid = ~np.isnan(matrix)
+    rank = valid[::-1].cumsum(axis=0)[::-1]       # 1 = ค่าล่าสุดของคอลัมน์นั้น
+    out = np.full(matrix.shape, np.nan)
+    rows, cols = np.nonzero(valid)
+    out[len(matrix) - rank[rows, cols], cols] = matrix[rows, cols]
+    return out
+
+
+def sma(x, n):
+    """ค่าเฉลี่ยเคลื่อนที่ n แท่ง (NaN จนกว่าจะมีครบ n แท่งติดกัน)"""
+    valid = ~np.isnan(x)
+    zeros = np.zeros((1, x.shape[1]))
+    total = np.vstack([zeros, np.cumsum(np.where(valid, x, 0.0), axis=0)])
+    count = np.vstack([zeros, np.cumsum(valid, axis=0)])
+    out = np.full(x.shape, np.nan)
+    if len(x) >= n:
+        window_count = count[n:] - count[:-n]
+        out[n - 1:] = np.where(window_count == n, (total[n:] - total[:-n]) / n, np.nan)
+    return out
+
+
+def _smooth(x, n, alpha):
+    """ค่าเฉลี่ยแบบ recursive (EMA/Wilder) เริ่มจาก SMA ของ n แท่งแรกของแต่ละคอลัมน์"""
+    seed = sma(x, n)
+    out = np.full(x.shape, np.nan)
+    prev = np.full(x.shape[1], np.nan)
+    for t in range(len(x)):
+        prev = np.where(np.isnan(prev), seed[t], alpha * x[t] + (1 - alpha) * prev)
+        out[t] = prev
+    return out
+
+
+def ema(x, n):
+    return _smooth(x, n, 2.0 / (n + 1))
+
+
+def wilder(x, n):
+    return _smooth(x, n, 1.0 / n)
+
+
+def _shift(x):
+    return np.vstack([np.full((1, x.shape[1]), np.nan), x[:-1]])
+
+
+def rsi(close, n=14):
+    """RSI แบบ Wilder (avg gain/loss ถ่วงแบบ 1/n) ไม่มีแท่งลงเลย = 100, ราคาไม่ขยับเลย = 50"""
+    delta = close - _shift(close)
+    gain = np.where(delta > 0, delta, 0.0)
+    loss = np.where(delta < 0, -delta, 0.0)
+    gain[np.isnan(delta)] = np.nan
+    loss[np.isnan(delta)] = np.nan
+    avg_gain, avg_loss = wilder(gain, n), wilder(loss, n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = 100 - 100 / (1 + avg_gain / avg_loss)
+    out = np.where((avg_loss == 0) & (avg_gain > 0), 100.0, out)
+    return np.where((avg_loss == 0) & (avg_gain == 0), 50.0, out)
+
+
+def atr(high, low, close, n=14):
+    """Average True Range แบบ Wilder (แท่งแรกใช้ high-low)"""
+    prev_close = _shift(close)
+    true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    return wilder(true_range, n)
+
+
+def macd(close, fast=12, slow=26, signal=9):
+    """คืน (macd line, signal line, histogram)"""
+    line = ema(close, fast) - ema(close, slow)
+    signal_line = ema(line, signal)
+    return line, signal_line, line - signal_line
+
+
+def vwap(high, low, close, volume, sessions):
+    """VWAP สะสมตั้งแต่ต้น session ของทุกแถว (array intraday ที่แถวตรงกันตามเวลา แท่งที่ไม่มี = NaN)
+    sessions = รหัส session (เช่นวันที่) ของแต่ละแถว เรียงตามเวลา"""
+    high, low, close, volume = (np.asarray(a, dtype="float64") for a in (high, low, close, volume))
+    typical = (high + low + close) / 3
+    weight = np.where(np.isnan(typical) | np.isnan(volume), 0.0, volume)
+    pv = np.cumsum(np.where(weight > 0, typical * weight, 0.0), axis=0)
+    vol = np.cumsum(weight, axis=0)
+    sessions = np.asarray(sessions)
+    starts = np.flatnonzero(np.r_[True, sessions[1:] != sessions[:-1]])
+    start_of_row = starts[np.searchsorted(starts, np.arange(len(sessions)), side="right") - 1]
+    before = start_of_row - 1
+    pv_before = np.where((before >= 0)[:, None], pv[np.maximum(before, 0)], 0.0)
+    vol_before = np.where((before >= 0)[:, None], vol[np.maximum(before, 0)], 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (pv - pv_before) / (vol - vol_before)
+
+
+def indicator_table(tickers, close, high, low, intraday=None):
+    """ค่าล่าสุดของทุก indicator ต่อ ticker จาก array daily [วัน, ticker] (ยังไม่ pack ก็ได้)
+    intraday = (high, low, close, volume, sessions) แท่ง intraday ช่วงตลาดปกติ ไว้คิด VWAP ของ session ล่าสุด
+    คืน DataFrame (index = ticker, คอลัมน์ = INDICATOR_COLUMNS)"""
+    close = np.asarray(close, dtype="float64")
+    high, low = np.asarray(high, dtype="float64"), np.asarray(low, dtype="float64")
+    if not len(close):
+        return pd.DataFrame(np.nan, index=pd.Index(tickers), columns=INDICATOR_COLUMNS)
+    valid = ~(np.isnan(close) | np.isnan(high) | np.isnan(low))
+    close, high, low = pack(close, valid), pack(high, valid), pack(low, valid)
+
+    line, signal_line, hist = macd(close)
+    table = pd.DataFrame({
+        "price": close[-1],
+        "sma20": sma(close, 20)[-1],
+        "sma50": sma(close, 50)[-1],
+        "ema12": ema(close, 12)[-1],
+        "ema26": ema(close, 26)[-1],
+        "rsi14": rsi(close, 14)[-1],
+        "atr14": atr(high, low, close, 14)[-1],
+        "macd": line[-1],
+        "macd_signal": signal_line[-1],
+        "macd_hist": hist[-1],
+        "vwap": np.nan,
+    }, index=pd.Index(tickers))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        table["atr_pct"] = table["atr14"] / table["price"] * 100
+
+    if intraday is not None and len(intraday[0]):
+        table["vwap"] = vwap(*intraday)[-1]
+    return table[INDICATOR_COLUMNS]
+
+
+def publish(table):
+    """เก็บแถวค่าล่าสุดของแต่ละ ticker ไว้ใน memory ให้ get_row อ่าน (เรียกจาก screener หลังคำนวณ)"""
+    now = time.monotonic()
+    rows = {t: (now, row) for t, row in zip(table.index, table.to_dict("records"))}
+    with _lock:
+        _rows.update(rows)
+
+
+def get_row(ticker, max_age=None):
+    """แถว indicator ที่ publish ไว้ของ ticker (dict) ไม่มีหรือเก่ากว่า max_age วินาทีได้ None"""
+    max_age = INDICATOR_MAX_AGE if max_age is None else max_age
+    with _lock:
+        entry = _rows.get(ticker.upper())
+    if entry is None or time.monotonic() - entry[0] > max_age:
+        return None
+    return dict(entry[1])
+
+
+def clear():
+    with _lock:
+        _rows.clear()
@@ -16,6 +16,8 @@ import json
 from flask import Flask, request, abort
 from dotenv import load_dotenv
 
+import http_client
+
 from services import send_line_push, IMPACT_THRESHOLD
 from db_handler import get_accuracy_stats, get_due_predictions
 from screener import update_target_tickers
@@ -42,7 +44,6 @@ def verify_signature(body, signature):
 
 
 def reply(reply_token, text):
-    import requests
     url = "https://api.line.me/v2/bot/message/reply"
     headers = {
         "Content-Type": "application/json",
@@ -50,7 +51,7 @@ def reply(reply_token, text):
     }
     payload = {"replyToken": reply_token, "messages": [{"type": "text", "text": text}]}
     try:
-        requests.post(url, headers=headers, json=payload, timeout=10)
+        http_client.post(url, headers=headers, json=payload, timeout=10)
     except Exception as e:
         print(f"❌ LINE Reply Error: {e}")
 
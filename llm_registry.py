@@ -0,0 +1,101 @@
+"""สุขภาพของแต่ละโมเดล LLM (circuit breaker) — จำว่าโมเดลไหนเพิ่ง fail / โดน quota / ตอบช้า
+โมเดลที่ fail ติดกันเกินเกณฑ์จะถูกพักไว้ช่วง cooldown (โดน quota พักนานกว่า) ให้ครั้งแรกของทุก call
+ไปลงที่โมเดลที่ใช้งานได้จริงตอนนี้ แทนการไล่ลองทุกตัวแล้วเสีย round trip ให้ตัวที่ตายไปแล้วทุกครั้ง"""
+
+import time
+import threading
+
+FAILURE_THRESHOLD = 2         # fail ติดกันกี่ครั้งถึงพักโมเดล
+FAILURE_COOLDOWN = 300        # วินาที: พักหลัง fail ทั่วไป (timeout, 5xx, โมเดลถูกปลด)
+QUOTA_COOLDOWN = 3600         # วินาที: พักหลังโดน quota/rate limit (ส่วนใหญ่รีเซ็ตรายชั่วโมง/รายวัน)
+LATENCY_SMOOTHING = 0.3       # น้ำหนักของ latency ล่าสุดใน EWMA
+
+
+def is_quota_error(error):
+    """แยก error ที่เป็น quota/rate limit ของแต่ละค่าย (Gemini ResourceExhausted, OpenAI/Anthropic RateLimitError)"""
+    name = type(error).__name__
+    if name in ("ResourceExhausted", "RateLimitError", "TooManyRequests"):
+        return True
+    if getattr(error, "status_code", None) == 429 or getattr(error, "code", None) == 429:
+        return True
+    text = str(error).lower()
+    return "429" in text or "quota" in text or "rate limit" in text
+
+
+class ModelHealth:
+    def __init__(self):
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.quota_errors = 0
+        self.avg_latency = None
+        self.cooldown_until = 0.0
+        self.last_error = None
+
+
+class ModelHealthRegistry:
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, failure_cooldown=FAILURE_COOLDOWN,
+                 quota_cooldown=QUOTA_COOLDOWN):
+        self.failure_threshold = failure_threshold
+        self.failure_cooldown = failure_cooldown
+        self.quota_cooldown = quota_cooldown
+        self._health = {}
+        self._lock = threading.Lock()
+
+    def _get(self, model):
+        if model not in self._health:
+            self._health[model] = ModelHealth()
+        return self._health[model]
+
+    def available(self, models):
+        """คืนเฉพาะโมเดลที่ไม่ได้อยู่ใน cooldown (คงลำดับความชอบเดิม) โมเดลที่พ้น cooldown แล้วจะได้ลองใหม่"""
+        now = time.monotonic()
+        with self._lock:
+            return [m for m in models if self._get(m).cooldown_until <= now]
+
+    def record_success(self, model, latency):
+        with self._lock:
+            h = self._get(model)
+            h.successes += 1
+            h.consecutive_failures = 0
+            h.cooldown_until = 0.0
+            h.avg_latency = latency if h.avg_latency is None else \
+                (1 - LATENCY_SMOOTHING) * h.avg_latency + LATENCY_SMOOTHING * latency
+
+    def record_failure(self, model, error, latency=None):
+        quota = is_quota_error(error)
+        with self._lock:
+            h = self._get(model)
+            h.failures += 1
+            h.consecutive_failures += 1
+            h.last_error = f"{type(error).__name__}: {str(error)[:200]}"
+            if quota:
+                h.quota_errors += 1
+                h.cooldown_until = time.monotonic() + self.quota_cooldown
+            elif h.consecutive_failures >= self.failure_threshold:
+                h.cooldown_until = time.monotonic() + self.failure_cooldown
+            cooling = h.cooldown_until > time.monotonic()
+
+        reason = "quota" if quota else "error"
+        suffix = " -> พักโมเดลชั่วคราว" if cooling else ""
+        print(f"⚠️ LLM {model} {reason}: {str(error)[:120]}{suffix}")
+
+    def report(self):
+        """สรุปสถานะทุกโมเดลเป็น dict (ไว้ log / โชว์ใน /status)"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                model: {
+                    "successes": h.successes,
+                    "failures": h.failures,
+                    "quota_errors": h.quota_errors,
+                    "avg_latency": round(h.avg_latency, 2) if h.avg_latency is not None else None,
+                    "cooldown_remaining": max(0, round(h.cooldown_until - now)),
+                    "last_error": h.last_error,
+                }
+                for model, h in self._health.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._health.clear()
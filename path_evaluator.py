@@ -0,0 +1,202 @@
+"""ประเมินเส้นทางราคาของคำทำนายบนแท่ง intraday: ระหว่าง created_at ถึง created_at + time_horizon_days
+ราคาแตะ target หรือ stop ก่อน (เมื่อไร) และ MFE/MAE (ขยับไปทางที่ทาย/สวนทางได้มากสุดกี่ % จาก start_price)
+run_verification ดูแค่ราคา ณ วันครบ horizon — ตัวที่แตะ stop ไปก่อนแล้วเด้งกลับจึงถูกนับว่า "ถูก"
+
+คำนวณแบบ vectorized ทั้งชุด: แท่งของทุก symbol ต่อกันเป็น array เดียว แต่ละคำทำนาย = ช่วง [lo, hi) ใน array นั้น
+แล้ว gather เป็นเมทริกซ์ [คำทำนาย, แท่ง] (ทีละ PATH_CHUNK_ROWS แถว) หาแท่งแรกที่แตะด้วย argmax
+ไม่มีการวนทีละแท่งใน Python — ประเมินประวัติหลักพันรายการใหม่ทั้งหมดได้ในรอบเดียวเมื่อเปลี่ยนกติกา
+
+แท่ง intraday ของ Yahoo ย้อนได้จำกัด: 5m ~60 วัน, 1h ~730 วัน คำทำนายแต่ละตัวใช้ interval ละเอียดสุดที่ยังดึงได้
+(download ครั้งเดียวต่อ interval) ใช้แท่งช่วงตลาดปกติ นับแท่งที่เริ่ม >= created_at และ < วันครบ horizon
+แท่งเดียวกันแตะทั้ง target และ stop (ลำดับในแท่งไม่รู้) นับเป็น STOP แบบระมัดระวัง
+
+รัน:  python path_evaluator.py [--rescore]"""
+
+import os
+import time
+import argparse
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from bar_store import download, ticker_frame
+from db_handler import get_path_candidates, save_path_results
+
+PATH_CHUNK_ROWS = int(os.getenv("PATH_CHUNK_ROWS", "2000"))
+# (interval, ย้อนได้กี่วัน) เรียงจากละเอียดไปหยาบ
+INTRADAY_LIMITS = [("5m", 59), ("1h", 729)]
+
+TARGET, STOP, NONE, NO_DATA = "TARGET", "STOP", "NONE", "NO_DATA"
+RESULT_COLUMNS = ["first_touch", "first_touch_at", "mfe_pct", "mae_pct", "bars"]
+
+_SIGN = {"UP": 1.0, "DOWN": -1.0}
+
+
+def _float(value):
+    return np.nan if value is None else float(value)
+
+
+def prediction_arrays(predictions):
+    """แปลง list of dict จาก DB เป็น array ที่ evaluate_paths ใช้ (ns UTC / ราคา float / ทิศ +1 -1 0)"""
+    created = [pd.Timestamp(p["created_at"]) for p in predictions]
+    created = [t.tz_localize("UTC") if t.tzinfo is None else t for t in created]
+    start = np.array([t.value for t in created], dtype="int64")
+    horizon = np.array([p.get("time_horizon_days") or 1 for p in predictions], dtype="int64")
+    return {
+        "id": np.array([p["id"] for p in predictions]),
+        "symbol": np.array([p["symbol"].upper() for p in predictions], dtype=object),
+        "start": start,
+        "end": start + horizon * 86400 * 10**9,
+        "entry": np.array([_float(p.get("start_price")) for p in predictions]),
+        "target": np.array([_float(p.get("target_price")) for p in predictions]),
+        "stop": np.array([_float(p.get("stop_loss_price")) for p in predictions]),
+        "sign": np.array([_SIGN.get(p.get("predicted_direction"), 0.0) for p in predictions]),
+    }
+
+
+def _flatten_bars(bars):
+    """dict symbol -> DataFrame (High/Low, index มี timezone) -> (ts ns, high, low, {symbol: (offset, ts ของ symbol)})"""
+    ts_parts, high_parts, low_parts, segments, offset = [], [], [], {}, 0
+    for symbol, df in bars.items():
+        df = df.dropna(subset=["High", "Low"]).sort_index()
+        ts = df.index.as_unit("ns").asi8
+        segments[symbol] = (offset, ts)
+        ts_parts.append(ts)
+        high_parts.append(df["High"].to_numpy(dtype="float64"))
+        low_parts.append(df["Low"].to_numpy(dtype="float64"))
+        offset += len(ts)
+    if not ts_parts:
+        return np.empty(0, "int64"), np.empty(0), np.empty(0), segments
+    return np.concatenate(ts_parts), np.concatenate(high_parts), np.concatenate(low_parts), segments
+
+
+def _evaluate_chunk(ts, high, low, lo, hi, entry, target, stop, sign):
+    """ประเมินทุกแถวของก้อนพร้อมกันบนเมทริกซ์ [แถว, แท่ง] ที่ gather จากช่วง [lo, hi) ของแต่ละแถว"""
+    width = max(int((hi - lo).max(initial=0)), 1)
+    idx = lo[:, None] + np.arange(width)[None, :]
+    inside = idx < hi[:, None]
+    idx = np.minimum(idx, max(len(high) - 1, 0))
+    h = np.where(inside, high[idx], np.nan) if len(high) else np.full(idx.shape, np.nan)
+    l = np.where(inside, low[idx], np.nan) if len(low) else np.full(idx.shape, np.nan)
+
+    # ราคาที่ดีที่สุด/แย่ที่สุดของแต่ละแท่งตามทิศที่ทาย (UP: high/low, DOWN: low/high)
+    up = (sign > 0)[:, None]
+    favorable, adverse = np.where(up, h, l), np.where(up, l, h)
+    s = sign[:, None]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        fav_pct = np.where(inside, s * (favorable - entry[:, None]) / entry[:, None] * 100, -np.inf)
+        adv_pct = np.where(inside, s * (adverse - entry[:, None]) / entry[:, None] * 100, np.inf)
+        directional = (sign != 0)[:, None] & inside
+        hit_target = directional & (s * (favorable - target[:, None]) >= 0)
+        hit_stop = directional & (s * (adverse - stop[:, None]) <= 0)
+
+    first_target = np.where(hit_target.any(axis=1), hit_target.argmax(axis=1), width)
+    first_stop = np.where(hit_stop.any(axis=1), hit_stop.argmax(axis=1), width)
+    stop_first = first_stop <= first_target          # แท่งเดียวกัน = STOP
+    first = np.where(stop_first, first_stop, first_target)
+    touched = first < width
+
+    has_bars = hi > lo
+    valid = has_bars & (entry > 0)
+    outcome = np.where(~valid, NO_DATA, np.where(~touched, NONE, np.where(stop_first, STOP, TARGET)))
+    touched_ns = np.where(touched & valid, ts[np.minimum(lo + first, max(len(ts) - 1, 0))] if len(ts) else 0, 0)
+    mfe = np.where(valid & (sign != 0), fav_pct.max(axis=1), np.nan)
+    mae = np.where(valid & (sign != 0), adv_pct.min(axis=1), np.nan)
+    return outcome, touched_ns, touched & valid, mfe, mae, hi - lo
+
+
+def evaluate_paths(predictions, bars, chunk_rows=None):
+    """predictions = ผลของ prediction_arrays, bars = dict symbol -> DataFrame แท่ง intraday (High/Low)
+    คืน DataFrame (index = id, คอลัมน์ = RESULT_COLUMNS) mfe/mae เป็น % จาก start_price ตามทิศที่ทาย
+    (mae ติดลบ = สวนทาง) คำทำนาย NEUTRAL ได้แค่ first_touch = NONE"""
+    chunk_rows = chunk_rows or PATH_CHUNK_ROWS
+    ts, high, low, segments = _flatten_bars(bars)
+    n = len(predictions["id"])
+
+    # ช่วงแท่งของแต่ละคำทำนายใน array รวม (วนตาม symbol ไม่ใช่ตามแท่ง)
+    lo, hi = np.zeros(n, dtype="int64"), np.zeros(n, dtype="int64")
+    for symbol in np.unique(predictions["symbol"]):
+        if symbol not in segments:
+            continue
+        rows = np.flatnonzero(predictions["symbol"] == symbol)
+        offset, symbol_ts = segments[symbol]
+        lo[rows] = offset + np.searchsorted(symbol_ts, predictions["start"][rows], side="left")
+        hi[rows] = offset + np.searchsorted(symbol_ts, predictions["end"][rows], side="left")
+
+    parts = []
+    for i in range(0, n, chunk_rows):
+        sl = slice(i, i + chunk_rows)
+        parts.append(_evaluate_chunk(ts, high, low, lo[sl], hi[sl], predictions["entry"][sl],
+                                     predictions["target"][sl], predictions["stop"][sl], predictions["sign"][sl]))
+    if not parts:
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+
+    outcome, touched_ns, touched, mfe, mae, count = (np.concatenate(p) for p in zip(*parts))
+    touched_at = pd.to_datetime(np.where(touched, touched_ns, np.iinfo("int64").min), utc=True)
+    return pd.DataFrame({"first_touch": outcome, "first_touch_at": touched_at, "mfe_pct": mfe, "mae_pct": mae,
+                         "bars": count}, index=pd.Index(predictions["id"], name="id"))
+
+
+def load_path_bars(predictions, now=None):
+    """แท่ง intraday ของทุกคำทำนาย: แบ่งตาม interval ละเอียดสุดที่ย้อนถึง created_at ได้ แล้ว download ครั้งเดียวต่อ interval
+    คืน list of (index ของแถวใน predictions, dict symbol -> DataFrame)"""
+    now = pd.Timestamp.now(tz="UTC") if now is None else pd.Timestamp(now)
+    age_days = (now.value - predictions["start"]) / (86400 * 10**9)
+    groups, assigned = [], np.zeros(len(age_days), dtype=bool)
+    for interval, limit in INTRADAY_LIMITS:
+        rows = np.flatnonzero(~assigned & (age_days <= limit))
+        assigned[rows] = True
+        if not len(rows):
+            continue
+        symbols = sorted(set(predictions["symbol"][rows]))
+        start = pd.Timestamp(predictions["start"][rows].min(), tz="UTC").strftime("%Y-%m-%d")
+        end = (pd.Timestamp(predictions["end"][rows].max(), tz="UTC") + timedelta(days=1)).strftime("%Y-%m-%d")
+        try:
+            data = download(symbols, interval, False, start=start, end=end)
+        except Exception as e:
+            print(f"⚠️ Path bars download error ({interval}): {e}")
+            continue
+        frames = {}
+        for symbol in symbols:
+            df = ticker_frame(data, symbol)
+            if df is not None:
+                frames[symbol] = df
+        groups.append((rows, frames))
+    return groups
+
+
+def run_path_evaluation(rescore=False):
+    """ประเมินคำทำนายที่ครบ horizon (rescore=True = ทั้งประวัติ) แล้วบันทึกลง DB ครั้งเดียว คืน DataFrame ผล"""
+    started = time.perf_counter()
+    candidates = get_path_candidates(rescore=rescore, max_age_days=INTRADAY_LIMITS[-1][1])
+    if not candidates:
+        print("✅ ไม่มีคำทำนายให้ประเมินเส้นทางราคา")
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+
+    predictions = prediction_arrays(candidates)
+    tables = []
+    for rows, frames in load_path_bars(predictions):
+        subset = {k: v[rows] for k, v in predictions.items()}
+        tables.append(evaluate_paths(subset, frames))
+    table = pd.concat(tables) if tables else pd.DataFrame(columns=RESULT_COLUMNS)
+
+    # ตัวที่ไม่มีแท่ง (download พลาด/symbol ไม่มีจริง) ไม่บันทึก รอบหน้าลองใหม่
+    done = table[table["first_touch"] != NO_DATA]
+    save_path_results([
+        (int(i), row.first_touch, None if pd.isna(row.first_touch_at) else row.first_touch_at.to_pydatetime(),
+         None if np.isnan(row.mfe_pct) else round(float(row.mfe_pct), 4),
+         None if np.isnan(row.mae_pct) else round(float(row.mae_pct), 4))
+        for i, row in zip(done.index, done.itertuples())
+    ])
+    counts = done["first_touch"].value_counts().to_dict()
+    print(f"🎯 Path evaluation: {len(done)}/{len(candidates)} รายการ | target {counts.get(TARGET, 0)} | "
+          f"stop {counts.get(STOP, 0)} | ไม่แตะ {counts.get(NONE, 0)} | {time.perf_counter() - started:.1f}s")
+    return table
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate target/stop paths of predictions over intraday bars")
+    parser.add_argument("--rescore", action="store_true", help="ประเมินใหม่ทั้งประวัติ (ไม่ใช่แค่ที่ยังไม่เคยประเมิน)")
+    args = parser.parse_args()
+    run_path_evaluation(rescore=args.rescore)
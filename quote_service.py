@@ -0,0 +1,145 @@
+"""ราคาล่าสุดแบบ batch หลาย symbol ต่อ request + cache ใน memory อายุสั้น (QUOTE_TTL)
+แทน GLOBAL_QUOTE ของ Alpha Vantage ทีละตัว (1 alert/1 prediction = 1 call จาก quota 25/วันเดียวกับ NEWS_SENTIMENT)
+
+ลำดับแหล่ง: Alpha Vantage REALTIME_BULK_QUOTES (สูงสุด 100 symbol ต่อ call) -> yfinance (yf.download แท่ง 1 นาที
+รวม pre/after-market ครั้งเดียวทั้งกลุ่ม) สำหรับ symbol ที่ยังไม่ได้ราคา
+REALTIME_BULK_QUOTES เป็น endpoint ของ key แบบ premium จึงปิดไว้เป็นค่าเริ่มต้น (เปิดด้วย QUOTE_USE_ALPHAVANTAGE=true)
+ถ้าเปิดแล้ว key ตอบข้อความแจ้งแทนข้อมูล จะปิด Alpha Vantage ทิ้งแล้วจำไว้ใน ttl_cache AV_DISABLED_TTL วินาที
+(restart/process อื่นก็ไม่เผา quota ซ้ำ) ระหว่างนั้นใช้ yfinance อย่างเดียว
+
+ใช้งาน:
+    prices = get_quotes(["TSLA", "AAPL"])   # {"TSLA": 251.3, "AAPL": 0.0}  ดึงไม่ได้ = 0.0
+    price = get_quote("TSLA")"""
+
+import os
+import time
+import threading
+
+import numpy as np
+from dotenv import load_dotenv
+
+import http_client
+from bar_store import download, ticker_frame
+from rate_limiter import acquire
+from ttl_cache import cache_get, cache_set
+
+load_dotenv()
+
+ALPHA_VANTAGE_API_KEY = os.getenv("ALPHA_VANTAGE_API_KEY")
+QUOTE_TTL = float(os.getenv("QUOTE_TTL", "30"))
+QUOTE_USE_ALPHAVANTAGE = os.getenv("QUOTE_USE_ALPHAVANTAGE", "false").lower() == "true"
+AV_DISABLED_TTL = 86400
+AV_BULK_MAX_SYMBOLS = 100
+
+AV_URL = "https://www.alphavantage.co/query"
+
+# symbol -> (time.monotonic() ที่ดึง, ราคา)
+_cache = {}
+_lock = threading.Lock()
+_av_disabled = False
+
+
+def _normalize(symbols):
+    """ตัดค่าว่าง/GENERAL และตัวซ้ำ คงลำดับเดิม"""
+    seen = []
+    for s in symbols:
+        s = (s or "").strip().upper()
+        if s and s != "GENERAL" and s not in seen:
+            seen.append(s)
+    return seen
+
+
+def _alphavantage_disabled():
+    """เคยเจอว่า key ใช้ REALTIME_BULK_QUOTES ไม่ได้ (ใน process นี้ หรือที่บันทึกไว้ใน ttl_cache ยังไม่หมดอายุ)"""
+    return _av_disabled or bool(cache_get("alphavantage_bulk", "disabled"))
+
+
+def _fetch_alphavantage(symbols):
+    """ราคาจาก REALTIME_BULK_QUOTES (ก้อนละ AV_BULK_MAX_SYMBOLS) คืน dict symbol -> ราคา เฉพาะตัวที่ได้"""
+    global _av_disabled
+    prices = {}
+    for i in range(0, len(symbols), AV_BULK_MAX_SYMBOLS):
+        chunk = symbols[i:i + AV_BULK_MAX_SYMBOLS]
+        acquire("alphavantage")
+        try:
+            data = http_client.get(AV_URL, params={"function": "REALTIME_BULK_QUOTES", "symbol": ",".join(chunk),
+                                                   "apikey": ALPHA_VANTAGE_API_KEY}).json()
+        except Exception as e:
+            print(f"⚠️ Alpha Vantage Bulk Quote Error: {e}")
+            return prices
+        if "data" not in data:
+            # key ฟรี/เกิน quota ได้ "Information"/"Note" แทนข้อมูล
+            print(f"⚠️ Alpha Vantage bulk quotes ใช้ไม่ได้ ({data.get('Information') or data.get('Note') or data}) "
+                  f"-> ใช้ yfinance แทน")
+            _av_disabled = True
+            cache_set("alphavantage_bulk", "disabled", True, AV_DISABLED_TTL)
+            return prices
+        for row in data["data"]:
+            try:
+                price = float(row.get("close") or row.get("price"))
+            except (TypeError, ValueError):
+                continue
+            if price > 0:
+                prices[row["symbol"].upper()] = price
+    return prices
+
+
+def _fetch_yfinance(symbols):
+    """ราคาปิดของแท่ง 1 นาทีล่าสุด (รวม pre/after-market) ของทุก symbol ด้วย yf.download ครั้งเดียว"""
+    try:
+        data = download(symbols, "1m", True, period="1d")
+    except Exception as e:
+        print(f"⚠️ yfinance Quote Error: {e}")
+        return {}
+    prices = {}
+    for symbol in symbols:
+        df = ticker_frame(data, symbol)
+        if df is None:
+            continue
+        closes = df["Close"].to_numpy(dtype="float64")
+        closes = closes[~np.isnan(closes)]
+        if len(closes) and closes[-1] > 0:
+            prices[symbol] = float(closes[-1])
+    return prices
+
+
+def get_quotes(symbols, max_age=None):
+    """ราคาล่าสุดของหลาย symbol ในครั้งเดียว (ตัวที่อยู่ใน cache ไม่เกิน max_age วินาทีไม่ดึงซ้ำ)
+    คืน dict symbol (ตัวใหญ่) -> ราคา ตัวที่ดึงไม่ได้ = 0.0"""
+    max_age = QUOTE_TTL if max_age is None else max_age
+    symbols = _normalize(symbols)
+    now = time.monotonic()
+    prices = {}
+    with _lock:
+        for s in symbols:
+            entry = _cache.get(s)
+            if entry is not None and now - entry[0] <= max_age:
+                prices[s] = entry[1]
+    missing = [s for s in symbols if s not in prices]
+
+    fetched = {}
+    if missing and ALPHA_VANTAGE_API_KEY and QUOTE_USE_ALPHAVANTAGE and not _alphavantage_disabled():
+        fetched.update(_fetch_alphavantage(missing))
+    rest = [s for s in missing if s not in fetched]
+    if rest:
+        fetched.update(_fetch_yfinance(rest))
+
+    now = time.monotonic()
+    with _lock:
+        for s, price in fetched.items():
+            _cache[s] = (now, price)
+    prices.update(fetched)
+    return {s: prices.get(s, 0.0) for s in symbols}
+
+
+def get_quote(symbol, max_age=None):
+    """ราคาล่าสุดของ symbol เดียว (ไม่มี ticker/GENERAL/ดึงไม่ได้ = 0.0)"""
+    symbols = _normalize([symbol])
+    if not symbols:
+        return 0.0
+    return get_quotes(symbols, max_age)[symbols[0]]
+
+
+def clear():
+    with _lock:
+        _cache.clear()
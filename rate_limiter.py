@@ -0,0 +1,73 @@
+"""Token bucket rate limiter แยกตามผู้ให้บริการ (Alpha Vantage, Finnhub, SEC, StockTwits, LLM)
+แทน time.sleep(15) แบบตายตัว — เรียก acquire("finnhub") ก่อนยิง request แล้วจะรอเท่าที่ quota บังคับจริงเท่านั้น
+ทำให้ประมวลผลหลาย ticker พร้อมกันได้โดยไม่ชน rate limit ของแต่ละเจ้า
+
+ตั้งค่า quota ผ่าน env ในรูป "<จำนวน>/<sec|min|hour|day>" เช่น RATE_LIMIT_FINNHUB=60/min"""
+
+import os
+import time
+import threading
+
+# ค่า default ตาม free tier ของแต่ละเจ้า (เผื่อ margin ไว้เล็กน้อย)
+DEFAULT_QUOTAS = {
+    "alphavantage": "5/min",
+    "finnhub": "55/min",
+    "sec": "8/sec",          # SEC ขอไม่เกิน 10 requests/วินาที
+    "stocktwits": "180/hour",
+    "llm": "15/min",
+}
+
+_PERIOD_SECONDS = {"sec": 1, "min": 60, "hour": 3600, "day": 86400}
+
+
+def parse_quota(spec):
+    """แปลง "60/min" -> (60, 60.0) คือ (ความจุ bucket, ช่วงเวลาเป็นวินาที)"""
+    count, period = spec.strip().split("/")
+    return int(count), float(_PERIOD_SECONDS[period.strip().lower()])
+
+
+class TokenBucket:
+    """bucket จุ capacity token เติมกลับเต็มภายใน period วินาที (ยอมให้ burst ได้ถึง capacity)"""
+
+    def __init__(self, capacity, period):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, tokens=1, timeout=None):
+        """รอจนได้ token (คืน True) หรือรอเกิน timeout วินาที (คืน False)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return True
+                wait = (tokens - self.tokens) / self.rate
+            if deadline is not None and now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def get_bucket(provider):
+    with _buckets_lock:
+        if provider not in _buckets:
+            spec = os.getenv(f"RATE_LIMIT_{provider.upper()}", DEFAULT_QUOTAS.get(provider, "60/min"))
+            _buckets[provider] = TokenBucket(*parse_quota(spec))
+        return _buckets[provider]
+
+
+def acquire(provider, tokens=1, timeout=None):
+    """รอ quota ของ provider ก่อนยิง request คืน False ถ้ารอเกิน timeout (ให้ caller ข้ามไป)"""
+    return get_bucket(provider).acquire(tokens, timeout)
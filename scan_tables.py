@@ -0,0 +1,217 @@
+"""ตาราง columnar ของการสแกน: รวมคอลัมน์ของทุก ticker เป็น array [เวลา, ticker] แล้วคำนวณ %change, gap,
+pace-normalized volume ratio และ indicator ของทั้งก้อนในครั้งเดียว พร้อมเกณฑ์/ค่าตั้งของการสแกน
+ใช้ร่วมกันโดย screener (สแกนแบบแบ่งก้อน), screen_rules (feature frame ของ rule engine) และ stream_screener"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+import indicators
+import indicator_state
+
+MIN_PCT_CHANGE = 3.0      # % เปลี่ยนแปลงขั้นต่ำที่ถือว่า "ซิ่ง"
+MIN_GAP_PCT = 4.0         # % gap ขั้นต่ำช่วง pre-market/after-hours ที่ถือว่าน่าสนใจ
+
+# สแกนแบบแบ่งก้อน (universe หลายพันตัวไม่ต้องโหลดเป็น frame ก้อนเดียว)
+SCAN_CHUNK_SIZE = int(os.getenv("SCAN_CHUNK_SIZE", "250"))
+SCAN_WORKERS = int(os.getenv("SCAN_WORKERS", "4"))
+SCAN_DTYPE = os.getenv("SCAN_DTYPE", "float32")                 # ราคา/volume ระหว่างสแกน
+
+def _pace_normalized_volume_ratio(intraday_df, lookback_days=5):
+    """เทียบ volume ของ 'วันนี้จนถึงเวลานี้' กับค่าเฉลี่ยของช่วงเวลาเดียวกันใน lookback_days วันก่อน
+    แม่นยำกว่าการเทียบกับ full-day average ตรงๆ เพราะวันนี้ยังไม่ปิดตลาด (แท่งสะสมไม่ครบวัน)"""
+    df = intraday_df.dropna()
+    if df.empty:
+        return 0
+
+    dates = sorted(set(df.index.date))
+    if len(dates) < 2:
+        return 0
+
+    today = dates[-1]
+    today_df = df[df.index.date == today]
+    if today_df.empty:
+        return 0
+
+    cutoff_time = today_df.index[-1].time()
+    today_volume_sofar = today_df["Volume"].sum()
+
+    past_sums = []
+    for d in dates[:-1][-lookback_days:]:
+        day_df = df[df.index.date == d]
+        sofar = day_df[day_df.index.time <= cutoff_time]["Volume"].sum()
+        if sofar > 0:
+            past_sums.append(sofar)
+
+    avg_past_sofar = sum(past_sums) / len(past_sums) if past_sums else 0
+    return (today_volume_sofar / avg_past_sofar) if avg_past_sofar else 0
+
+
+def _as_frame_dict(data):
+    """รับได้ทั้ง dict ticker -> DataFrame (จาก bar_store) และผล yf.download(group_by="ticker") แบบ MultiIndex"""
+    if isinstance(data, pd.DataFrame):
+        if isinstance(data.columns, pd.MultiIndex):
+            return {t: data[t] for t in data.columns.get_level_values(0).unique()}
+        raise ValueError("ต้องเป็น DataFrame แบบ MultiIndex columns (group_by='ticker')")
+    return data
+
+
+def column_matrix(frames, column, dtype="float64"):
+    """รวมคอลัมน์เดียว (เช่น Close/Volume) ของทุก ticker เป็น array [เวลา, ticker] บนแกนเวลาร่วมกัน
+    (ทำด้วย numpy ตรงๆ เพราะ pd.concat/reindex ทีละตัวช้ากว่าการคำนวณจริงหลายเท่าเมื่อ universe ใหญ่)
+    แถวที่ข้อมูลไม่ครบ (ตัวที่ .dropna() จะตัดทิ้ง) และเวลาที่ ticker นั้นไม่มีแท่งเป็น NaN
+    dtype = float32 ใช้ memory ครึ่งเดียว (โหมดสแกน universe ใหญ่)
+    คืน (DatetimeIndex, array, รายชื่อ ticker)"""
+    frames = _as_frame_dict(frames)
+    tickers = list(frames)
+    stamps, values, tz = [], [], None
+    for ticker in tickers:
+        df = frames[ticker]
+        if df is None or df.empty:
+            stamps.append(np.empty(0, dtype="i8"))
+            values.append(np.empty(0))
+            continue
+        tz = tz or df.index.tz
+        data = df.to_numpy()
+        col = df[column].to_numpy(dtype=dtype, copy=True)
+        col[np.isnan(data).any(axis=1)] = np.nan
+        stamps.append(df.index.as_unit("ns").asi8)
+        values.append(col)
+
+    all_stamps = np.unique(np.concatenate(stamps)) if stamps else np.empty(0, dtype="i8")
+    matrix = np.full((len(all_stamps), len(tickers)), np.nan, dtype=dtype)
+    for i, (ts, col) in enumerate(zip(stamps, values)):
+        matrix[np.searchsorted(all_stamps, ts), i] = col
+
+    index = pd.to_datetime(all_stamps, utc=tz is not None)
+    if tz is not None:
+        index = index.tz_convert(tz)
+    return index, matrix, tickers
+
+
+def last_valid(matrix, nth=1):
+    """ค่าที่ไม่ใช่ NaN ลำดับที่ nth นับจากท้ายของทุกคอลัมน์ (เท่ากับ .dropna().iloc[-nth]) — ไม่มีได้ NaN"""
+    valid = ~np.isnan(matrix[::-1])
+    hit = valid & (np.cumsum(valid, axis=0) == nth)
+    found = hit.any(axis=0)
+    rows = len(matrix) - 1 - np.argmax(hit, axis=0)
+    return np.where(found, matrix[rows, np.arange(matrix.shape[1])], np.nan)
+
+
+def pace_normalized_volume_ratios(intraday_frames, lookback_days=5, dtype="float64"):
+    """เวอร์ชัน vectorized ของ _pace_normalized_volume_ratio คำนวณทุก ticker พร้อมกันในครั้งเดียว
+    (ผลเท่ากับเรียกฟังก์ชันเดิมทีละตัว) คืน dict ticker -> ratio
+
+    จัด volume เป็น array 3 มิติ [session, ช่วงเวลาในวัน, ticker] แล้ว cumsum ตามเวลาในวัน
+    volume 'ถึงเวลานี้' ของทุก session จึงเป็นแค่การหยิบค่า cumsum ที่ช่วงเวลาของแท่งล่าสุดวันนี้"""
+    index, matrix, tickers = column_matrix(intraday_frames, "Volume", dtype)
+    if not len(index) or not tickers:
+        return {t: 0 for t in tickers}
+
+    day_start = index.normalize()
+    session_codes, _ = pd.factorize(day_start, sort=True)
+    slot_codes, _ = pd.factorize(index - day_start, sort=True)
+    n_sessions, n_slots, n_tickers = session_codes.max() + 1, slot_codes.max() + 1, len(tickers)
+
+    volume = np.full((n_sessions, n_slots, n_tickers), np.nan, dtype=dtype)
+    volume[session_codes, slot_codes, :] = matrix
+
+    has_bar = ~np.isnan(volume)
+    present = has_bar.any(axis=1)                                   # [session, ticker]
+    cols = np.arange(n_tickers)
+
+    # session ล่าสุดที่มีข้อมูลของแต่ละ ticker = "วันนี้" และช่วงเวลาของแท่งสุดท้ายวันนี้ = cutoff
+    today = n_sessions - 1 - np.argmax(present[::-1], axis=0)
+    today_bars = has_bar[today, :, cols]                            # [ticker, slot]
+    cutoff = n_slots - 1 - np.argmax(today_bars[:, ::-1], axis=1)
+
+    cumulative = np.nancumsum(volume, axis=1, dtype="float64")  # ผลรวมสะสมใช้ float64 เสมอ กันปัดเศษ
+    sofar = cumulative[:, cutoff, cols]                             # [session, ticker]
+
+    # นับจากท้าย: session ที่มีข้อมูลอันดับ 2..lookback_days+1 คือ lookback_days วันก่อนหน้าวันนี้
+    sessions_from_end = np.cumsum(present[::-1], axis=0)[::-1]
+    past = present & (sessions_from_end >= 2) & (sessions_from_end <= lookback_days + 1) & (sofar > 0)
+
+    past_count = past.sum(axis=0)
+    past_total = np.where(past, sofar, 0.0).sum(axis=0)
+    avg_past = np.divide(past_total, past_count, out=np.zeros(n_tickers), where=past_count > 0)
+    today_volume = sofar[today, cols]
+
+    enough_days = present.sum(axis=0) >= 2
+    ratios = np.divide(today_volume, avg_past, out=np.zeros(n_tickers), where=(avg_past != 0) & enough_days)
+    return {t: float(r) for t, r in zip(tickers, ratios)}
+
+
+def compute_mover_table(daily, intraday, dtype="float64"):
+    """แกนสแกนแบบ columnar: คำนวณ %change, volume ratio, score ก่อนคูณ float ของทุก ticker ด้วย array ครั้งเดียว
+    คืน DataFrame (index = ticker) เฉพาะตัวที่มีแท่ง daily ครบ >= 5 วัน พร้อมคอลัมน์ passed = ผ่าน MIN_PCT_CHANGE"""
+    _, closes, tickers = column_matrix(daily, "Close", dtype)
+    if not tickers or not len(closes):
+        return pd.DataFrame(columns=["pct_change", "volume_ratio", "base_score", "passed"])
+
+    last_close = last_valid(closes, 1).astype("float64")
+    prev_close = last_valid(closes, 2).astype("float64")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pct_change = (last_close - prev_close) / prev_close * 100
+
+    volume_ratios = pace_normalized_volume_ratios(intraday, dtype=dtype)
+    volume_ratio = np.array([volume_ratios.get(t, 0) for t in tickers], dtype="float64")
+
+    table = pd.DataFrame({
+        "pct_change": pct_change,
+        "volume_ratio": volume_ratio,
+        # volume_ratio เป็น pace-normalized แล้ว เชื่อค่าจริงได้ ไม่ต้อง floor ปลอม
+        # floor ที่ 1.0 ไว้กันแค่กรณี data ขาด (volume_ratio=0) ไม่ให้ momentum_score เป็น 0 ไปด้วย
+        "base_score": np.abs(pct_change) * np.maximum(volume_ratio, 1.0),
+    }, index=tickers)
+    table = table[(~np.isnan(closes)).sum(axis=0) >= 5]
+    table = table[np.isfinite(table["pct_change"])]
+    table["passed"] = table["pct_change"].abs() >= MIN_PCT_CHANGE
+    return table
+
+
+def compute_gap_table(daily, extended, dtype="float64"):
+    """แกนสแกน gap แบบ columnar: เทียบราคาล่าสุดช่วง pre/after-market กับราคาปิดจริงของวันก่อนหน้า
+    คืน DataFrame (index = ticker) พร้อมคอลัมน์ passed = ผ่าน MIN_GAP_PCT"""
+    _, daily_closes, tickers = column_matrix(daily, "Close", dtype)
+    _, ext_closes, ext_tickers = column_matrix(extended, "Close", dtype)
+    if not tickers or not len(daily_closes) or not len(ext_closes):
+        return pd.DataFrame(columns=["gap_pct", "passed"])
+
+    # แท่ง daily ล่าสุดคือ "วันนี้" ที่ยังไม่ปิด (ราคายังขยับอยู่ระหว่างวัน)
+    # ต้องใช้แท่งรองสุดท้าย = ราคาปิดที่ "ปิดจริงแล้ว" ของวันก่อนหน้า มาเทียบกับ gap
+    prev_regular_close = pd.Series(last_valid(daily_closes, 2), index=tickers, dtype="float64")
+    latest_extended_price = pd.Series(last_valid(ext_closes, 1), index=ext_tickers, dtype="float64").reindex(tickers)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gap_pct = (latest_extended_price - prev_regular_close) / prev_regular_close * 100
+
+    table = pd.DataFrame({"gap_pct": gap_pct})
+    table = table[np.isfinite(table["gap_pct"])]
+    table["passed"] = table["gap_pct"].abs() >= MIN_GAP_PCT
+    return table
+
+
+def compute_session_vwap(intraday):
+    """VWAP ของ session ล่าสุดของทุก ticker จากแท่ง intraday ช่วงตลาดปกติ (Series index = ticker)"""
+    index, close, tickers = column_matrix(intraday, "Close")
+    if not len(index):
+        return pd.Series(np.nan, index=pd.Index(tickers), dtype="float64")
+    sessions = index.normalize().asi8
+    rows = sessions == sessions[-1]
+    _, high, _ = column_matrix(intraday, "High")
+    _, low, _ = column_matrix(intraday, "Low")
+    _, volume, _ = column_matrix(intraday, "Volume")
+    vwap = indicators.vwap(high[rows], low[rows], close[rows], volume[rows], sessions[rows])
+    return pd.Series(vwap[-1], index=tickers, dtype="float64")
+
+
+def incremental_indicator_table(daily, intraday=None):
+    """indicator ค่าล่าสุด (SMA/EMA/RSI/ATR/MACD + VWAP ของ session ล่าสุด) ของทุก ticker คืน DataFrame
+    (index = ticker, คอลัมน์ = indicators.INDICATOR_COLUMNS) ค่า daily มาจาก state แบบ incremental (indicator_state)
+    ที่ต่อเฉพาะแท่งใหม่ daily จึงต้องการแค่ไม่กี่สัปดาห์ล่าสุด (ticker ที่ยังไม่มี state จะถูกสร้างจากประวัติยาวในคลังครั้งเดียว)"""
+    table = indicator_state.get_store().update(daily).reindex(columns=indicators.INDICATOR_COLUMNS)
+    if intraday is not None:
+        table["vwap"] = compute_session_vwap(intraday).reindex(table.index)
+    return table
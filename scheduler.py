@@ -10,9 +10,11 @@ from datetime import datetime
 from zoneinfo import ZoneInfo
 from apscheduler.schedulers.blocking import BlockingScheduler
 
-from screener import update_target_tickers, update_target_tickers_premarket
+from screener import update_target_tickers, update_target_tickers_premarket, load_universe
+from float_table import refresh_float_table, is_stale as float_table_is_stale
 from get_news import run_news_bot
 from verify_bot import run_verification
+from path_evaluator import run_path_evaluation
 
 NY_TZ = ZoneInfo("America/New_York")
 
@@ -76,6 +78,14 @@ def verify_job():
     """งานตรวจผลคำทำนาย รันวันละครั้ง (เวลาใดก็ได้ที่ตลาดปิดแล้ว)"""
     print(f"\n🕵️ [{datetime.now(NY_TZ)}] เริ่มตรวจผลคำทำนาย...")
     run_verification()
+    # target/stop แตะอะไรก่อน + MFE/MAE ของคำทำนายที่เพิ่งครบ horizon
+    run_path_evaluation()
+
+
+def refresh_float_job():
+    """รีเฟรช float/shares outstanding ของทั้ง universe แบบ bulk (นอกเวลาตลาด ไม่แย่ง quota Finnhub กับรอบวิเคราะห์)"""
+    print(f"\n📦 [{datetime.now(NY_TZ)}] เริ่มรีเฟรช float table...")
+    refresh_float_table(load_universe())
 
 
 def main():
@@ -108,10 +118,23 @@ def main():
         id="verify",
     )
 
+    scheduler.add_job(
+        refresh_float_job,
+        "cron",
+        hour=5,  # 05:30 New York = ก่อน pre-market 07:00
+        minute=30,
+        day_of_week="mon-fri",
+        id="refresh_float",
+    )
+    if float_table_is_stale():
+        # ตารางว่าง/ค้าง (เพิ่ง deploy หรือปิดไปนาน) -> รีเฟรชทันทีตอนเริ่ม ไม่ต้องรอถึงเช้า
+        scheduler.add_job(refresh_float_job, id="refresh_float_startup")
+
     print("🚀 Scheduler started. กด Ctrl+C เพื่อหยุด")
     print(f"   - Scan & Analyze (regular hours): ทุก {SCAN_INTERVAL_MINUTES} นาที (09:30-16:00 ET)")
     print(f"   - Scan & Analyze (pre/after-market gap): ทุก {SCAN_INTERVAL_MINUTES} นาที (07:00-09:30, 16:00-20:00 ET)")
     print(f"   - Verify: ทุกวันจันทร์-ศุกร์ 18:00 ET")
+    print(f"   - Float table refresh: ทุกวันจันทร์-ศุกร์ 05:30 ET")
 
     try:
         scheduler.start()
@@ -0,0 +1,234 @@
+"""Screen แบบประกาศเป็นนิพจน์ (rule engine) แทนเกณฑ์ที่ฝังในโค้ด (MIN_PCT_CHANGE, MIN_GAP_PCT, ตัวคูณ float, สูตร momentum_score)
+
+แต่ละ screen = เงื่อนไข where + สูตร score (+ top = เอากี่ตัว) เขียนเป็นนิพจน์ Python บนคอลัมน์ feature ของ ticker:
+    price, prev_close, pct_change, volume_ratio, gap_pct, float_m, float_multiplier, sma50_dist_pct
+    และ indicator ทั้งหมดของ indicators.INDICATOR_COLUMNS (sma20, sma50, ema12, ema26, rsi14, atr14, atr_pct,
+    macd, macd_signal, macd_hist, vwap)
+ฟังก์ชันที่ใช้ได้: abs, max, min (ทีละคู่แบบ element-wise), log, sqrt, where(cond, a, b), isnan, clip
+ค่าคงที่: MIN_PCT_CHANGE, MIN_GAP_PCT   ตัวดำเนินการ: + - * / ** % เปรียบเทียบ and or not
+
+นิพจน์ถูกตรวจด้วย ast (ห้ามเรียก attribute/ฟังก์ชันอื่น) แล้ว compile ครั้งเดียว ทุก screen ประเมินแบบ vectorized
+บน feature frame ชุดเดียวของทั้ง universe (โหลดแท่งครั้งเดียวต่อรอบ ไม่ว่าจะมีกี่ strategy)
+scan_movers / scan_premarket_gaps ของ screener ก็คัดตัวผ่านด้วย screen "movers" / "premarket_gaps" ของที่นี่
+(ไฟล์ rule กำหนดทับได้ ไม่กำหนดใช้ DEFAULT_SCREENS ซึ่งเท่ากับเกณฑ์เดิม)
+
+ไฟล์ SCREEN_RULES_PATH (JSON) ไม่มีใช้ DEFAULT_SCREENS ตัวอย่าง:
+    {"oversold_bounce": {"where": "rsi14 < 30 and pct_change > 0 and volume_ratio >= 1.5",
+                         "score": "volume_ratio * float_multiplier", "top": 5}}
+
+รัน:  python screen_rules.py [--rules my_rules.json]"""
+
+import os
+import ast
+import json
+import argparse
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import indicator_state
+from bar_store import load_timeframes
+from float_table import get_float_m
+from get_fundamentals import float_multiplier_from_float
+from indicators import INDICATOR_COLUMNS
+from scan_tables import (MIN_PCT_CHANGE, MIN_GAP_PCT, SCAN_CHUNK_SIZE, SCAN_WORKERS, SCAN_DTYPE,
+                         compute_mover_table, compute_gap_table, incremental_indicator_table, column_matrix, last_valid)
+from universe import get_universe_manager
+
+SCREEN_RULES_PATH = os.getenv("SCREEN_RULES_PATH", "screen_rules.json")
+
+# เกณฑ์เดิมของ scan_movers / scan_premarket_gaps เขียนเป็น rule
+DEFAULT_SCREENS = {
+    "movers": {
+        "where": "abs(pct_change) >= MIN_PCT_CHANGE",
+        "score": "abs(pct_change) * max(volume_ratio, 1) * float_multiplier",
+    },
+    "premarket_gaps": {
+        "where": "abs(gap_pct) >= MIN_GAP_PCT",
+        "score": "abs(gap_pct) * float_multiplier",
+    },
+}
+
+FEATURE_COLUMNS = ["prev_close", "pct_change", "volume_ratio", "gap_pct", "float_m", "float_multiplier",
+                   "sma50_dist_pct"] + INDICATOR_COLUMNS
+
+FUNCTIONS = {
+    "abs": np.abs, "max": np.maximum, "min": np.minimum, "log": np.log, "sqrt": np.sqrt,
+    "where": np.where, "isnan": np.isnan, "clip": np.clip,
+}
+CONSTANTS = {"MIN_PCT_CHANGE": MIN_PCT_CHANGE, "MIN_GAP_PCT": MIN_GAP_PCT}
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Compare, ast.Call, ast.Name, ast.Load, ast.Constant,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.Mod, ast.USub, ast.UAdd, ast.Invert, ast.BitAnd, ast.BitOr,
+    ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.Eq, ast.NotEq,
+)
+
+Screen = namedtuple("Screen", ["name", "where", "score", "top", "where_code", "score_code"])
+
+
+class _Vectorize(ast.NodeTransformer):
+    """แปลง and/or/not และ a < b < c ให้เป็น & | ~ ที่ทำงานกับ numpy array ทั้งคอลัมน์"""
+
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        op = ast.BitAnd() if isinstance(node.op, ast.And) else ast.BitOr()
+        result = node.values[0]
+        for value in node.values[1:]:
+            result = ast.BinOp(left=result, op=op, right=value)
+        return result
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Not):
+            return ast.UnaryOp(op=ast.Invert(), operand=node.operand)
+        return node
+
+    def visit_Compare(self, node):
+        self.generic_visit(node)
+        if len(node.ops) == 1:
+            return node
+        parts, left = [], node.left
+        for op, right in zip(node.ops, node.comparators):
+            parts.append(ast.Compare(left=left, ops=[op], comparators=[right]))
+            left = right
+        result = parts[0]
+        for part in parts[1:]:
+            result = ast.BinOp(left=result, op=ast.BitAnd(), right=part)
+        return result
+
+
+def compile_expression(expr, columns=FEATURE_COLUMNS):
+    """ตรวจนิพจน์ (ใช้ได้เฉพาะคอลัมน์/ฟังก์ชัน/ค่าคงที่ที่อนุญาต) แล้ว compile เป็น code object
+    นิพจน์ไม่ถูกต้อง -> ValueError"""
+    try:
+        tree = ast.parse(str(expr), mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"นิพจน์ผิดรูปแบบ: {expr!r} ({e.msg})") from None
+    tree = ast.fix_missing_locations(_Vectorize().visit(tree))
+
+    names = set(columns) | set(FUNCTIONS) | set(CONSTANTS)
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise ValueError(f"ใช้ {type(node).__name__} ในนิพจน์ไม่ได้: {expr!r}")
+        if isinstance(node, ast.Name) and node.id not in names:
+            raise ValueError(f"ไม่รู้จักชื่อ {node.id!r} ในนิพจน์: {expr!r}")
+        if isinstance(node, ast.Call) and (not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS
+                                           or node.keywords):
+            raise ValueError(f"เรียกได้เฉพาะ {sorted(FUNCTIONS)} แบบไม่มี keyword: {expr!r}")
+        if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float, bool)):
+            raise ValueError(f"ค่าคงที่ต้องเป็นตัวเลข: {expr!r}")
+    return compile(tree, f"<screen {expr}>", "eval")
+
+
+def compile_screen(name, where, score="0", top=None):
+    return Screen(name, where, score, top, compile_expression(where), compile_expression(score))
+
+
+def load_screens(path=None):
+    """อ่าน screen จากไฟล์ JSON {ชื่อ: {"where", "score", "top"}} ไม่มีไฟล์ใช้ DEFAULT_SCREENS"""
+    path = path or SCREEN_RULES_PATH
+    try:
+        with open(path, "r") as f:
+            rules = json.load(f)
+    except FileNotFoundError:
+        rules = DEFAULT_SCREENS
+    return [compile_screen(name, rule["where"], rule.get("score", "0"), rule.get("top"))
+            for name, rule in rules.items()]
+
+
+def evaluate_screens(features, screens):
+    """ประเมินทุก screen บน feature frame (index = ticker) ในครั้งเดียว
+    คืน dict ชื่อ screen -> DataFrame ของตัวที่ผ่าน เรียงตาม score มากไปน้อย (ตัด top ถ้ากำหนด)"""
+    n = len(features)
+    namespace = {c: features[c].to_numpy(dtype="float64") if c in features else np.full(n, np.nan)
+                 for c in FEATURE_COLUMNS}
+    namespace.update(FUNCTIONS)
+    namespace.update(CONSTANTS)
+
+    results = {}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for screen in screens:
+            passed = eval(screen.where_code, {"__builtins__": {}}, namespace)
+            score = eval(screen.score_code, {"__builtins__": {}}, namespace)
+            passed = np.broadcast_to(np.asarray(passed, dtype=bool), n)
+            score = np.broadcast_to(np.asarray(score, dtype="float64"), n)
+            table = features[passed].assign(score=score[passed])
+            table = table.sort_values("score", ascending=False, na_position="last", kind="stable")
+            results[screen.name] = table.head(screen.top) if screen.top else table
+    return results
+
+
+def get_screen(name, path=None):
+    """screen ชื่อ name จากไฟล์ rule ถ้าไฟล์ไม่มี screen ชื่อนี้ใช้ของ DEFAULT_SCREENS
+    (scan_movers / scan_premarket_gaps ของ screener เลือกตัวที่ผ่านด้วย "movers" / "premarket_gaps")"""
+    for screen in load_screens(path):
+        if screen.name == name:
+            return screen
+    rule = DEFAULT_SCREENS[name]
+    return compile_screen(name, rule["where"], rule.get("score", "0"), rule.get("top"))
+
+
+def features_from_bars(tickers, bars, indicator_table=None):
+    """feature frame (index = ticker, คอลัมน์ = FEATURE_COLUMNS) จากแท่งที่โหลดมาแล้วของ load_timeframes
+    indicator_table ไม่ส่งมาจะคำนวณจาก state แบบ incremental"""
+    movers = compute_mover_table(bars["daily"], bars["intraday"], dtype=SCAN_DTYPE).reindex(tickers)
+    gaps = compute_gap_table(bars["daily"], bars["extended"], dtype=SCAN_DTYPE).reindex(tickers)
+    if indicator_table is None:
+        indicator_table = incremental_indicator_table(bars["daily"], bars["intraday"])
+
+    features = pd.DataFrame(np.nan, index=pd.Index(tickers), columns=FEATURE_COLUMNS)
+    features[INDICATOR_COLUMNS] = indicator_table.reindex(index=tickers, columns=INDICATOR_COLUMNS)
+    _, closes, order = column_matrix(bars["daily"], "Close", "float64")
+    if len(closes):
+        features.loc[order, "prev_close"] = last_valid(closes, 2)
+    features["pct_change"] = movers["pct_change"].astype("float64")
+    features["volume_ratio"] = movers["volume_ratio"].astype("float64")
+    features["gap_pct"] = gaps["gap_pct"].astype("float64")
+    float_m = [get_float_m(t) for t in tickers]
+    features["float_m"] = [np.nan if f is None else f for f in float_m]
+    features["float_multiplier"] = [float_multiplier_from_float(f) for f in float_m]
+    features["sma50_dist_pct"] = (features["price"] - features["sma50"]) / features["sma50"] * 100
+    return features
+
+
+def _chunk_features(tickers):
+    bars = load_timeframes(tickers, daily_period="1mo", intraday_period="6d", extended_period="2d", dtype=SCAN_DTYPE)
+    return features_from_bars(tickers, bars)
+
+
+def build_features(tickers):
+    """feature frame ของทั้ง universe (index = ticker) โหลดแท่งเป็นก้อนขนานกันแบบเดียวกับ scan ของ screener"""
+    chunks = [tickers[i:i + SCAN_CHUNK_SIZE] for i in range(0, len(tickers), SCAN_CHUNK_SIZE)]
+    if not chunks:
+        return pd.DataFrame(columns=FEATURE_COLUMNS, dtype="float64")
+    with ThreadPoolExecutor(max_workers=min(SCAN_WORKERS, len(chunks))) as pool:
+        features = pd.concat(list(pool.map(_chunk_features, chunks)))
+    indicator_state.get_store().save_if_dirty()
+    return features
+
+
+def run_screens(tickers, screens=None):
+    """โหลด feature ครั้งเดียวแล้วประเมินทุก screen คืน dict ชื่อ screen -> list of dict (ticker, score, features)"""
+    screens = screens if screens is not None else load_screens()
+    features = build_features(tickers)
+    results = {}
+    for name, table in evaluate_screens(features, screens).items():
+        rows = table.round(2).reset_index(names="ticker")
+        results[name] = [{k: (None if isinstance(v, float) and np.isnan(v) else v) for k, v in row.items()}
+                         for row in rows.to_dict("records")]
+        print(f"🧮 Screen {name}: ผ่าน {len(table)} ตัว")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run declarative screens over the universe")
+    parser.add_argument("--rules", help=f"ไฟล์ rule (ค่าเริ่มต้น {SCREEN_RULES_PATH})")
+    args = parser.parse_args()
+
+    for name, rows in run_screens(get_universe_manager().get(), load_screens(args.rules)).items():
+        print(f"\n🏁 {name}")
+        for row in rows:
+            print(f"   {row['ticker']:<6} score {row['score']}")
@@ -1,169 +1,195 @@
 """Screener: สแกนหุ้นจาก watchlist_universe.txt หา 'หุ้นซิ่ง' ของวันนี้ (% เปลี่ยนแปลง + volume spike)
 ใช้ yfinance batch download เท่านั้น — ไม่มี API key/quota จึงสแกนได้หลายร้อยตัวพร้อมกันโดยไม่เสียค่าใช้จ่าย
+แท่งราคาอ่านจาก bar_store (คลังบน disk) ซึ่งแต่ละรอบดึงเพิ่มเฉพาะแท่งใหม่
 ผลลัพธ์ top N จะถูกเขียนทับ target_ticker.txt ให้ get_news.py ไปวิเคราะห์ลึกต่อ (ที่ใช้ quota จำกัด)"""
 
-import yfinance as yf
+import os
+import time
+import heapq
+import resource
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
-from get_fundamentals import get_float_momentum_multiplier
-from get_social_buzz import get_trending_symbols
+import numpy as np
+import pandas as pd
+
+from bar_store import load_timeframes
+import indicators
+import indicator_state
+import screen_rules
+from scan_tables import SCAN_CHUNK_SIZE, SCAN_WORKERS, SCAN_DTYPE, incremental_indicator_table
+from universe import get_universe_manager
 
-UNIVERSE_FILE = "watchlist_universe.txt"
 TARGET_FILE = "target_ticker.txt"
 
-MIN_PCT_CHANGE = 3.0      # % เปลี่ยนแปลงขั้นต่ำที่ถือว่า "ซิ่ง"
-MIN_GAP_PCT = 4.0         # % gap ขั้นต่ำช่วง pre-market/after-hours ที่ถือว่าน่าสนใจ
+# ขนาดก้อน/จำนวน worker/dtype ของการสแกนอยู่ที่ scan_tables (ใช้ร่วมกับ screen_rules)
+SCAN_MAX_RSS_MB = int(os.getenv("SCAN_MAX_RSS_MB", "1024"))   # 0 = ไม่จำกัด
+SCAN_TOP_K = int(os.getenv("SCAN_TOP_K", "0"))                 # เก็บผู้เข้าชิงสูงสุดกี่ตัวต่อรอบ (0 = เก็บทุกตัวที่ผ่าน)
+
+# สถิติของการสแกนล่าสุด (จำนวนก้อน เวลา peak RSS) ไว้ให้ benchmark/log อ่าน
+last_scan_stats = {}
 
 
 def load_universe(include_trending=True):
     """รวม watchlist คงที่ + หุ้นที่กำลัง trending บน StockTwits (จับตัวที่ไม่อยู่ใน watchlist
-    แต่ดันมาฮือฮาขึ้นมาเฉยๆ) ตัวที่ดึง trending ไม่ได้/error ก็ไม่กระทบ ใช้ watchlist เดิมต่อได้"""
+    แต่ดันมาฮือฮาขึ้นมาเฉยๆ) ตัวที่ดึง trending ไม่ได้/error ก็ไม่กระทบ ใช้ watchlist เดิมต่อได้
+    (ผ่าน UniverseManager ตัวเดียวของ process: อ่านไฟล์ใหม่เมื่อ mtime เปลี่ยน + cache trending ตาม TTL)"""
+    return get_universe_manager().get(include_trending)
+
+
+def _rss_mb():
+    """RSS ปัจจุบันของ process (MB) อ่านจาก /proc (Linux) ถ้าไม่มีใช้ค่า peak ของ process จาก resource แทน"""
     try:
-        with open(UNIVERSE_FILE, "r") as f:
-            universe = [line.strip().upper() for line in f
-                        if line.strip() and not line.strip().startswith("#")]
-    except FileNotFoundError:
-        print(f"❌ ไม่พบไฟล์ {UNIVERSE_FILE}")
-        universe = []
-
-    if include_trending:
-        trending = get_trending_symbols()
-        if trending:
-            print(f"📈 เพิ่ม {len(trending)} ตัวที่ trending จาก StockTwits เข้า universe")
-            universe = list(dict.fromkeys(universe + [t.upper() for t in trending]))
-
-    return universe
-
-
-def _pace_normalized_volume_ratio(intraday_df, lookback_days=5):
-    """เทียบ volume ของ 'วันนี้จนถึงเวลานี้' กับค่าเฉลี่ยของช่วงเวลาเดียวกันใน lookback_days วันก่อน
-    แม่นยำกว่าการเทียบกับ full-day average ตรงๆ เพราะวันนี้ยังไม่ปิดตลาด (แท่งสะสมไม่ครบวัน)"""
-    df = intraday_df.dropna()
-    if df.empty:
-        return 0
-
-    dates = sorted(set(df.index.date))
-    if len(dates) < 2:
-        return 0
-
-    today = dates[-1]
-    today_df = df[df.index.date == today]
-    if today_df.empty:
-        return 0
-
-    cutoff_time = today_df.index[-1].time()
-    today_volume_sofar = today_df["Volume"].sum()
-
-    past_sums = []
-    for d in dates[:-1][-lookback_days:]:
-        day_df = df[df.index.date == d]
-        sofar = day_df[day_df.index.time <= cutoff_time]["Volume"].sum()
-        if sofar > 0:
-            past_sums.append(sofar)
-
-    avg_past_sofar = sum(past_sums) / len(past_sums) if past_sums else 0
-    return (today_volume_sofar / avg_past_sofar) if avg_past_sofar else 0
-
-
-def scan_movers(tickers):
-    """สแกนทุก ticker พร้อมกันด้วย yfinance batch download คืน list of dict ที่ผ่านเกณฑ์ 'ซิ่ง'"""
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class _PeakRssSampler:
+    """เก็บ RSS สูงสุดระหว่างสแกน (sample ทุก interval วินาทีใน thread แยก)"""
+
+    def __init__(self, interval=0.1):
+        self.interval = interval
+        self.peak_mb = _rss_mb()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak_mb = max(self.peak_mb, _rss_mb())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, _rss_mb())
+
+
+def _sharded_scan(tickers, score_chunk, label, top_k=None, chunk_size=None, workers=None, max_rss_mb=None):
+    """แบ่ง universe เป็นก้อนละ chunk_size ตัว ให้ worker pool โหลด+ให้คะแนนทีละก้อน (ข้อมูลของแต่ละก้อน
+    ถูกทิ้งทันทีที่ให้คะแนนเสร็จ) แล้ว merge เฉพาะ top_k ตัวที่ momentum_score สูงสุดด้วย heap (0 = ไม่ตัด)
+    ถ้า RSS เกิน max_rss_mb จะรอก้อนที่กำลังทำอยู่ให้เสร็จก่อนส่งก้อนใหม่ (0 = ไม่จำกัด)"""
+    top_k = SCAN_TOP_K if top_k is None else top_k
+    chunk_size = chunk_size or SCAN_CHUNK_SIZE
+    workers = workers or SCAN_WORKERS
+    max_rss_mb = SCAN_MAX_RSS_MB if max_rss_mb is None else max_rss_mb
+
+    chunks = [tickers[i:i + chunk_size] for i in range(0, len(tickers), chunk_size)]
+    heap, seq = [], 0
+    passed = 0
+    start = time.monotonic()
+
+    def collect(done):
+        nonlocal seq, passed
+        for future in done:
+            try:
+                chunk_results = future.result()
+            except Exception as e:
+                print(f"⚠️ Skip chunk: {e}")
+                continue
+            passed += len(chunk_results)
+            for r in chunk_results:
+                item = (r["momentum_score"], -seq, r)
+                seq += 1
+                if not top_k or len(heap) < top_k:
+                    heapq.heappush(heap, item)
+                else:
+                    heapq.heappushpop(heap, item)
+
+    with _PeakRssSampler() as sampler, \
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scan") as pool:
+        pending = set()
+        for chunk in chunks:
+            while pending and (len(pending) >= workers or (max_rss_mb and _rss_mb() > max_rss_mb)):
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending.add(pool.submit(score_chunk, chunk))
+        collect(pending)
+    indicator_state.get_store().save_if_dirty()     # บันทึก state ครั้งเดียวหลังทุก chunk เสร็จ
+
+    elapsed = time.monotonic() - start
+    last_scan_stats.clear()
+    last_scan_stats.update({
+        "label": label, "tickers": len(tickers), "chunks": len(chunks), "passed": passed,
+        "dropped": passed - len(heap), "seconds": round(elapsed, 3), "peak_rss_mb": round(sampler.peak_mb, 1),
+    })
+    print(f"📏 {label}: {len(tickers)} tickers / {len(chunks)} chunks | ผ่านเกณฑ์ {passed} ตัว | "
+          f"{elapsed:.1f}s | peak RSS {sampler.peak_mb:.0f} MB")
+    if passed > len(heap):
+        print(f"⚠️ {label}: ตัดเหลือ top {top_k} (SCAN_TOP_K) ทิ้งตัวที่ผ่านเกณฑ์ไป {passed - len(heap)} ตัว")
+    return [r for _, _, r in sorted(heap, reverse=True)]
+
+
+def _publish_indicators(bars):
+    """ต่อ indicator ด้วยแท่งที่โหลดมาสแกนแล้วเก็บไว้ให้ get_technicals อ่าน (ไม่ต้องดึงประวัติราคาซ้ำ)
+    คืนตาราง indicator ไว้ต่อเป็น feature ของ screen (คำนวณไม่ได้คืนตารางว่าง ค่าเป็น NaN)"""
+    try:
+        table = incremental_indicator_table(bars["daily"], bars["intraday"])
+        indicators.publish(table)
+        return table
+    except Exception as e:
+        print(f"⚠️ Indicator table error: {e}")
+        return pd.DataFrame(columns=indicators.INDICATOR_COLUMNS, dtype="float64")
+
+
+def _screen(name):
+    """screen ชื่อ name ของ screen_rules (ไฟล์ rule กำหนดทับได้)"""
+    return screen_rules.get_screen(name)
+
+
+def _screen_chunk(tickers, screen, fields, **periods):
+    """โหลดแท่งของก้อน -> feature frame -> คัดด้วย screen ของ rule engine
+    คืน list of dict ของตัวที่ผ่าน: ticker + fields + momentum_score (= score ของ screen)"""
+    bars = load_timeframes(tickers, dtype=SCAN_DTYPE, **periods)
+    features = screen_rules.features_from_bars(tickers, bars, _publish_indicators(bars))
+    table = screen_rules.evaluate_screens(features, [screen])[screen.name]
+
+    results = []
+    for ticker, row in zip(table.index, table.to_dict("records")):
+        if not np.isfinite(row["score"]):
+            continue    # จัดอันดับไม่ได้
+        result = {"ticker": ticker}
+        result.update({f: round(float(row[f]), 2) for f in fields})
+        result["momentum_score"] = round(float(row["score"]), 2)
+        results.append(result)
+    return results
+
+
+def _score_mover_chunk(tickers, screen=None):
+    # float มาจากตารางใน memory (รีเฟรชวันละครั้ง) ไม่ยิง Finnhub ระหว่างสแกน
+    return _screen_chunk(tickers, screen or _screen("movers"), ["pct_change", "volume_ratio", "float_multiplier"],
+                         daily_period="1mo", intraday_period="6d")
+
+
+def scan_movers(tickers, top_k=None):
+    """สแกนทุก ticker (แบ่งก้อนโหลดขนานกัน) คืน list of dict ที่ผ่าน screen "movers" top_k ตัวเรียงตาม momentum_score"""
     if not tickers:
         return []
 
     print(f"🔍 Scanning {len(tickers)} tickers...")
-    daily = yf.download(
-        tickers=" ".join(tickers),
-        period="1mo",
-        interval="1d",
-        group_by="ticker",
-        threads=True,
-        progress=False,
-    )
-    intraday = yf.download(
-        tickers=" ".join(tickers),
-        period="6d",
-        interval="5m",
-        group_by="ticker",
-        threads=True,
-        progress=False,
-    )
+    screen = _screen("movers")
+    return _sharded_scan(tickers, lambda chunk: _score_mover_chunk(chunk, screen), "scan_movers", top_k=top_k)
 
-    results = []
-    for ticker in tickers:
-        try:
-            df = (daily[ticker] if len(tickers) > 1 else daily).dropna()
-            if len(df) < 5:
-                continue
 
-            last_close = df["Close"].iloc[-1]
-            prev_close = df["Close"].iloc[-2]
-            pct_change = ((last_close - prev_close) / prev_close) * 100
-
-            intraday_df = intraday[ticker] if len(tickers) > 1 else intraday
-            volume_ratio = _pace_normalized_volume_ratio(intraday_df)
-
-            if abs(pct_change) >= MIN_PCT_CHANGE:
-                # เช็ค float เฉพาะตัวที่ผ่านเกณฑ์ %change แล้ว (กันยิง Finnhub ทุกตัวในทุกรอบสแกน)
-                float_multiplier = get_float_momentum_multiplier(ticker)
-                # volume_ratio เป็น pace-normalized แล้ว เชื่อค่าจริงได้ ไม่ต้อง floor ปลอม
-                # floor ที่ 1.0 ไว้กันแค่กรณี data ขาด (volume_ratio=0) ไม่ให้ momentum_score เป็น 0 ไปด้วย
-                momentum_score = abs(pct_change) * max(volume_ratio, 1.0) * float_multiplier
-                results.append({
-                    "ticker": ticker,
-                    "pct_change": round(pct_change, 2),
-                    "volume_ratio": round(volume_ratio, 2),
-                    "float_multiplier": float_multiplier,
-                    "momentum_score": round(momentum_score, 2),
-                })
-        except Exception as e:
-            print(f"⚠️ Skip {ticker}: {e}")
-            continue
-
-    results.sort(key=lambda x: x["momentum_score"], reverse=True)
-    return results
+def _score_gap_chunk(tickers, screen=None):
+    # แท่ง 5 นาทีรวม pre/after-market ชุดเดียวกับที่ scan_movers ใช้ (รอบปกติกับรอบ gap ไม่ดึงซ้ำ)
+    return _screen_chunk(tickers, screen or _screen("premarket_gaps"), ["gap_pct", "float_multiplier"],
+                         daily_period="5d", intraday_period="1d", extended_period="2d")
 
 
-def scan_premarket_gaps(tickers):
+def scan_premarket_gaps(tickers, top_k=None):
     """สแกนหา gap ช่วง pre-market/after-hours เทียบกับราคาปิดตลาดปกติของวันก่อนหน้า
     ใช้ตอนตลาดยังไม่เปิด/ปิดไปแล้ว ที่ scan_movers() แบบ daily bar มองไม่เห็น"""
     if not tickers:
         return []
 
     print(f"🌅 Scanning {len(tickers)} tickers for pre/after-market gaps...")
-
-    daily = yf.download(tickers=" ".join(tickers), period="5d", interval="1d",
-                         group_by="ticker", threads=True, progress=False)
-    extended = yf.download(tickers=" ".join(tickers), period="2d", interval="5m",
-                            prepost=True, group_by="ticker", threads=True, progress=False)
-
-    results = []
-    for ticker in tickers:
-        try:
-            daily_df = (daily[ticker] if len(tickers) > 1 else daily).dropna()
-            ext_df = (extended[ticker] if len(tickers) > 1 else extended).dropna()
-            if len(daily_df) < 2 or ext_df.empty:
-                continue
-
-            # iloc[-1] ของ daily bar คือ "วันนี้" ที่ยังไม่ปิด (ราคายังขยับอยู่ระหว่างวัน)
-            # ต้องใช้ iloc[-2] = ราคาปิดที่ "ปิดจริงแล้ว" ของวันก่อนหน้า มาเทียบกับ gap
-            prev_regular_close = daily_df["Close"].iloc[-2]
-            latest_extended_price = ext_df["Close"].iloc[-1]
-
-            gap_pct = ((latest_extended_price - prev_regular_close) / prev_regular_close) * 100
-
-            if abs(gap_pct) >= MIN_GAP_PCT:
-                float_multiplier = get_float_momentum_multiplier(ticker)
-                results.append({
-                    "ticker": ticker,
-                    "gap_pct": round(gap_pct, 2),
-                    "float_multiplier": float_multiplier,
-                    "momentum_score": round(abs(gap_pct) * float_multiplier, 2),
-                })
-        except Exception as e:
-            print(f"⚠️ Skip {ticker}: {e}")
-            continue
-
-    results.sort(key=lambda x: x["momentum_score"], reverse=True)
-    return results
+    screen = _screen("premarket_gaps")
+    return _sharded_scan(tickers, lambda chunk: _score_gap_chunk(chunk, screen), "scan_premarket_gaps", top_k=top_k)
 
 
 def update_target_tickers_premarket(top_n=5):
@@ -180,7 +206,7 @@ def update_target_tickers_premarket(top_n=5):
         for m in top_movers:
             f.write(m["ticker"] + "\n")
 
-    print(f"✅ พบ {len(movers)} ตัวมี gap คัด Top {len(top_movers)} เขียนลง {TARGET_FILE}:")
+    print(f"✅ พบ {last_scan_stats.get('passed', len(movers))} ตัวมี gap คัด Top {len(top_movers)} เขียนลง {TARGET_FILE}:")
     for m in top_movers:
         print(f"   {m['ticker']}: gap {m['gap_pct']:+.2f}% | Float x{m['float_multiplier']:.1f} | Score {m['momentum_score']:.1f}")
 
@@ -202,7 +228,7 @@ def update_target_tickers(top_n=5):
         for m in top_movers:
             f.write(m["ticker"] + "\n")
 
-    print(f"✅ พบ {len(movers)} ตัวที่ซิ่ง คัด Top {len(top_movers)} เขียนลง {TARGET_FILE}:")
+    print(f"✅ พบ {last_scan_stats.get('passed', len(movers))} ตัวที่ซิ่ง คัด Top {len(top_movers)} เขียนลง {TARGET_FILE}:")
     for m in top_movers:
         print(f"   {m['ticker']}: {m['pct_change']:+.2f}% | Volume x{m['volume_ratio']:.1f} | "
               f"Float x{m['float_multiplier']:.1f} | Score {m['momentum_score']:.1f}")
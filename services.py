@@ -1,15 +1,18 @@
 import os
 import json
-import requests
-import yfinance as yf
-import pandas as pd
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import http_client
 from dotenv import load_dotenv
 from db_handler import get_accuracy_stats, get_learning_examples
-from get_fundamentals import get_fundamental_context, get_fundamental_signal_score
-from get_macro import get_macro_context, get_macro_signal_score
+from get_macro import get_macro_context, get_market_snapshot
 from signal_engine import compute_confluence, get_news_sentiment_score
-from get_social_buzz import get_stocktwits_sentiment_score, get_social_buzz_context
-from get_dilution_risk import get_dilution_risk_score, get_dilution_context
+from signal_snapshot import SignalSnapshot
+from rate_limiter import acquire
+from llm_registry import ModelHealthRegistry
+from quote_service import get_quote, get_quotes
 
 # สามารถเลือก import ค่าย AI ที่ต้องการใช้
 import google.generativeai as genai
@@ -28,6 +31,18 @@ LINE_GROUP_ID = os.getenv("LINE_GROUP_ID")
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
 
 IMPACT_THRESHOLD = 5
+# ตัด ticker ที่ confluence strength ไม่มีทางผ่าน IMPACT_THRESHOLD ก่อนเรียก LLM (impact_score ถูกทับด้วยค่านี้อยู่แล้ว)
+LLM_PREGATE_ENABLED = os.getenv("LLM_PREGATE_ENABLED", "true").lower() != "false"
+
+# deadline ของการดึงสัญญาณแต่ละแหล่ง (วินาที) ตัวที่ช้าเกินจะได้ score 0 / "N/A" แทน ไม่ถ่วงทั้ง ticker
+SIGNAL_SOURCE_TIMEOUT = float(os.getenv("SIGNAL_SOURCE_TIMEOUT", "12"))
+SIGNAL_TOTAL_TIMEOUT = float(os.getenv("SIGNAL_TOTAL_TIMEOUT", "20"))
+
+# timeout ต่อการเรียก LLM 1 ครั้ง (วินาที) กัน provider ที่ค้างตัวเดียวกินเวลาทั้งรอบสแกน
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+
+GEMINI_MODELS = ['models/gemini-2.5-pro',  'models/gemini-1.5-pro', 'models/gemini-2.0-flash', 'models/gemini-1.5-flash']
+CLAUDE_MODEL = "claude-3-5-sonnet-20240620" # รุ่นเทพสุด
 
 if GEMINI_API_KEY:
     genai.configure(api_key=GEMINI_API_KEY)
@@ -38,19 +53,49 @@ openai_client = None
 if OPENAI_API_KEY:
     openai_client = OpenAI(
         api_key=OPENAI_API_KEY,
-        base_url=BASE_URL if BASE_URL else None
+        base_url=BASE_URL if BASE_URL else None,
+        timeout=LLM_TIMEOUT,
     )
+
+# client ของแต่ละค่ายสร้างครั้งเดียวแล้วใช้ซ้ำ (เดิมสร้างใหม่ทุก call) + สุขภาพของแต่ละโมเดล
+_gemini_models = {}
+_claude_client = None
+llm_health = ModelHealthRegistry()
+
+
+def reset_llm_clients():
+    """ล้าง client ที่ cache ไว้ + สถานะสุขภาพโมเดล (ใช้ตอนเปลี่ยน key หรือในเทส)"""
+    global _claude_client
+    _gemini_models.clear()
+    _claude_client = None
+    llm_health.reset()
+
+
+def _get_gemini_model(model_name):
+    if model_name not in _gemini_models:
+        _gemini_models[model_name] = genai.GenerativeModel(model_name)
+    return _gemini_models[model_name]
+
+
+def _get_claude_client():
+    global _claude_client
+    if _claude_client is None:
+        _claude_client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY, timeout=LLM_TIMEOUT)
+    return _claude_client
+
 # ============================
 # 🤖 AI Provider Functions (แยกการทำงานแต่ละค่าย)
 # ============================
 def call_claude(prompt):
     if not ANTHROPIC_API_KEY: return None
-    
-    client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
-    
+    if not llm_health.available([CLAUDE_MODEL]):
+        print(f"⏭️ Claude ({CLAUDE_MODEL}) อยู่ในช่วงพัก ข้าม")
+        return None
+
+    start = time.monotonic()
     try:
-        message = client.messages.create(
-            model="claude-3-5-sonnet-20240620", # รุ่นเทพสุด
+        message = _get_claude_client().messages.create(
+            model=CLAUDE_MODEL,
             max_tokens=1024,
             messages=[
                 {"role": "user", "content": prompt}
@@ -65,26 +110,36 @@ def call_claude(prompt):
         json_end = content.rfind('}') + 1
         json_str = content[json_start:json_end]
         
-        return json.loads(json_str)
-        
+        result = json.loads(json_str)
     except Exception as e:
         print(f"❌ Claude Error: {e}")
+        llm_health.record_failure(CLAUDE_MODEL, e, time.monotonic() - start)
         return None
 
+    llm_health.record_success(CLAUDE_MODEL, time.monotonic() - start)
+    return result
+
 def call_gemini(prompt):
-    """เรียกใช้ Google Gemini"""
-    models = ['models/gemini-2.5-pro',  'models/gemini-1.5-pro', 'models/gemini-2.0-flash', 'models/gemini-1.5-flash']
-    
+    """เรียกใช้ Google Gemini — ลองเฉพาะโมเดลที่ไม่ได้ถูกพัก (fail ติดกัน/โดน quota) ตามลำดับความชอบ"""
+    models = llm_health.available(GEMINI_MODELS)
+    if not models:
+        print("⏭️ Gemini ทุกโมเดลอยู่ในช่วงพัก ข้าม")
+        return None
+
     for model_name in models:
+        start = time.monotonic()
         try:
-            model = genai.GenerativeModel(model_name)
-            res = model.generate_content(
+            res = _get_gemini_model(model_name).generate_content(
                 prompt, 
-                generation_config={"response_mime_type": "application/json"}
+                generation_config={"response_mime_type": "application/json"},
+                request_options={"timeout": LLM_TIMEOUT},
             )
-            return json.loads(res.text)
-        except:
+            result = json.loads(res.text)
+        except Exception as e:
+            llm_health.record_failure(model_name, e, time.monotonic() - start)
             continue
+        llm_health.record_success(model_name, time.monotonic() - start)
+        return result
     return None
 
 def call_openai(prompt):
@@ -93,7 +148,11 @@ def call_openai(prompt):
     
     # เลือกโมเดล (ถ้าใช้ DeepSeek ให้แก้เป็น 'deepseek-chat')
     model_name = "gpt-4o" if not BASE_URL else "deepseek-chat"
-    
+    if not llm_health.available([model_name]):
+        print(f"⏭️ OpenAI ({model_name}) อยู่ในช่วงพัก ข้าม")
+        return None
+
+    start = time.monotonic()
     try:
         response = openai_client.chat.completions.create(
             model=model_name,
@@ -104,11 +163,15 @@ def call_openai(prompt):
             response_format={"type": "json_object"} # บังคับ JSON
         )
         content = response.choices[0].message.content
-        return json.loads(content)
+        result = json.loads(content)
     except Exception as e:
         print(f"❌ OpenAI Error: {e}")
+        llm_health.record_failure(model_name, e, time.monotonic() - start)
         return None
 
+    llm_health.record_success(model_name, time.monotonic() - start)
+    return result
+
 # ============================
 # 📤 Function: ส่ง LINE
 # ============================
@@ -116,12 +179,14 @@ def send_line_push(message):
     url = "https://api.line.me/v2/bot/message/push"
     headers = {
         "Content-Type": "application/json",
-        "Authorization": f"Bearer {LINE_CHANNEL_ACCESS_TOKEN}"
+        "Authorization": f"Bearer {LINE_CHANNEL_ACCESS_TOKEN}",
+        # http_client retry เมื่อเจอ 5xx — retry key ทำให้ LINE ไม่ส่งข้อความซ้ำถ้าครั้งแรกส่งถึงแล้ว
+        "X-Line-Retry-Key": str(uuid.uuid4()),
     }
     payload = {"to": LINE_GROUP_ID, "messages": [{"type": "text", "text": message}]}
     
     try:
-        requests.post(url, headers=headers, json=payload)
+        http_client.post(url, headers=headers, json=payload)
     except Exception as e:
         print(f"❌ Line Error: {e}")
 
@@ -129,15 +194,9 @@ def send_line_push(message):
 # 💰 Function: ดึงราคาปัจจุบัน
 # ============================
 def get_current_price(ticker):
-    # ถ้าไม่มี Ticker หรือเป็น General ให้ข้าม
-    if not ticker or ticker == "GENERAL": return 0.0
-    
-    url = f"https://www.alphavantage.co/query?function=GLOBAL_QUOTE&symbol={ticker}&apikey={ALPHA_VANTAGE_API_KEY}"
-    try:
-        data = requests.get(url).json()
-        return float(data["Global Quote"]["05. price"])
-    except:
-        return 0.0
+    """ราคาล่าสุดผ่าน quote_service (batch + cache สั้นๆ ใน memory) ไม่มี ticker/GENERAL/ดึงไม่ได้ = 0.0
+    ถ้ามีหลายตัวให้ใช้ get_quotes(symbols) ครั้งเดียวแทน"""
+    return get_quote(ticker)
 # ============================
 # 💰 Function: ดึงราคาปัจจุบัน (yfinance)
 # ============================
@@ -152,118 +211,44 @@ def get_current_price(ticker):
 # ============================
 # 🧠 Function: วิเคราะห์ด้วย AI 
 # ============================
-def get_market_context():
-    """เช็คดัชนีหลัก: S&P500 (^GSPC) และ Bitcoin (BTC-USD)"""
-    indices = {
-        "S&P 500": "^GSPC",
-        "Bitcoin": "BTC-USD"
-    }
-    context_str = ""
-    
-    try:
-        for name, ticker in indices.items():
-            # ดึงข้อมูลย้อนหลัง 2 วันเพื่อเทียบราคา
-            data = yf.Ticker(ticker).history(period="5d")
-            if len(data) >= 2:
-                last_close = data['Close'].iloc[-1]
-                prev_close = data['Close'].iloc[-2]
-                change_pct = ((last_close - prev_close) / prev_close) * 100
-                
-                trend = "UP" if change_pct > 0 else "DOWN"
-                context_str += f"- {name}: {trend} ({change_pct:+.2f}%)\n"
-    except Exception as e:
-        print(f"⚠️ Market Context Error: {e}")
+def get_market_context(snapshot=None):
+    """เช็คดัชนีหลัก: S&P500 (^GSPC) และ Bitcoin (BTC-USD) + Macro จาก market snapshot ของรอบนี้
+    (snapshot สร้างด้วย yf.download ครั้งเดียวต่อรอบ ใช้ร่วมกับ macro score ของทุก ticker)"""
+    snapshot = snapshot or get_market_snapshot()
+    if not snapshot["indices"]:
+        print("⚠️ Market Context Error: ไม่มีข้อมูล index ใน snapshot")
         return "Market data unavailable."
 
-    context_str += "\n" + get_macro_context()
-
-    return context_str.strip()
-
-# ============================
-# 📈 ฟังก์ชันดึงเทคนิคอล (RSI, SMA) จาก yfinance
-# ============================
-def _fetch_technical_data(ticker):
-    """ดึงราคา/SMA50/RSI ดิบ คืนเป็น dict (ใช้ทั้งทำ string โชว์ และคำนวณ score)"""
-    try:
-        # ดึงข้อมูลย้อนหลัง 3 เดือน (เพื่อให้คำนวณ SMA50 ได้)
-        df = yf.Ticker(ticker).history(period="3mo")
-
-        if len(df) < 50:
-            return None
-
-        sma50 = df['Close'].rolling(window=50).mean().iloc[-1]
-        current_price = df['Close'].iloc[-1]
-
-        delta = df['Close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-        rs = gain / loss
-        rsi = 100 - (100 / (1 + rs)).iloc[-1]
-
-        return {"price": current_price, "sma50": sma50, "rsi": rsi}
-    except Exception as e:
-        print(f"⚠️ Technical Data Error: {e}")
-        return None
-
-
-def get_technical_analysis(ticker):
-    """ดึงข้อมูลเทคนิคอลครั้งเดียว คืน (string สำหรับ prompt, score -2..+2 สำหรับ confluence)"""
-    if not ticker or ticker == "GENERAL":
-        return "N/A", 0
-
-    data = _fetch_technical_data(ticker)
-    if not data:
-        return "Not enough data", 0
-
-    trend = "BULLISH (Above SMA50)" if data["price"] > data["sma50"] else "BEARISH (Below SMA50)"
-    rsi_status = "Overbought (>70)" if data["rsi"] > 70 else "Oversold (<30)" if data["rsi"] < 30 else "Neutral"
-    text = f"Price: ${data['price']:.2f} | SMA50: ${data['sma50']:.2f} ({trend}) | RSI(14): {data['rsi']:.1f} ({rsi_status})"
+    context_str = ""
+    for name, closes in snapshot["indices"].items():
+        if len(closes) >= 2:
+            prev_close, last_close = closes[-2], closes[-1]
+            change_pct = ((last_close - prev_close) / prev_close) * 100
 
-    score = 1 if data["price"] > data["sma50"] else -1
-    if data["rsi"] < 30:
-        score += 1
-    elif data["rsi"] > 70:
-        score -= 1
+            trend = "UP" if change_pct > 0 else "DOWN"
+            context_str += f"- {name}: {trend} ({change_pct:+.2f}%)\n"
 
-    return text, max(-2, min(2, score))
+    context_str += "\n" + get_macro_context(snapshot)
 
+    return context_str.strip()
 
 
-def send_line_push(message):
-    url = "https://api.line.me/v2/bot/message/push"
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {LINE_CHANNEL_ACCESS_TOKEN}"
-    }
-    payload = {"to": LINE_GROUP_ID, "messages": [{"type": "text", "text": message}]}
-    try:
-        requests.post(url, headers=headers, json=payload)
-    except:
-        pass
-    
-def analyze_content(source_type, topic, content_data, market_context=""):
-    print(f"🧠 กำลังวิเคราะห์ {source_type} ของ {topic} โดยใช้ [{AI_PROVIDER.upper()}]...")
+def collect_news_signals(ticker, market_snapshot=None):
+    """ดึงสัญญาณทุกแหล่งของ ticker พร้อมกันผ่าน SignalSnapshot (แต่ละ endpoint ยิงครั้งเดียว)
+    แหล่งที่ช้าเกิน deadline จะได้ค่า default ("N/A" / score 0) แทน คืน dict ชื่อ -> ค่า"""
+    snapshot = SignalSnapshot.collect(
+        ticker,
+        market_snapshot=market_snapshot,
+        default_timeout=SIGNAL_SOURCE_TIMEOUT,
+        total_timeout=SIGNAL_TOTAL_TIMEOUT,
+    )
+    if snapshot.late:
+        print(f"⚠️ {ticker}: แหล่งข้อมูลที่ไม่ทัน deadline -> {', '.join(snapshot.late)}")
+    return snapshot.signals()
 
-    confluence = None
-    if source_type == "NEWS":
-        # ticker คือ topic ตรงๆ จึงคำนวณ confluence score แบบ deterministic ได้ก่อนเรียก AI
-        technical_info, technical_score = get_technical_analysis(topic)
-        fundamental_info = get_fundamental_context(topic)
-        fundamental_score = get_fundamental_signal_score(topic)
-        macro_score = get_macro_signal_score()
-        news_score = get_news_sentiment_score(content_data)
-        social_score = get_stocktwits_sentiment_score(topic)
-        social_info = get_social_buzz_context(topic)
-        dilution_score = get_dilution_risk_score(topic)
-        dilution_info = get_dilution_context(topic)
-
-        confluence = compute_confluence(technical_score, fundamental_score, macro_score, news_score,
-                                         social_score, dilution_score)
-    else:
-        # TWEET: ยังไม่รู้ ticker ที่แท้จริงจนกว่า AI จะระบุ specific_stock กลับมา
-        # จึงคำนวณ confluence แบบ deterministic ก่อนเรียกไม่ได้ ปล่อยให้ AI ประเมินเอง
-        technical_info, fundamental_info, social_info, dilution_info = "N/A", "N/A", "N/A", "N/A"
 
+def _build_base_prompt(market_context):
+    """ส่วนหัวของ prompt ที่เหมือนกันทุก ticker: ภาพรวมตลาด + สถิติความแม่น + บทเรียนจากที่เคยทายผิด"""
     # 1. ดึงข้อมูลการเรียนรู้ (Feedback Loop)
     try:
         total, correct = get_accuracy_stats()
@@ -292,7 +277,7 @@ def analyze_content(source_type, topic, content_data, market_context=""):
             mistakes_text += f"   - Actual Market: {actual}\n\n"
 
     # 4. Base Prompt (ส่วนกลาง)
-    base_sys_prompt = f"""
+    return f"""
     Role: Professional Stock Trader & Analyst.
 
     [GLOBAL MARKET CONTEXT]
@@ -304,64 +289,44 @@ def analyze_content(source_type, topic, content_data, market_context=""):
     Here are your past MISTAKES: {mistakes_text}
     """
 
-    # 5. แยก Prompt ตามประเภท (สำคัญ!)
-    if source_type == "TWEET":
-        prompt = f"""
-        {base_sys_prompt}
-        
-        Task: Analyze tweets from influencer: {topic}
-        [TWEETS]
-        {json.dumps(content_data)}
 
-        Analyze hidden signals, sarcasm, and meme-culture.
-        1. Impact Score (1-10): Market moving potential?
-        2. Prediction: Will the affected asset go UP or DOWN in 24h?
-        3. Specific Stock: Identify the Ticker Symbol (e.g. TSLA, DOGE, BTC).
-        4. Sector: e.g. EV, AI, Crypto.
-        5. Target Price: realistic price level if the move plays out within the time horizon.
-        6. Stop Loss Price: level that invalidates this thesis.
-        7. Time Horizon (days): how many days this prediction is expected to play out (1-30).
-        8. Summary (Thai): Informal/Social tone.
+def _prepare_news_item(ticker, content_data, market_snapshot=None):
+    """เก็บสัญญาณของ ticker + คำนวณ confluence แล้วเรียงเป็นบล็อกข้อมูลใน prompt ของ ticker นั้น
+    คืน (block, confluence) — ใช้ได้ทั้ง prompt เดี่ยวและ prompt แบบ batch"""
+    # ticker คือ topic ตรงๆ จึงคำนวณ confluence score แบบ deterministic ได้ก่อนเรียก AI
+    signals = collect_news_signals(ticker, market_snapshot)
+    technical_info, technical_score = signals["technical"]
+    news_score = get_news_sentiment_score(content_data)
 
-        Response JSON Format ONLY:
-        {{
-            "impact_score": <int>,
-            "predicted_direction": "UP/DOWN/NEUTRAL",
-            "specific_stock": "<Ticker Symbol>",
-            "affected_sector": "<Sector>",
-            "target_price": <float or null>,
-            "stop_loss_price": <float or null>,
-            "time_horizon_days": <int>,
-            "summary_message": "<Thai Summary>",
-            "reason": "<Reason>"
-        }}
-        """
-    else:
-        # NEWS Prompt
-        prompt = f"""
-        {base_sys_prompt}
+    confluence = compute_confluence(technical_score, signals["fundamental_score"], signals["macro_score"],
+                                     news_score, signals["social_score"], signals["dilution_score"])
 
-        [TECHNICAL INDICATORS] (For {topic})
+    block = f"""
+        [TECHNICAL INDICATORS] (For {ticker})
         {technical_info}
         (RSI > 70 = Sell Risk, RSI < 30 = Buy Opportunity. Price > SMA50 = Uptrend.)
 
-        [FUNDAMENTALS] (For {topic})
-        {fundamental_info}
+        [FUNDAMENTALS] (For {ticker})
+        {signals["fundamental_info"]}
 
-        [SOCIAL BUZZ] (For {topic}, StockTwits)
-        {social_info}
+        [SOCIAL BUZZ] (For {ticker}, StockTwits)
+        {signals["social_info"]}
 
-        [DILUTION RISK] (For {topic}, SEC EDGAR filings)
-        {dilution_info}
+        [DILUTION RISK] (For {ticker}, SEC EDGAR filings)
+        {signals["dilution_info"]}
 
         [COMPUTED CONFLUENCE SIGNAL] (deterministic, calculated from the data above before you were asked)
         {chr(10).join(confluence['breakdown'])}
         Net Score: {confluence['total']:+d} | Bias: {confluence['direction']} | Agreement: {confluence['confluence_count']}/6 categories
 
-        Task: Analyze news for ticker: {topic}
+        Task: Analyze news for ticker: {ticker}
         [NEWS]
         {json.dumps(content_data)}
+    """
+    return block, confluence
+
 
+NEWS_INSTRUCTIONS = """
         Use the COMPUTED CONFLUENCE SIGNAL above as your primary evidence for direction — it is calculated, not guessed.
         Only override its direction if the [NEWS] content contains a strong, specific reason to disagree (explain why in "reason").
         1. Prediction: UP or DOWN in 24h? (default to the confluence bias unless overridden)
@@ -369,7 +334,141 @@ def analyze_content(source_type, topic, content_data, market_context=""):
         3. Stop Loss Price: level that invalidates this thesis.
         4. Time Horizon (days): how many days this prediction is expected to play out (1-30).
         5. Summary (Thai): Formal tone.
+"""
+
+
+def _call_llm(prompt):
+    """ส่ง prompt ไปยังค่ายที่ตั้งใน AI_PROVIDER (รอ quota ของ llm ก่อน)"""
+    acquire("llm")
+    if AI_PROVIDER == "openai":
+        return call_openai(prompt)
+    elif AI_PROVIDER == "gemini":
+        return call_gemini(prompt)
+    elif AI_PROVIDER == "claude":   # <--- เพิ่มตรงนี้
+        return call_claude(prompt)
+    else:
+        # Fallback: ถ้าตั้งชื่อผิด ให้ลอง Gemini ก่อน
+        return call_gemini(prompt)
+
+
+# นับจำนวน LLM call ที่ถูกข้ามด้วย pre-gate เทียบกับที่เรียกจริง (ไว้ดูใน log ว่าประหยัดไปเท่าไหร่)
+llm_gate_stats = {"skipped": 0, "called": 0}
+_gate_lock = threading.Lock()
+
+
+def _passes_pregate(ticker, confluence):
+    """True ถ้าควรเรียก LLM — strength ที่ <= IMPACT_THRESHOLD จะถูกทับเป็น impact_score แล้วตกเกณฑ์แน่นอน"""
+    passed = not LLM_PREGATE_ENABLED or confluence["strength"] > IMPACT_THRESHOLD
+    with _gate_lock:
+        llm_gate_stats["called" if passed else "skipped"] += 1
+    if not passed:
+        print(f"⏭️ [{ticker}] Confluence strength {confluence['strength']} <= {IMPACT_THRESHOLD} ข้าม LLM")
+    return passed
+
+
+def _gated_result(confluence):
+    """ผลวิเคราะห์แทนคำตอบ AI ของ ticker ที่ไม่ผ่าน pre-gate (ยังนับว่าวิเคราะห์แล้ว ให้ cursor เลื่อนต่อได้)"""
+    return _apply_confluence({"llm_skipped": True}, confluence)
+
+
+def get_llm_gate_stats():
+    with _gate_lock:
+        return dict(llm_gate_stats)
+
+
+def _apply_confluence(result, confluence):
+    if confluence is not None:
+        # ทับ impact_score ด้วยค่าที่คำนวณ deterministic เสมอ (ไม่พึ่ง AI เดาเอง)
+        result["impact_score"] = confluence["strength"]
+        result["confluence_count"] = confluence["confluence_count"]
+        result.setdefault("predicted_direction", confluence["direction"])
+    return result
+
+
+def _parse_batch_results(result, tickers):
+    """แยกคำตอบ batch เป็น dict ticker -> ผลวิเคราะห์ (รับได้ทั้ง array ตรงๆ และ {"results": [...]})
+    ticker ที่ไม่มีในคำตอบหรือรูปแบบผิดจะไม่อยู่ใน dict (ให้ caller ไปถามใหม่ทีละตัว)"""
+    if isinstance(result, dict):
+        result = result.get("results")
+    if not isinstance(result, list):
+        return {}
+
+    wanted = {t.upper(): t for t in tickers}
+    parsed = {}
+    for item in result:
+        if not isinstance(item, dict) or not isinstance(item.get("ticker"), str):
+            continue
+        ticker = wanted.get(item["ticker"].strip().upper())
+        if ticker and ticker not in parsed:
+            parsed[ticker] = {k: v for k, v in item.items() if k != "ticker"}
+    return parsed
+
+
+def analyze_news_batch(news_by_ticker, market_context="", market_snapshot=None):
+    """วิเคราะห์ข่าวของหลาย ticker ใน LLM call เดียว (ส่วนหัว prompt ที่ใหญ่และเหมือนกันส่งแค่ครั้งเดียว)
+
+    news_by_ticker: dict ticker -> list ข่าว
+    Returns: dict ticker -> ผลวิเคราะห์ (หรือ None ถ้าวิเคราะห์ไม่ได้) — confluence override ทำรายตัวเหมือนโหมดเดี่ยว
+    ticker ที่คำตอบ batch parse ไม่ได้จะถูกถามใหม่ทีละตัว"""
+    tickers = list(news_by_ticker)
+    if not tickers:
+        return {}
+    print(f"🧠 กำลังวิเคราะห์ NEWS แบบ batch {len(tickers)} ตัว ({', '.join(tickers)}) โดยใช้ [{AI_PROVIDER.upper()}]...")
+
+    # เก็บสัญญาณของทุก ticker พร้อมกัน (แต่ละตัวมี deadline ของ SignalSnapshot อยู่แล้ว)
+    with ThreadPoolExecutor(max_workers=len(tickers), thread_name_prefix="batch") as pool:
+        prepared = dict(zip(tickers, pool.map(
+            lambda t: _prepare_news_item(t, news_by_ticker[t], market_snapshot), tickers)))
+
+    results = {t: _gated_result(prepared[t][1]) for t in tickers if not _passes_pregate(t, prepared[t][1])}
+    tickers = [t for t in tickers if t not in results]
+    if not tickers:
+        return results
+
+    base_sys_prompt = _build_base_prompt(market_context)
+    blocks = "\n".join(f"        ===== TICKER: {t} =====\n{prepared[t][0]}" for t in tickers)
+    prompt = f"""
+        {base_sys_prompt}
+
+        Analyze each ticker below INDEPENDENTLY. Only use each ticker's own data and news for its answer.
+{blocks}
+        {NEWS_INSTRUCTIONS}
+        Return exactly one entry per ticker ({", ".join(tickers)}).
 
+        Response JSON Format ONLY:
+        {{
+            "results": [
+                {{
+                    "ticker": "<Ticker Symbol>",
+                    "predicted_direction": "UP/DOWN/NEUTRAL",
+                    "target_price": <float or null>,
+                    "stop_loss_price": <float or null>,
+                    "time_horizon_days": <int>,
+                    "summary_message": "<Thai Summary>",
+                    "reason": "<Reason>"
+                }}
+            ]
+        }}
+        """
+
+    parsed = _parse_batch_results(_call_llm(prompt), tickers)
+
+    for ticker in tickers:
+        block, confluence = prepared[ticker]
+        result = parsed.get(ticker)
+        if result is None:
+            # คำตอบ batch ไม่มี/อ่านไม่ออกสำหรับตัวนี้ -> ถามใหม่แบบเดี่ยว (ใช้สัญญาณที่เก็บไว้แล้ว ไม่ดึงซ้ำ)
+            print(f"⚠️ [{ticker}] batch response ใช้ไม่ได้ ถามใหม่ทีละตัว")
+            result = _analyze_single_news(base_sys_prompt, block)
+        results[ticker] = _apply_confluence(result, confluence) if result is not None else None
+    return results
+
+
+def _analyze_single_news(base_sys_prompt, block):
+    prompt = f"""
+        {base_sys_prompt}
+        {block}
+        {NEWS_INSTRUCTIONS}
         Response JSON Format ONLY:
         {{
             "predicted_direction": "UP/DOWN/NEUTRAL",
@@ -380,31 +479,69 @@ def analyze_content(source_type, topic, content_data, market_context=""):
             "reason": "<Reason>"
         }}
         """
-    result = None
+    result = _call_llm(prompt)
 
-    if AI_PROVIDER == "openai":
-        result = call_openai(prompt)
-    elif AI_PROVIDER == "gemini":
-        result = call_gemini(prompt)
-    elif AI_PROVIDER == "claude":   # <--- เพิ่มตรงนี้
-        result = call_claude(prompt)
-    else:
-        # Fallback: ถ้าตั้งชื่อผิด ให้ลอง Gemini ก่อน
-        result = call_gemini(prompt)
+    # ป้องกัน AI ส่ง List กลับมา
+    if isinstance(result, list):
+        result = result[0] if result else None
+    return result if isinstance(result, dict) else None
+
+
+def analyze_content(source_type, topic, content_data, market_context="", market_snapshot=None):
+    """วิเคราะห์ข่าว/ทวีตด้วย AI
+
+    โหมด batch (เฉพาะ NEWS): ส่ง topic เป็น list ของ ticker และ content_data เป็น dict ticker -> list ข่าว
+    จะวิเคราะห์ทุกตัวใน LLM call เดียวและคืน dict ticker -> ผลวิเคราะห์ (ดู analyze_news_batch)"""
+    if source_type == "NEWS" and isinstance(topic, (list, tuple)):
+        return analyze_news_batch({t: content_data[t] for t in topic}, market_context, market_snapshot)
+
+    print(f"🧠 กำลังวิเคราะห์ {source_type} ของ {topic} โดยใช้ [{AI_PROVIDER.upper()}]...")
+
+    if source_type == "NEWS":
+        block, confluence = _prepare_news_item(topic, content_data, market_snapshot)
+        if not _passes_pregate(topic, confluence):
+            return _gated_result(confluence)
+        result = _analyze_single_news(_build_base_prompt(market_context), block)
+        return _apply_confluence(result, confluence) if result is not None else None
+
+    # TWEET: ยังไม่รู้ ticker ที่แท้จริงจนกว่า AI จะระบุ specific_stock กลับมา
+    # จึงคำนวณ confluence แบบ deterministic ก่อนเรียกไม่ได้ ปล่อยให้ AI ประเมินเอง
+    prompt = f"""
+        {_build_base_prompt(market_context)}
+        
+        Task: Analyze tweets from influencer: {topic}
+        [TWEETS]
+        {json.dumps(content_data)}
+
+        Analyze hidden signals, sarcasm, and meme-culture.
+        1. Impact Score (1-10): Market moving potential?
+        2. Prediction: Will the affected asset go UP or DOWN in 24h?
+        3. Specific Stock: Identify the Ticker Symbol (e.g. TSLA, DOGE, BTC).
+        4. Sector: e.g. EV, AI, Crypto.
+        5. Target Price: realistic price level if the move plays out within the time horizon.
+        6. Stop Loss Price: level that invalidates this thesis.
+        7. Time Horizon (days): how many days this prediction is expected to play out (1-30).
+        8. Summary (Thai): Informal/Social tone.
+
+        Response JSON Format ONLY:
+        {{
+            "impact_score": <int>,
+            "predicted_direction": "UP/DOWN/NEUTRAL",
+            "specific_stock": "<Ticker Symbol>",
+            "affected_sector": "<Sector>",
+            "target_price": <float or null>,
+            "stop_loss_price": <float or null>,
+            "time_horizon_days": <int>,
+            "summary_message": "<Thai Summary>",
+            "reason": "<Reason>"
+        }}
+        """
+    result = _call_llm(prompt)
 
     # ป้องกัน AI ส่ง List กลับมา
     if isinstance(result, list):
         if len(result) > 0: result = result[0]
         else: return None
 
-    if result is None:
-        return None
-
-    if confluence is not None:
-        # ทับ impact_score ด้วยค่าที่คำนวณ deterministic เสมอ (ไม่พึ่ง AI เดาเอง)
-        result["impact_score"] = confluence["strength"]
-        result["confluence_count"] = confluence["confluence_count"]
-        result.setdefault("predicted_direction", confluence["direction"])
-
     return result
 
@@ -0,0 +1,113 @@
+"""SignalSnapshot: ข้อมูลดิบทุกแหล่งของ ticker หนึ่งตัว ดึง 'ครั้งเดียว' (พร้อมกัน) แล้วใช้ payload ชุดเดียวกัน
+สร้างทั้ง context string สำหรับ prompt และ score สำหรับ confluence
+
+เดิม Finnhub insider/recommendation, StockTwits stream และ SEC submissions ถูกยิงซ้ำ 2 รอบต่อ ticker
+(รอบหนึ่งทำ string อีกรอบทำ score) ทำให้ใกล้ชน rate limit ต่อนาทีของ Finnhub"""
+
+from concurrent_fetch import gather_with_deadlines
+from get_technicals import fetch_technical_data, format_technical_analysis
+from get_fundamentals import (FINNHUB_API_KEY, get_fundamental_payload_fetchers, build_fundamental_context,
+                              fundamental_score_from_data)
+from get_macro import get_macro_signal_score, get_market_snapshot
+from get_social_buzz import get_stocktwits_messages, stocktwits_score_from_messages, format_social_buzz
+from get_dilution_risk import get_recent_dilutive_filings, dilution_score_from_filings, format_dilution_context
+
+FINNHUB_PAYLOADS = ("finnhub_metric", "finnhub_profile", "finnhub_earnings", "finnhub_insider",
+                    "finnhub_recommendation")
+
+
+class SignalSnapshot:
+    def __init__(self, ticker, payloads, late=(), market_snapshot=None):
+        self.ticker = ticker
+        self.payloads = payloads
+        self.late = list(late)
+        self.market_snapshot = market_snapshot
+
+    @classmethod
+    def collect(cls, ticker, market_snapshot=None, timeouts=None, default_timeout=10.0, total_timeout=20.0):
+        """ยิงทุก payload ของ ticker พร้อมกัน (แต่ละ endpoint ครั้งเดียว) payload ที่ไม่ทัน deadline = None
+        market_snapshot คือภาพรวมตลาดของรอบนี้ (ใช้ร่วมกันทุก ticker ไม่ดึง VIX ซ้ำรายตัว)"""
+        fetchers = {
+            "technical": lambda: fetch_technical_data(ticker),
+            "stocktwits": lambda: get_stocktwits_messages(ticker),
+            "sec_filings": lambda: get_recent_dilutive_filings(ticker),
+        }
+        if FINNHUB_API_KEY:
+            fetchers.update(get_fundamental_payload_fetchers(ticker))
+
+        payloads, late = gather_with_deadlines(
+            fetchers, {},
+            timeouts=timeouts,
+            default_timeout=default_timeout,
+            total_timeout=total_timeout,
+        )
+        return cls(ticker, payloads, late, market_snapshot or get_market_snapshot())
+
+    def _is_late(self, *names):
+        return any(name in self.late for name in names)
+
+    def _missing(self, *names):
+        """ทุก payload ในชื่อที่ให้มาไม่ทัน deadline หรือดึงไม่ได้ (None)"""
+        return all(name in self.late or self.payloads.get(name) is None for name in names)
+
+    def technical(self):
+        if self._is_late("technical"):
+            return "N/A", 0
+        return format_technical_analysis(self.payloads.get("technical"))
+
+    def fundamental_info(self):
+        if not FINNHUB_API_KEY:
+            return "Fundamentals unavailable (FINNHUB_API_KEY not set)."
+        if self._missing(*FINNHUB_PAYLOADS):
+            return "N/A"
+        p = self.payloads
+        return build_fundamental_context(p.get("finnhub_metric"), p.get("finnhub_profile"),
+                                         p.get("finnhub_earnings"), p.get("finnhub_insider"),
+                                         p.get("finnhub_recommendation"))
+
+    def fundamental_score(self):
+        if not FINNHUB_API_KEY or self._missing("finnhub_insider", "finnhub_recommendation"):
+            return 0
+        return fundamental_score_from_data(self.payloads.get("finnhub_insider"),
+                                           self.payloads.get("finnhub_recommendation"))
+
+    def macro_score(self):
+        return get_macro_signal_score(self.market_snapshot)
+
+    def social_info(self):
+        if self._is_late("stocktwits"):
+            return "N/A"
+        return format_social_buzz(self.payloads.get("stocktwits"))
+
+    def social_score(self):
+        return stocktwits_score_from_messages(self.payloads.get("stocktwits"))
+
+    def dilution_info(self):
+        if self._is_late("sec_filings"):
+            return "N/A"
+        return format_dilution_context(self.payloads.get("sec_filings"))
+
+    def dilution_score(self):
+        return dilution_score_from_filings(self.payloads.get("sec_filings"))
+
+    def signals(self):
+        """คืน dict ชื่อสัญญาณ -> ค่า (หน้าตาเดียวกับที่ analyze_content ใช้)
+        แหล่งที่แปลง payload ไม่ได้ (เช่น API ตอบ error แทนข้อมูล) ได้ "N/A" / 0 แทน ไม่ล้มทั้ง ticker"""
+        derivations = {
+            "technical": (self.technical, ("N/A", 0)),
+            "fundamental_info": (self.fundamental_info, "N/A"),
+            "fundamental_score": (self.fundamental_score, 0),
+            "macro_score": (self.macro_score, 0),
+            "social_score": (self.social_score, 0),
+            "social_info": (self.social_info, "N/A"),
+            "dilution_score": (self.dilution_score, 0),
+            "dilution_info": (self.dilution_info, "N/A"),
+        }
+        result = {}
+        for name, (derive, fallback) in derivations.items():
+            try:
+                result[name] = derive()
+            except Exception as e:
+                print(f"⚠️ {self.ticker}: แปลงสัญญาณ {name} ไม่ได้ ({type(e).__name__}: {e}) ใช้ {fallback!r}")
+                result[name] = fallback
+        return result
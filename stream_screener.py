@@ -0,0 +1,276 @@
+"""Screener แบบ event-driven: รับแท่งราคาเป็น stream แล้วอัปเดต state ของแต่ละ ticker ทีละแท่ง
+ส่ง candidate ออกทันทีที่ข้าม MIN_PCT_CHANGE (ช่วงตลาดปกติ) หรือ MIN_GAP_PCT (pre/after-market)
+ใช้สำหรับ replay/benchmark (วัด latency ที่ลดได้เทียบรอบ poll 5 นาทีของ scheduler) เท่านั้น — candidate แค่ print
+ออกมา ไม่เขียน target_ticker.txt และไม่ส่งเข้า run_news_bot (เส้นทางจริงยังเป็น screener.update_target_tickers)
+
+state ต่อ ticker: ราคาปิดจริงของ session ก่อน, ราคาล่าสุด, volume สะสมตามเวลาในวัน
+(ของวันนี้ + lookback วันก่อน ไว้คิด pace-normalized volume ratio แบบเดียวกับ screener)
+
+แหล่งข้อมูล:
+  ReplayFeed   — อ่านแท่งที่บันทึกไว้ (CSV จาก record_bars) ส่งออกตามเวลาจริงคูณ speed (0 = เร็วสุด)
+  PollingFeed  — poll แท่ง 1 นาทีล่าสุดจาก yfinance ส่งเฉพาะแท่งใหม่
+
+รัน:
+  python stream_screener.py --replay bars.csv --speed 0        # วัด latency/throughput แบบ offline
+  python stream_screener.py --live                             # ใช้ universe จริง (print candidate อย่างเดียว)
+  python stream_screener.py --record bars.csv --period 2d      # บันทึกแท่งจาก bar_store ไว้ replay"""
+
+import csv
+import time
+import argparse
+from collections import namedtuple, deque
+
+import numpy as np
+import pandas as pd
+
+from bar_store import (MARKET_TZ, BASE_INTERVAL, REGULAR_OPEN, REGULAR_CLOSE, read_bars, load_bars, download,
+                       ticker_frame)
+from scan_tables import MIN_PCT_CHANGE, MIN_GAP_PCT
+from screener import load_universe
+
+LOOKBACK_DAYS = 5
+
+Bar = namedtuple("Bar", ["ticker", "ts", "open", "high", "low", "close", "volume"])
+
+
+def _minute_of_day(ts):
+    return ts.hour * 60 + ts.minute
+
+
+def _is_regular(ts):
+    return REGULAR_OPEN <= ts.time() < REGULAR_CLOSE
+
+
+class TickerState:
+    """state ที่สะสมแบบ incremental ของ ticker เดียว (ไม่เก็บแท่งย้อนหลังทั้งหมด)"""
+
+    def __init__(self, lookback_days=LOOKBACK_DAYS):
+        self.session = None            # วันที่ (New York) ของ session ปัจจุบัน
+        self.prev_close = None         # ราคาปิดตลาดปกติของ session ก่อนหน้า
+        self.last_regular_close = None
+        self.last_price = None
+        self.minutes = []              # นาทีของวันของแท่งวันนี้ (เรียงเวลา)
+        self.cum_volume = []           # volume สะสมถึงแท่งนั้น
+        self.history = deque(maxlen=lookback_days)  # (minutes array, cum array) ของ session ก่อนๆ
+        self.alerted = set()           # kind ที่แจ้งไปแล้วใน session นี้ (ไม่แจ้งซ้ำทุกแท่ง)
+
+    def _roll_session(self, session):
+        if self.session is not None:
+            if self.minutes:
+                self.history.append((np.array(self.minutes), np.array(self.cum_volume)))
+            if self.last_regular_close is not None:
+                self.prev_close = self.last_regular_close
+        self.session = session
+        self.minutes, self.cum_volume = [], []
+        self.alerted = set()
+
+    def update(self, bar):
+        session = bar.ts.date()
+        if session != self.session:
+            self._roll_session(session)
+
+        if _is_regular(bar.ts):
+            self.last_regular_close = bar.close
+            total = (self.cum_volume[-1] if self.cum_volume else 0.0) + bar.volume
+            self.minutes.append(_minute_of_day(bar.ts))
+            self.cum_volume.append(total)
+        self.last_price = bar.close
+
+    def volume_ratio(self):
+        """volume วันนี้ถึงตอนนี้ / ค่าเฉลี่ย volume ถึงเวลาเดียวกันของ lookback session ก่อน (เหมือน screener)"""
+        if not self.minutes or not self.history:
+            return 0
+        cutoff = self.minutes[-1]
+        past = []
+        for minutes, cum in self.history:
+            i = np.searchsorted(minutes, cutoff, side="right")
+            if i and cum[i - 1] > 0:
+                past.append(cum[i - 1])
+        avg = sum(past) / len(past) if past else 0
+        return self.cum_volume[-1] / avg if avg else 0
+
+
+class StreamScreener:
+    """ป้อนแท่งทีละแท่งผ่าน process() คืน candidate (dict) เมื่อข้ามเกณฑ์ครั้งแรกของ session ไม่งั้นคืน None"""
+
+    def __init__(self, on_candidate=None, min_pct_change=MIN_PCT_CHANGE, min_gap_pct=MIN_GAP_PCT,
+                 lookback_days=LOOKBACK_DAYS):
+        self.on_candidate = on_candidate
+        self.min_pct_change = min_pct_change
+        self.min_gap_pct = min_gap_pct
+        self.lookback_days = lookback_days
+        self.states = {}
+
+    def state(self, ticker):
+        if ticker not in self.states:
+            self.states[ticker] = TickerState(self.lookback_days)
+        return self.states[ticker]
+
+    def seed_from_store(self, tickers, period="6d"):
+        """อุ่น state จากแท่ง 5 นาทีรวม pre/after-market ใน bar_store (ชุดเดียวกับที่ screener ใช้)
+        ได้ราคาปิดก่อนหน้า + volume profile ของวันก่อนๆ โดยไม่ส่ง candidate ออก
+        เพื่อให้แท่งแรกของ stream คำนวณ %change/volume ratio ได้ทันที"""
+        for ticker in tickers:
+            df = read_bars(ticker, BASE_INTERVAL, prepost=True, period=period).dropna()
+            state = self.state(ticker)
+            for ts, row in df.iterrows():
+                state.update(Bar(ticker, ts, row["Open"], row["High"], row["Low"], row["Close"], row["Volume"]))
+
+    def process(self, bar):
+        state = self.state(bar.ticker)
+        state.update(bar)
+        if not state.prev_close:
+            return None
+
+        pct = (bar.close - state.prev_close) / state.prev_close * 100
+        if _is_regular(bar.ts):
+            kind, threshold = "move", self.min_pct_change
+        else:
+            kind, threshold = "gap", self.min_gap_pct
+        if kind in state.alerted or abs(pct) < threshold:
+            return None
+
+        state.alerted.add(kind)
+        candidate = {
+            "ticker": bar.ticker,
+            "kind": kind,
+            "pct_change": round(pct, 2),
+            "volume_ratio": round(state.volume_ratio(), 2),
+            "price": bar.close,
+            "prev_close": state.prev_close,
+            "bar_time": bar.ts.isoformat(),
+        }
+        if self.on_candidate:
+            self.on_candidate(candidate)
+        return candidate
+
+
+class ReplayFeed:
+    """ส่งแท่งที่บันทึกไว้ในไฟล์ CSV (ts,ticker,open,high,low,close,volume เรียงตามเวลา) ออกเป็น stream
+    speed = เร่งเวลากี่เท่าของเวลาจริงระหว่างแท่ง (60 = 1 นาทีตลาดเล่นใน 1 วินาที) 0 = ไม่รอเลย"""
+
+    def __init__(self, path, speed=0):
+        self.path = path
+        self.speed = speed
+
+    def __iter__(self):
+        prev_ts = None
+        with open(self.path, newline="") as f:
+            for row in csv.DictReader(f):
+                ts = pd.Timestamp(row["ts"]).tz_convert(MARKET_TZ)
+                if self.speed and prev_ts is not None and ts > prev_ts:
+                    time.sleep((ts - prev_ts).total_seconds() / self.speed)
+                prev_ts = ts
+                yield Bar(row["ticker"], ts, float(row["open"]), float(row["high"]), float(row["low"]),
+                          float(row["close"]), float(row["volume"]))
+
+
+class PollingFeed:
+    """poll แท่ง 1 นาทีของวันนี้ (รวม pre/after-market) จาก yfinance ทุก poll_seconds ส่งเฉพาะแท่งที่ใหม่กว่าที่ส่งไปแล้ว"""
+
+    def __init__(self, tickers, poll_seconds=30):
+        self.tickers = list(tickers)
+        self.poll_seconds = poll_seconds
+        self.last_ts = {}
+
+    def __iter__(self):
+        while True:
+            started = time.monotonic()
+            data = download(self.tickers, "1m", True, period="1d")
+            bars = []
+            for ticker in self.tickers:
+                df = ticker_frame(data, ticker)
+                if df is None:
+                    continue
+                df = df.dropna()
+                # แท่งสุดท้ายยังไม่ปิด — ส่งเฉพาะแท่งที่ปิดแล้ว
+                df = df.iloc[:-1]
+                last = self.last_ts.get(ticker)
+                if last is not None:
+                    df = df[df.index > last]
+                if not df.empty:
+                    self.last_ts[ticker] = df.index[-1]
+                bars += [Bar(ticker, ts.tz_convert(MARKET_TZ), r["Open"], r["High"], r["Low"], r["Close"], r["Volume"])
+                         for ts, r in df.iterrows()]
+            for bar in sorted(bars, key=lambda b: b.ts):
+                yield bar
+            time.sleep(max(0.0, self.poll_seconds - (time.monotonic() - started)))
+
+
+def record_bars(tickers, path, period="2d", prepost=True):
+    """บันทึกแท่ง 5 นาทีจาก bar_store ของ tickers เป็นไฟล์ CSV เรียงตามเวลา (ไว้ใช้กับ ReplayFeed)"""
+    frames = load_bars(tickers, BASE_INTERVAL, period=period, prepost=prepost)
+    rows = []
+    for ticker, df in frames.items():
+        for ts, r in df.dropna().iterrows():
+            rows.append((ts.isoformat(), ticker, r["Open"], r["High"], r["Low"], r["Close"], r["Volume"]))
+    rows.sort()
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["ts", "ticker", "open", "high", "low", "close", "volume"])
+        writer.writerows(rows)
+    print(f"💾 บันทึก {len(rows)} แท่ง ({len(frames)} ตัว) ลง {path}")
+    return len(rows)
+
+
+def run_stream(feed, screener, max_bars=None):
+    """ป้อนทุกแท่งจาก feed เข้า screener คืนสถิติ: จำนวนแท่ง, throughput, latency ตอนตรวจจับ
+    (latency = เวลาจากที่ feed ส่งแท่งออกมาจนได้ candidate — วัดเฉพาะงานของ screener เอง)"""
+    processed, candidates, latencies = 0, [], []
+    start = time.perf_counter()
+    for bar in feed:
+        received = time.perf_counter()
+        candidate = screener.process(bar)
+        if candidate:
+            latencies.append(time.perf_counter() - received)
+            candidates.append(candidate)
+        processed += 1
+        if max_bars and processed >= max_bars:
+            break
+    elapsed = time.perf_counter() - start
+
+    return {
+        "bars": processed,
+        "candidates": len(candidates),
+        "seconds": round(elapsed, 3),
+        "bars_per_second": round(processed / elapsed, 1) if elapsed else None,
+        "detect_latency_ms_avg": round(1000 * sum(latencies) / len(latencies), 3) if latencies else None,
+        "detect_latency_ms_max": round(1000 * max(latencies), 3) if latencies else None,
+    }
+
+
+def _print_candidate(c):
+    label = "🚀 Mover" if c["kind"] == "move" else "🌅 Gap"
+    print(f"{label} {c['ticker']}: {c['pct_change']:+.2f}% | Volume x{c['volume_ratio']:.1f} | ${c['price']:.2f} @ {c['bar_time']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming screener")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--replay", help="ไฟล์ CSV ที่บันทึกไว้")
+    source.add_argument("--live", action="store_true", help="poll แท่ง 1 นาทีจาก yfinance")
+    source.add_argument("--record", help="บันทึกแท่งจาก bar_store ลงไฟล์ CSV แล้วจบ")
+    parser.add_argument("--speed", type=float, default=0, help="replay เร็วกี่เท่าของเวลาจริง (0 = เร็วสุด)")
+    parser.add_argument("--period", default="2d", help="ช่วงแท่งที่บันทึกตอน --record")
+    parser.add_argument("--poll-seconds", type=int, default=30)
+    args = parser.parse_args()
+
+    if args.record:
+        record_bars(load_universe(), args.record, period=args.period)
+        return
+
+    screener = StreamScreener(on_candidate=_print_candidate)
+    if args.replay:
+        stats = run_stream(ReplayFeed(args.replay, speed=args.speed), screener)
+        print(f"📊 {stats}")
+    else:
+        tickers = load_universe()
+        screener.seed_from_store(tickers)
+        try:
+            run_stream(PollingFeed(tickers, args.poll_seconds), screener)
+        except KeyboardInterrupt:
+            print("🛑 Stream stopped.")
+
+
+if __name__ == "__main__":
+    main()
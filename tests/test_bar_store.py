@@ -0,0 +1,138 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import tempfile
+
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+import bar_store
+
+
+def make_daily(tickers, dates, close_offset=0.0):
+    """สร้างผล yf.download(group_by="ticker") ปลอมแบบ MultiIndex columns"""
+    index = pd.DatetimeIndex(pd.to_datetime(dates))
+    frames = {}
+    for i, t in enumerate(tickers):
+        base = 10.0 * (i + 1) + close_offset
+        frames[t] = pd.DataFrame({
+            "Open": base, "High": base + 1, "Low": base - 1,
+            "Close": [base + k for k in range(len(index))], "Volume": 1000.0,
+        }, index=index)
+    return pd.concat(frames, axis=1)
+
+
+class TestBarStore(unittest.TestCase):
+    """ทดสอบ bar_store.py (คลังแท่งราคาแบบ incremental)"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.patchers = [patch('bar_store.BAR_STORE_DIR', self.tmpdir.name), patch('bar_store._synced', {})]
+        for p in self.patchers:
+            p.start()
+
+    def tearDown(self):
+        for p in reversed(self.patchers):
+            p.stop()
+        self.tmpdir.cleanup()
+
+    @patch('bar_store.yf.download')
+    def test_incremental_merge_replaces_open_bar(self, mock_download):
+        today = pd.Timestamp.now().normalize()
+        days = [today - pd.Timedelta(days=n) for n in (3, 2, 1)]
+
+        mock_download.return_value = make_daily(["AAA", "BBB"], days)
+        frames = bar_store.load_bars(["AAA", "BBB"], "1d", period="1mo")
+        self.assertEqual(len(frames["AAA"]), 3)
+        self.assertIn("period", mock_download.call_args.kwargs)
+
+        # รอบถัดไป: ได้แท่งของเมื่อวาน (ค่าอัปเดต) + วันนี้ -> ต้องขอแบบ start= และแทนแท่งเดิม
+        mock_download.return_value = make_daily(["AAA", "BBB"], [days[-1], today], close_offset=0.5)
+        frames = bar_store.load_bars(["AAA", "BBB"], "1d", period="1mo")
+
+        self.assertIn("start", mock_download.call_args.kwargs)
+        self.assertNotIn("period", mock_download.call_args.kwargs)
+        aaa = frames["AAA"]
+        self.assertEqual(len(aaa), 4)
+        self.assertTrue(aaa.index.is_monotonic_increasing)
+        self.assertEqual(aaa["Close"].iloc[-2], 10.5)
+        self.assertEqual(aaa["Close"].iloc[-1], 11.5)
+        print("✅ [BarStore] ดึงเพิ่มเฉพาะแท่งใหม่ + merge: ผ่าน")
+
+    @patch('bar_store.yf.download')
+    def test_intraday_period_counts_sessions(self, mock_download):
+        sessions = pd.bdate_range(end=pd.Timestamp.now().normalize(), periods=4)
+        times = [d + pd.Timedelta(hours=h) for d in sessions for h in (10, 11)]
+        index = pd.DatetimeIndex(times).tz_localize(bar_store.MARKET_TZ)
+        mock_download.return_value = pd.concat({"AAA": pd.DataFrame({
+            "Open": 1.0, "High": 1.0, "Low": 1.0, "Close": 1.0, "Volume": 5.0}, index=index)}, axis=1)
+
+        frames = bar_store.load_bars(["AAA"], "5m", period="2d")
+
+        df = frames["AAA"]
+        self.assertEqual(len(df), 4)
+        self.assertEqual(str(df.index.tz), bar_store.MARKET_TZ)
+        self.assertEqual(df.index[0].hour, 10)
+        print("✅ [BarStore] intraday period นับเป็น session + คืนเวลา New York: ผ่าน")
+
+
+    @patch('bar_store.yf.download')
+    def test_timeframes_resampled_from_one_base_series(self, mock_download):
+        sessions = pd.bdate_range(end=pd.Timestamp.now().normalize(), periods=4)
+        rows = []
+        for i, d in enumerate(sessions[:-1]):
+            # pre-market 08:00, ช่วงปกติ 09:30-15:55 ทุก 5 นาที, after-hours 17:00
+            rows.append((d + pd.Timedelta(hours=8), 99.0))
+            rows += [(t, 10.0 * (i + 1) + k / 100) for k, t in
+                     enumerate(pd.date_range(d + pd.Timedelta("09:30:00"), periods=78, freq="5min"))]
+            rows.append((d + pd.Timedelta(hours=17), 77.0))
+        rows.append((sessions[-1] + pd.Timedelta(hours=8), 50.0))  # วันนี้มีแค่ pre-market
+        index = pd.DatetimeIndex([t for t, _ in rows]).tz_localize(bar_store.MARKET_TZ)
+        base = pd.concat({"AAA": pd.DataFrame({"Open": 1.0, "High": 1.0, "Low": 1.0, "Volume": 5.0,
+                                               "Close": [c for _, c in rows]}, index=index)}, axis=1)
+        long_days = pd.bdate_range(end=sessions[1], periods=30)
+        daily = make_daily(["AAA"], long_days, close_offset=-9.0)
+
+        mock_download.side_effect = lambda **kw: base if kw["interval"] == "5m" else daily
+        frames = bar_store.load_timeframes(["AAA"], daily_period="1y", intraday_period="2d", extended_period="1d")
+
+        self.assertEqual([c.kwargs["interval"] for c in mock_download.call_args_list], ["5m", "1d"])
+        self.assertTrue(mock_download.call_args_list[0].kwargs["prepost"])
+        d = frames["daily"]["AAA"]
+        # ก่อน session ที่สองของแท่ง 5 นาทีใช้ daily ย้อนยาว, ตั้งแต่นั้น resample (ปิด = แท่ง 15:55)
+        self.assertEqual(len(d), 30 - 1 + 3)
+        self.assertEqual(d.loc[sessions[0], "Close"], 1.0 + 28)  # มาจาก daily ย้อนยาว
+        self.assertAlmostEqual(d.loc[sessions[2], "Close"], 30.77)
+        self.assertEqual(d.loc[sessions[2], "Volume"], 78 * 5.0)
+        self.assertEqual(d["Close"].iloc[-1], 50.0)  # วันนี้ยังไม่เปิด -> แท่งจาก pre-market
+        intraday = frames["intraday"]["AAA"]
+        self.assertEqual(len(intraday), 2 * 78)
+        self.assertEqual(len(frames["extended"]["AAA"]), 1)
+
+        # รอบถัดไปภายใน BAR_FRESH_SECONDS และ daily ยังครอบคลุม -> ไม่ดึงอะไรเลย
+        bar_store.load_timeframes(["AAA"])
+        self.assertEqual(mock_download.call_count, 2)
+        print("✅ [BarStore] หลาย timeframe จากข้อมูลฐานชุดเดียว: ผ่าน")
+
+    @patch('bar_store.yf.download')
+    def test_other_modules_download_under_lock(self, mock_download):
+        import get_macro
+
+        def fake(**kw):
+            self.assertTrue(bar_store._download_lock.locked())
+            return make_daily(kw["tickers"].split(), ["2024-03-11", "2024-03-12"])
+        mock_download.side_effect = fake
+
+        closes = get_macro._download_index_closes()
+        mock_download.assert_called_once()
+        self.assertEqual(mock_download.call_args.kwargs["group_by"], "ticker")
+        self.assertEqual(closes["^VIX"], [30.0, 31.0])
+        print("✅ [BarStore] yf.download จากโมดูลอื่นผ่าน _download_lock: ผ่าน")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=0)
@@ -0,0 +1,49 @@
+import unittest
+import sys
+import os
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from concurrent_fetch import gather_with_deadlines
+
+
+class TestGatherWithDeadlines(unittest.TestCase):
+    """ทดสอบ concurrent_fetch.py (ยิงหลายแหล่งพร้อมกัน + deadline)"""
+
+    def test_runs_concurrently_and_late_source_gets_default(self):
+        tasks = {
+            "fast": lambda: 1,
+            "slow": lambda: time.sleep(0.5) or 2,
+            "medium": lambda: time.sleep(0.1) or 3,
+        }
+        defaults = {"fast": 0, "slow": 0, "medium": 0}
+
+        start = time.monotonic()
+        results, late = gather_with_deadlines(tasks, defaults, timeouts={"slow": 0.2},
+                                              default_timeout=1.0, total_timeout=1.0)
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(results, {"fast": 1, "slow": 0, "medium": 3})
+        self.assertEqual(late, ["slow"])
+        self.assertLess(elapsed, 0.45)
+        print("✅ [ConcurrentFetch] แหล่งที่ช้าเกิน deadline ได้ค่า default: ผ่าน")
+
+    def test_error_and_total_deadline(self):
+        def boom():
+            raise RuntimeError("boom")
+
+        tasks = {"err": boom, "slow": lambda: time.sleep(0.5) or "late"}
+        defaults = {"err": "N/A", "slow": "N/A"}
+
+        results, late = gather_with_deadlines(tasks, defaults, default_timeout=5.0, total_timeout=0.1)
+
+        self.assertEqual(results, {"err": "N/A", "slow": "N/A"})
+        self.assertEqual(sorted(late), ["err", "slow"])
+        print("✅ [ConcurrentFetch] error + deadline รวม: ผ่าน")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=0)
@@ -0,0 +1,59 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import tempfile
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+import float_table
+
+
+class TestFloatTable(unittest.TestCase):
+    """ทดสอบ float_table.py (ตาราง float ใน memory + รีเฟรช bulk)"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.patches = [
+            patch('float_table.FLOAT_TABLE_PATH', os.path.join(self.tmpdir.name, "float.json")),
+            patch('float_table.FINNHUB_API_KEY', "fake"),
+            patch('float_table.get_float_rows', return_value=None),  # จำลอง DB ต่อไม่ได้ -> ใช้ไฟล์ local
+            patch('float_table.save_float_rows'),
+            patch('float_table._table', None),
+            patch('float_table._missing', set()),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+        self.tmpdir.cleanup()
+
+    @patch('float_table.get_float_data')
+    def test_lookup_is_offline_and_refresh_fills_missing(self, mock_float_data):
+        # ยังไม่มีในตาราง -> 1.0 ทันทีโดยไม่ยิง Finnhub แล้วถูกจดไว้ให้รอบรีเฟรช
+        self.assertEqual(float_table.get_float_multiplier("abcd"), 1.0)
+        mock_float_data.assert_not_called()
+
+        mock_float_data.side_effect = lambda t, use_cache=True: {"float_m": 12.0 if t == "ABCD" else 400.0,
+                                                 "shares_outstanding_m": 50.0}
+        updated = float_table.refresh_float_table(["TSLA"])
+
+        self.assertEqual(updated, 2)
+        self.assertEqual(sorted(c.args[0] for c in mock_float_data.call_args_list), ["ABCD", "TSLA"])
+        self.assertTrue(all(c.kwargs["use_cache"] is False for c in mock_float_data.call_args_list))
+        self.assertEqual(float_table.get_float_multiplier("ABCD"), 1.5)
+        self.assertEqual(float_table.get_float_multiplier("TSLA"), 0.8)
+        self.assertFalse(float_table.is_stale())
+
+        # process ใหม่ (ตารางใน memory ว่าง) ต้องโหลดกลับจากไฟล์ local ได้
+        with patch('float_table._table', None):
+            self.assertEqual(float_table.get_float_multiplier("ABCD"), 1.5)
+        print("✅ [FloatTable] lookup ไม่ยิง network + รีเฟรช bulk: ผ่าน")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=0)
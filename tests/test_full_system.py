@@ -19,17 +19,13 @@ import verify_bot
 class TestServices(unittest.TestCase):
     """ทดสอบ services.py (สมองกลาง)"""
 
-    # เปลี่ยนจาก patch requests เป็น patch yfinance
-    @patch('services.yf.Ticker') 
-    def test_get_current_price(self, MockTicker):
-        """ทดสอบดึงราคาหุ้น (Mock yfinance)"""
-        
-        # 1. สร้างตัวแทน (Mock Instance)
-        mock_instance = MockTicker.return_value
-        
-        # 2. กำหนดค่าที่ต้องการให้มันตอบกลับมา (150.50)
-        # จำลอง structure: Ticker("TSLA").fast_info.last_price
-        mock_instance.fast_info.last_price = 150.50
+    # ราคามาจาก quote_service (batch + cache) แทน yf.Ticker ทีละตัว
+    @patch('services.get_quote')
+    def test_get_current_price(self, mock_get_quote):
+        """ทดสอบดึงราคาหุ้น (Mock quote_service)"""
+
+        # กำหนดค่าที่ต้องการให้มันตอบกลับมา (150.50)
+        mock_get_quote.return_value = 150.50
 
         # 3. เรียกใช้งานฟังก์ชันจริง
         price = services.get_current_price("TSLA")
@@ -74,6 +70,13 @@ class TestServices(unittest.TestCase):
         print("✅ [Services] analyze_content (with Feedback Loop): ผ่าน")
 
     def setUp(self):
+        # client/สุขภาพโมเดลถูก cache ไว้ระดับ module ต้องล้างก่อนทุกเทส ไม่ให้ mock ของเทสก่อนหน้าค้าง
+        services.reset_llm_clients()
+        # เทสเหล่านี้ตรวจการเรียก AI ปิด pre-gate ไว้ (ไม่งั้น confluence ต่ำจะข้าม LLM) เทส pre-gate เปิดเอง
+        gate_patcher = patch('services.LLM_PREGATE_ENABLED', False)
+        gate_patcher.start()
+        self.addCleanup(gate_patcher.stop)
+
         # เตรียมคำตอบจำลองจาก AI (Mock Response)
         self.mock_json_response = {
             "impact_score": 8,
@@ -217,6 +220,68 @@ class TestServices(unittest.TestCase):
         self.assertEqual(result['impact_score'], 8)
         print("✅ [Internal] call_claude ทำงานถูกต้อง (JSON Parsing)")
 
+    # ==================================================
+    # 🧪 TEST: โหมด batch (หลาย ticker ใน LLM call เดียว)
+    # ==================================================
+    @patch('services._build_base_prompt', return_value="BASE")
+    @patch('services._prepare_news_item')
+    @patch('services._call_llm')
+    def test_analyze_news_batch(self, mock_llm, mock_prepare, mock_base):
+        """ทดสอบว่า batch เรียก AI ครั้งเดียว และทับ confluence รายตัว"""
+        mock_prepare.side_effect = lambda t, news, snap: (f"BLOCK {t}", {
+            "strength": 7 if t == "TSLA" else 3, "confluence_count": 4, "direction": "UP"})
+        mock_llm.return_value = {"results": [
+            {"ticker": "TSLA", "predicted_direction": "UP", "summary_message": "a", "reason": "r"},
+            {"ticker": "nvda", "predicted_direction": "DOWN", "summary_message": "b", "reason": "r"},
+        ]}
+
+        result = services.analyze_content("NEWS", ["TSLA", "NVDA"], {"TSLA": [{"title": "x"}], "NVDA": [{"title": "y"}]})
+
+        self.assertEqual(mock_llm.call_count, 1)
+        self.assertEqual(result["TSLA"]["impact_score"], 7)
+        self.assertEqual(result["NVDA"]["impact_score"], 3)
+        self.assertEqual(result["NVDA"]["predicted_direction"], "DOWN")
+        self.assertNotIn("ticker", result["TSLA"])
+        print("✅ [Services] analyze_content batch mode: ผ่าน")
+
+    @patch('services._build_base_prompt', return_value="BASE")
+    @patch('services._prepare_news_item')
+    @patch('services._call_llm')
+    def test_analyze_news_batch_fallback(self, mock_llm, mock_prepare, mock_base):
+        """ทดสอบว่าคำตอบ batch ที่ parse ไม่ได้ จะถามใหม่ทีละ ticker"""
+        mock_prepare.side_effect = lambda t, news, snap: (f"BLOCK {t}", {
+            "strength": 6, "confluence_count": 3, "direction": "DOWN"})
+        mock_llm.side_effect = [
+            {"results": [{"ticker": "TSLA", "predicted_direction": "UP"}]},  # NVDA หายไป
+            {"predicted_direction": "DOWN", "summary_message": "fallback"},
+        ]
+
+        result = services.analyze_content("NEWS", ["TSLA", "NVDA"], {"TSLA": [], "NVDA": []})
+
+        self.assertEqual(mock_llm.call_count, 2)
+        self.assertIn("BLOCK NVDA", mock_llm.call_args[0][0])
+        self.assertEqual(result["NVDA"]["summary_message"], "fallback")
+        self.assertEqual(result["NVDA"]["impact_score"], 6)
+        print("✅ [Services] analyze_content batch fallback: ผ่าน")
+
+    @patch('services.LLM_PREGATE_ENABLED', True)
+    @patch('services._build_base_prompt', return_value="BASE")
+    @patch('services._prepare_news_item')
+    @patch('services._call_llm')
+    def test_pregate_skips_llm(self, mock_llm, mock_prepare, mock_base):
+        """ทดสอบว่า confluence ที่ไม่ผ่าน IMPACT_THRESHOLD จะไม่เรียก AI เลย"""
+        mock_prepare.return_value = ("BLOCK", {"strength": services.IMPACT_THRESHOLD,
+                                               "confluence_count": 1, "direction": "NEUTRAL"})
+        before = services.get_llm_gate_stats()
+
+        result = services.analyze_content("NEWS", "TSLA", [{"title": "x"}])
+
+        mock_llm.assert_not_called()
+        self.assertTrue(result["llm_skipped"])
+        self.assertEqual(result["impact_score"], services.IMPACT_THRESHOLD)
+        self.assertEqual(services.get_llm_gate_stats()["skipped"], before["skipped"] + 1)
+        print("✅ [Services] confluence pre-gate: ผ่าน")
+
 
 class TestDBHandler(unittest.TestCase):
     """ทดสอบ db_handler.py (Supabase)"""
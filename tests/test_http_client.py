@@ -0,0 +1,59 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+import http_client
+
+
+def _response(status, headers=None):
+    res = MagicMock()
+    res.status_code = status
+    res.headers = headers or {}
+    return res
+
+
+class TestHttpClient(unittest.TestCase):
+    """ทดสอบ http_client.py (session pool + timeout + retry/backoff)"""
+
+    @patch('http_client.time.sleep')
+    @patch('http_client._get_session')
+    def test_retries_429_honoring_retry_after(self, mock_session, mock_sleep):
+        session = mock_session.return_value
+        session.request.side_effect = [_response(429, {"Retry-After": "2"}), _response(503), _response(200)]
+
+        res = http_client.get("https://finnhub.io/api/v1/stock/metric")
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(session.request.call_count, 3)
+        self.assertEqual(mock_sleep.call_args_list[0].args[0], 2.0)
+        self.assertEqual(session.request.call_args.kwargs["timeout"], http_client.DEFAULT_TIMEOUT)
+        print("✅ [HttpClient] retry 429/5xx + Retry-After + default timeout: ผ่าน")
+
+    @patch('http_client.time.sleep')
+    @patch('http_client._get_session')
+    def test_post_read_timeout_is_not_retried(self, mock_session, mock_sleep):
+        session = mock_session.return_value
+        session.request.side_effect = http_client.requests.ReadTimeout("slow")
+
+        with self.assertRaises(http_client.requests.ReadTimeout):
+            http_client.post("https://api.line.me/v2/bot/message/push", json={})
+        self.assertEqual(session.request.call_count, 1)
+        mock_sleep.assert_not_called()
+        print("✅ [HttpClient] POST read timeout ไม่ retry (กันส่งซ้ำ): ผ่าน")
+
+    def test_session_is_shared_per_host(self):
+        a = http_client._get_session("https://data.sec.gov/submissions/CIK1.json")
+        b = http_client._get_session("https://data.sec.gov/submissions/CIK2.json")
+        c = http_client._get_session("https://www.sec.gov/files/company_tickers.json")
+        self.assertIs(a, b)
+        self.assertIsNot(a, c)
+        print("✅ [HttpClient] session pool แยกตาม host: ผ่าน")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=0)
@@ -0,0 +1,126 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+import indicators
+import indicator_state
+
+
+def make_daily(seed, n_days=160):
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(end="2024-06-28", periods=n_days)
+    close = 20 * np.exp(np.cumsum(rng.normal(0, 0.02, n_days)))
+    df = pd.DataFrame({"Open": close, "High": close * (1 + rng.uniform(0, 0.03, n_days)),
+                       "Low": close * (1 - rng.uniform(0, 0.03, n_days)), "Close": close,
+                       "Volume": 1000.0}, index=index)
+    df.iloc[[30, 31, 90], df.columns.get_loc("Close")] = np.nan    # แท่งหาย
+    return df
+
+
+def full_recompute(frames):
+    tickers = list(frames)
+    columns = {c: np.column_stack([frames[t][c].to_numpy(dtype="float64") for t in tickers])
+               for c in ("Close", "High", "Low")}
+    return indicators.indicator_table(tickers, columns["Close"], columns["High"], columns["Low"])
+
+
+class TestIndicatorState(unittest.TestCase):
+    """ทดสอบ indicator_state.py: state แบบ incremental ต้องได้ค่าเท่ากับคำนวณใหม่ทั้งชุด"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "state.json")
+        self.frames = {f"T{i}": make_daily(i) for i in range(4)}
+        flat = make_daily(9)
+        flat[["High", "Low", "Close"]] = 5.0
+        self.frames["FLAT"] = flat
+        up = make_daily(10)
+        up["Close"] = up["High"] = up["Low"] = np.linspace(5, 9, len(up))
+        self.frames["UP"] = up
+        self.days = self.frames["T0"].index
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def assertMatches(self, table, expected):
+        for ticker in expected.index:
+            for column in indicator_state.STATE_COLUMNS:
+                got, want = table.loc[ticker, column], expected.loc[ticker, column]
+                if np.isnan(want):
+                    self.assertTrue(np.isnan(got), f"{ticker} {column}")
+                else:
+                    self.assertAlmostEqual(got, want, delta=1e-9 * max(1.0, abs(want)), msg=f"{ticker} {column}")
+
+    def history(self, ticker, **kwargs):
+        return {"daily": self.frames[ticker]}
+
+    def test_incremental_matches_full_recompute_across_restarts(self):
+        store = indicator_state.IndicatorStateStore(self.path)
+        with patch("indicator_state.read_timeframes", side_effect=self.history):
+            for step, end in enumerate(range(20, len(self.days) + 1)):
+                # แต่ละรอบเห็นแค่ประวัติ 15 วันล่าสุด แท่งสุดท้าย = วันนี้ที่ยังไม่ปิด (peek)
+                window = {t: df.iloc[max(0, end - 15):end] for t, df in self.frames.items()}
+                table = store.update(window, today=self.days[end - 1])
+                if step % 10 == 0:
+                    self.assertMatches(table, full_recompute({t: df.iloc[:end] for t, df in self.frames.items()}))
+                    store.save_if_dirty()
+                    store = indicator_state.IndicatorStateStore(self.path)     # restart: โหลด state จากไฟล์
+
+        # หลังตลาดปิด: แท่งวันนี้ถูก commit แล้วค่าต้องเท่าเดิม
+        closed = store.update({t: df.iloc[-15:] for t, df in self.frames.items()},
+                              today=self.days[-1] + pd.Timedelta(days=1))
+        self.assertMatches(closed, full_recompute(self.frames))
+        self.assertEqual(closed.loc["FLAT", "rsi14"], 50.0)
+        self.assertEqual(closed.loc["UP", "rsi14"], 100.0)
+        print("✅ [IndicatorState] incremental + restart เท่ากับคำนวณใหม่ทั้งชุด: ผ่าน")
+
+    def test_rebuilds_after_gap_or_revised_history(self):
+        store = indicator_state.IndicatorStateStore(self.path)
+        with patch("indicator_state.read_timeframes", side_effect=self.history) as mock_read:
+            store.update({t: df.iloc[:100] for t, df in self.frames.items()}, today=self.days[99])
+            mock_read.reset_mock()
+
+            # ห่างหายไปนานกว่าหน้าต่างที่เห็น -> อ่านประวัติยาวมาสร้างใหม่
+            window = {"T0": self.frames["T0"].iloc[140:150]}
+            table = store.update(window, today=self.days[149])
+            mock_read.assert_called_once()
+            self.assertMatches(table, full_recompute({"T0": self.frames["T0"].iloc[:150]}))
+
+            # ราคาย้อนหลังถูกปรับ (split 2:1) -> สร้างใหม่จากประวัติที่ปรับแล้ว
+            mock_read.reset_mock()
+            self.frames["T1"] = self.frames["T1"].copy()
+            self.frames["T1"][["High", "Low", "Close"]] /= 2
+            table = store.update({"T1": self.frames["T1"].iloc[90:101]}, today=self.days[100])
+            mock_read.assert_called_once()
+            self.assertMatches(table, full_recompute({"T1": self.frames["T1"].iloc[:101]}))
+        print("✅ [IndicatorState] สร้าง state ใหม่เมื่อประวัติขาดช่วง/ถูกปรับ: ผ่าน")
+
+    def test_concurrent_updates_save_once(self):
+        store = indicator_state.IndicatorStateStore(self.path)
+        chunks = [{t: self.frames[t].iloc[:120]} for t in self.frames]
+        with patch("indicator_state.read_timeframes", side_effect=self.history):
+            with ThreadPoolExecutor(max_workers=len(chunks)) as pool:
+                list(pool.map(lambda chunk: store.update(chunk, today=self.days[119]), chunks))
+        self.assertFalse(os.path.exists(self.path))         # update ไม่เขียนไฟล์เอง
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(lambda _: store.save(), range(8)))
+        store.save_if_dirty()
+        self.assertEqual(os.listdir(self.tmp.name), ["state.json"])     # ไม่มีไฟล์ .tmp ค้าง
+        reloaded = indicator_state.IndicatorStateStore(self.path)
+        self.assertEqual(set(reloaded._states), set(self.frames))
+        print("✅ [IndicatorState] update พร้อมกันหลาย thread + บันทึกไฟล์ครั้งเดียว: ผ่าน")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=0)
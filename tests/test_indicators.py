@@ -0,0 +1,116 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+
+import numpy as np
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+import indicators
+import get_technicals
+
+
+def smooth_reference(values, n, alpha):
+    """EMA/Wilder ทีละค่าแบบตำรา: เริ่มจาก SMA ของ n ค่าแรก"""
+    out = [np.nan] * len(values)
+    if len(values) < n:
+        return out
+    prev = sum(values[:n]) / n
+    out[n - 1] = prev
+    for i in range(n, len(values)):
+        prev = alpha * values[i] + (1 - alpha) * prev
+        out[i] = prev
+    return out
+
+
+def rsi_reference(closes, n=14):
+    delta = np.diff(closes)
+    gains = list(np.where(delta > 0, delta, 0.0))
+    losses = list(np.where(delta < 0, -delta, 0.0))
+    g = smooth_reference(gains, n, 1 / n)[-1]
+    l = smooth_reference(losses, n, 1 / n)[-1]
+    return 100 - 100 / (1 + g / l)
+
+
+class TestIndicators(unittest.TestCase):
+    """ทดสอบ indicators.py (vectorized ทั้ง universe) เทียบกับการคำนวณทีละ ticker"""
+
+    def setUp(self):
+        rng = np.random.default_rng(11)
+        self.close = 50 + rng.standard_normal((120, 5)).cumsum(axis=0)
+        self.high = self.close + rng.random(self.close.shape)
+        self.low = self.close - rng.random(self.close.shape)
+        holes = rng.random(self.close.shape) < 0.1
+        for a in (self.close, self.high, self.low):
+            a[holes] = np.nan
+        self.close[:90, 4] = np.nan      # ประวัติสั้น (< 50 แท่ง)
+        self.tickers = [f"T{i}" for i in range(5)]
+        indicators.clear()
+
+    def tearDown(self):
+        indicators.clear()
+
+    def assertClose(self, actual, expected):
+        if np.isnan(expected):
+            self.assertTrue(np.isnan(actual))
+        else:
+            self.assertAlmostEqual(actual, expected, places=9)
+
+    def test_matches_per_ticker_reference(self):
+        table = indicators.indicator_table(self.tickers, self.close, self.high, self.low)
+
+        for i, ticker in enumerate(self.tickers):
+            valid = ~(np.isnan(self.close[:, i]) | np.isnan(self.high[:, i]) | np.isnan(self.low[:, i]))
+            c, h, l = self.close[valid, i], self.high[valid, i], self.low[valid, i]
+            row = table.loc[ticker]
+            self.assertAlmostEqual(row["price"], c[-1])
+            if len(c) >= 50:
+                self.assertAlmostEqual(row["sma50"], c[-50:].mean(), places=9)
+            else:
+                self.assertTrue(np.isnan(row["sma50"]))
+            self.assertClose(row["ema12"], smooth_reference(list(c), 12, 2 / 13)[-1])
+            self.assertClose(row["rsi14"], rsi_reference(c))
+
+            tr = [h[0] - l[0]] + [max(h[k] - l[k], abs(h[k] - c[k - 1]), abs(l[k] - c[k - 1]))
+                                  for k in range(1, len(c))]
+            self.assertClose(row["atr14"], smooth_reference(tr, 14, 1 / 14)[-1])
+
+            line = np.array(smooth_reference(list(c), 12, 2 / 13)) - np.array(smooth_reference(list(c), 26, 2 / 27))
+            signal = smooth_reference(list(line[~np.isnan(line)]), 9, 0.2)[-1]
+            self.assertClose(row["macd"], line[-1])
+            self.assertClose(row["macd_hist"], line[-1] - signal)
+        print("✅ [Indicators] SMA/EMA/RSI/ATR/MACD ตรงกับสูตรทีละ ticker: ผ่าน")
+
+    def test_vwap_resets_each_session(self):
+        index = pd.date_range("2024-03-11 09:30", periods=4, freq="5min").append(
+            pd.date_range("2024-03-12 09:30", periods=3, freq="5min"))
+        price = np.array([[10.0, 20.0], [11.0, np.nan], [12.0, 21.0], [13.0, 22.0],
+                          [20.0, np.nan], [22.0, 30.0], [24.0, np.nan]])
+        volume = np.array([[1.0, 1.0]] * 4 + [[1.0, 0.0], [3.0, 2.0], [4.0, 0.0]])
+        result = indicators.vwap(price, price, price, volume, index.normalize().asi8)
+
+        self.assertAlmostEqual(result[-1, 0], (20 + 22 * 3 + 24 * 4) / 8)
+        self.assertAlmostEqual(result[-1, 1], 30.0)     # แท่งสุดท้ายของ B หาย ใช้ค่าสะสมล่าสุดของ session
+        self.assertAlmostEqual(result[3, 1], (20 + 21 + 22) / 3)
+        print("✅ [Indicators] VWAP เริ่มนับใหม่ทุก session: ผ่าน")
+
+    def test_technicals_read_published_row(self):
+        indicators.publish(indicators.indicator_table(self.tickers, self.close, self.high, self.low))
+
+        with patch('get_technicals.load_timeframes', side_effect=AssertionError("ไม่ควรโหลดแท่งใหม่")):
+            data = get_technicals.fetch_technical_data("T0")
+            self.assertIsNone(get_technicals.fetch_technical_data("T4"))   # SMA50 ยังไม่มี
+
+        self.assertEqual(data["rsi"], data["rsi14"])
+        text, score = get_technicals.format_technical_analysis(data)
+        self.assertIn("MACD hist", text)
+        self.assertIn(score, range(-2, 3))
+        print("✅ [Indicators] get_technicals อ่านแถวที่คำนวณไว้: ผ่าน")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=0)
@@ -0,0 +1,97 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+import llm_registry
+import services
+
+
+class ResourceExhausted(Exception):
+    """หน้าตาเดียวกับ error quota ของ Gemini (แยกจากชื่อคลาส)"""
+
+
+class TestModelHealthRegistry(unittest.TestCase):
+    """ทดสอบ llm_registry.py (พักโมเดลที่ fail/โดน quota ตามช่วง cooldown)"""
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = patch('llm_registry.time.monotonic', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.registry = llm_registry.ModelHealthRegistry(failure_threshold=2, failure_cooldown=300,
+                                                         quota_cooldown=3600)
+
+    def test_skips_model_during_cooldown_after_failures(self):
+        models = ["a", "b"]
+        self.registry.record_failure("a", TimeoutError("timeout"))
+        self.assertEqual(self.registry.available(models), ["a", "b"])     # ครั้งเดียวยังไม่ถึงเกณฑ์
+
+        self.registry.record_failure("a", TimeoutError("timeout"))
+        self.assertEqual(self.registry.available(models), ["b"])
+        self.now += 299
+        self.assertEqual(self.registry.available(models), ["b"])
+        self.assertEqual(self.registry.report()["a"]["cooldown_remaining"], 1)
+        print("✅ [LLMRegistry] พักโมเดลที่ fail ติดกันตลอด cooldown: ผ่าน")
+
+    def test_quota_error_gets_longer_cooldown(self):
+        self.assertTrue(llm_registry.is_quota_error(ResourceExhausted("limit")))
+        self.assertTrue(llm_registry.is_quota_error(Exception("429 Too Many Requests")))
+        self.assertFalse(llm_registry.is_quota_error(TimeoutError("timeout")))
+
+        self.registry.record_failure("a", ResourceExhausted("quota exceeded"))     # ครั้งเดียวก็พักเลย
+        self.now += 301
+        self.assertEqual(self.registry.available(["a"]), [])
+        self.now += 3300
+        self.assertEqual(self.registry.available(["a"]), ["a"])
+        self.assertEqual(self.registry.report()["a"]["quota_errors"], 1)
+        print("✅ [LLMRegistry] โดน quota พักนานกว่า error ทั่วไป: ผ่าน")
+
+    def test_model_recovers_after_cooldown(self):
+        for _ in range(2):
+            self.registry.record_failure("a", TimeoutError("timeout"))
+        self.now += 300
+        self.assertEqual(self.registry.available(["a"]), ["a"])
+
+        self.registry.record_success("a", 1.5)
+        health = self.registry.report()["a"]
+        self.assertEqual((health["successes"], health["failures"], health["cooldown_remaining"]), (1, 2, 0))
+        self.assertEqual(health["avg_latency"], 1.5)
+        # หลังสำเร็จ นับ fail ติดกันใหม่ตั้งแต่ศูนย์
+        self.registry.record_failure("a", TimeoutError("timeout"))
+        self.assertEqual(self.registry.available(["a"]), ["a"])
+        print("✅ [LLMRegistry] โมเดลกลับมาใช้ได้เมื่อพ้น cooldown: ผ่าน")
+
+
+class TestCallGemini(unittest.TestCase):
+    """ทดสอบ services.call_gemini ลองโมเดลที่ไม่ถูกพักก่อน"""
+
+    def setUp(self):
+        services.reset_llm_clients()
+        self.addCleanup(services.reset_llm_clients)
+
+    @patch('services._get_gemini_model')
+    def test_tries_healthy_model_first(self, mock_get_model):
+        first, second = services.GEMINI_MODELS[0], services.GEMINI_MODELS[1]
+        broken, healthy = MagicMock(), MagicMock()
+        broken.generate_content.side_effect = ResourceExhausted("quota exceeded")
+        healthy.generate_content.return_value.text = '{"sentiment": "POSITIVE"}'
+        mock_get_model.side_effect = lambda name: broken if name == first else healthy
+
+        self.assertEqual(services.call_gemini("prompt"), {"sentiment": "POSITIVE"})
+        self.assertEqual([c.args[0] for c in mock_get_model.call_args_list], [first, second])
+
+        # รอบถัดไปโมเดลแรกอยู่ในช่วงพัก -> ยิงตัวที่ใช้งานได้ตั้งแต่ครั้งแรก
+        mock_get_model.reset_mock()
+        self.assertEqual(services.call_gemini("prompt"), {"sentiment": "POSITIVE"})
+        self.assertEqual([c.args[0] for c in mock_get_model.call_args_list], [second])
+        self.assertEqual(broken.generate_content.call_count, 1)
+        print("✅ [Services] call_gemini ข้ามโมเดลที่ถูกพัก: ผ่าน")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=0)
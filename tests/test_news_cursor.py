@@ -0,0 +1,125 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+import db_handler
+import get_news
+
+
+def news(url, time_published):
+    return {"url": url, "time_published": time_published, "ticker_sentiment": []}
+
+
+class TestNewsCursor(unittest.TestCase):
+    """ทดสอบ high-water mark ของข่าว (get_news + db_handler) ไม่วิเคราะห์ข่าวเดิมซ้ำ"""
+
+    def setUp(self):
+        self.cursor = {"last_time_published": "20240312T153045",
+                       "seen_urls": ["u/old", "u/1530a"]}
+
+    def test_filter_drops_seen_and_older_news(self):
+        feed = [news("u/new", "20240312T160000"), news("u/1530b", "20240312T153045"),
+                news("u/1530a", "20240312T153045"), news("u/older", "20240312T150000"),
+                {"url": "u/no-time"}]
+        self.assertEqual(get_news.filter_unseen_news(feed, None), feed)
+        self.assertEqual([n["url"] for n in get_news.filter_unseen_news(feed, self.cursor)], ["u/new", "u/1530b"])
+        print("✅ [NewsCursor] ตัดข่าวที่เห็นแล้ว/เก่ากว่า high-water mark: ผ่าน")
+
+    @patch('get_news.save_news_cursor')
+    def test_advance_cursor_keeps_latest_time_and_url_order(self, mock_save):
+        feed = [news("u/c", "20240312T170000"), news("u/b", "20240312T160000"), {"url": None}]
+        get_news.advance_news_cursor("TSLA", self.cursor, feed)
+        mock_save.assert_called_once_with("TSLA", "20240312T170000", ["u/old", "u/1530a", "u/b", "u/c"])
+
+        # ไม่มี cursor เดิม และข่าวใหม่เก่ากว่า mark เดิมไม่ได้ทำให้ mark ถอยหลัง
+        mock_save.reset_mock()
+        get_news.advance_news_cursor("TSLA", None, [news("u/a", "20240311T090000")])
+        mock_save.assert_called_once_with("TSLA", "20240311T090000", ["u/a"])
+        mock_save.reset_mock()
+        get_news.advance_news_cursor("TSLA", self.cursor, [news("u/a", "20240311T090000")])
+        self.assertEqual(mock_save.call_args.args[1], "20240312T153045")
+        print("✅ [NewsCursor] เลื่อน cursor ไปข่าวล่าสุด: ผ่าน")
+
+    @patch('get_news.analyze_content')
+    @patch('get_news.fetch_news_feed')
+    @patch('get_news.get_news_cursor')
+    def test_time_from_and_skip_llm_without_new_news(self, mock_cursor, mock_fetch, mock_analyze):
+        mock_cursor.return_value = self.cursor
+        mock_fetch.return_value = [news("u/1530a", "20240312T153045")]
+
+        with patch('get_news.save_news_cursor') as mock_save:
+            get_news.process_news_ticker("TSLA", "context", "snapshot")
+
+        mock_fetch.assert_called_once_with("TSLA", "20240312T1530")     # ละเอียดระดับนาที
+        mock_analyze.assert_not_called()
+        mock_save.assert_not_called()
+
+        # ยังไม่เคยมี cursor -> ดึงเต็มไม่ส่ง time_from
+        mock_cursor.return_value = None
+        mock_fetch.reset_mock()
+        mock_fetch.return_value = []
+        self.assertIsNone(get_news.fetch_ticker_news("TSLA"))
+        mock_fetch.assert_called_once_with("TSLA", None)
+        print("✅ [NewsCursor] time_from จาก cursor + ไม่มีข่าวใหม่ไม่เรียก LLM: ผ่าน")
+
+    @patch('get_news.save_news_cursor')
+    def test_cursor_not_advanced_when_analysis_fails(self, mock_save):
+        feed = [news("u/new", "20240312T160000")]
+        get_news.handle_news_analysis("TSLA", self.cursor, feed, None)
+        mock_save.assert_not_called()
+
+        # batch: ticker ที่ AI ไม่ได้ตอบกลับมาไม่ถูกเลื่อน ตัวที่ตอบเลื่อนตามปกติ
+        fetched = {"TSLA": (self.cursor, feed, feed), "AAPL": (None, feed, feed)}
+        with patch('get_news.analyze_content', return_value={"AAPL": {"impact_score": 0}}):
+            get_news.process_news_batch(fetched, "context", "snapshot")
+        mock_save.assert_called_once_with("AAPL", "20240312T160000", ["u/new"])
+        print("✅ [NewsCursor] AI ล่ม cursor ไม่เลื่อน: ผ่าน")
+
+
+class TestNewsCursorDB(unittest.TestCase):
+    """ทดสอบ db_handler.get_news_cursor / save_news_cursor (mock connection)"""
+
+    def setUp(self):
+        self.conn = MagicMock()
+        self.cur = self.conn.cursor.return_value.__enter__.return_value
+        patcher = patch('db_handler.get_connection', return_value=self.conn)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch('db_handler.release_connection')
+        self.release_connection = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_get_news_cursor(self):
+        self.cur.fetchone.return_value = ("20240312T153045", ["u/1", "u/2"])
+        self.assertEqual(db_handler.get_news_cursor("TSLA"),
+                         {"last_time_published": "20240312T153045", "seen_urls": ["u/1", "u/2"]})
+        self.cur.fetchone.return_value = None
+        self.assertIsNone(db_handler.get_news_cursor("TSLA"))
+        self.assertEqual(self.release_connection.call_count, 2)
+        print("✅ [DB] get_news_cursor: ผ่าน")
+
+    def test_save_news_cursor_trims_seen_urls(self):
+        urls = [f"u/{i}" for i in range(db_handler.MAX_SEEN_URLS + 50)]
+        db_handler.save_news_cursor("TSLA", "20240312T160000", urls)
+        symbol, last, saved = self.cur.execute.call_args.args[1]
+        self.assertEqual((symbol, last), ("TSLA", "20240312T160000"))
+        self.assertEqual(saved, urls[-db_handler.MAX_SEEN_URLS:])
+        self.assertEqual(len(saved), 200)
+        print("✅ [DB] save_news_cursor เก็บ seen_urls แค่ MAX_SEEN_URLS ตัวล่าสุด: ผ่าน")
+
+    def test_save_news_cursor_failure_is_rolled_back(self):
+        self.cur.execute.side_effect = Exception("connection reset")
+        db_handler.save_news_cursor("TSLA", "20240312T160000", ["u/1"])     # ไม่โยน error ออกมา
+        # with conn: ออกด้วย exception -> rollback (cursor เดิมใน DB ไม่ถูกเลื่อน)
+        self.assertIsNotNone(self.conn.__exit__.call_args.args[0])
+        self.release_connection.assert_called_once_with(self.conn)
+        print("✅ [DB] save_news_cursor ล้มเหลวไม่เลื่อน cursor: ผ่าน")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=0)
@@ -0,0 +1,122 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+import path_evaluator
+
+
+def make_bars(seed, start="2024-03-04", sessions=20):
+    rng = np.random.default_rng(seed)
+    days = pd.bdate_range(start, periods=sessions)
+    offsets = pd.timedelta_range("09:30:00", periods=78, freq="5min")
+    index = pd.DatetimeIndex([d + o for d in days for o in offsets]).tz_localize("America/New_York")
+    close = 50 * np.exp(np.cumsum(rng.normal(0, 0.004, len(index))))
+    return pd.DataFrame({"Open": close, "High": close * 1.002, "Low": close * 0.998, "Close": close,
+                         "Volume": 100.0}, index=index)
+
+
+def reference(p, df):
+    """ทีละแท่งแบบตรงไปตรงมา (สูตรอ้างอิง)"""
+    start, end = pd.Timestamp(p["created_at"]), pd.Timestamp(p["created_at"]) + pd.Timedelta(days=p["time_horizon_days"])
+    window = df[(df.index >= start) & (df.index < end)]
+    sign = {"UP": 1, "DOWN": -1}.get(p["predicted_direction"], 0)
+    entry = p["start_price"]
+    if window.empty:
+        return "NO_DATA", None, np.nan, np.nan
+    if sign == 0:
+        return "NONE", None, np.nan, np.nan
+    outcome, at, mfe, mae = "NONE", None, -np.inf, np.inf
+    for ts, bar in window.iterrows():
+        best, worst = (bar["High"], bar["Low"]) if sign > 0 else (bar["Low"], bar["High"])
+        mfe = max(mfe, sign * (best - entry) / entry * 100)
+        mae = min(mae, sign * (worst - entry) / entry * 100)
+        if outcome == "NONE":
+            if p["stop_loss_price"] is not None and sign * (worst - p["stop_loss_price"]) <= 0:
+                outcome, at = "STOP", ts
+            elif p["target_price"] is not None and sign * (best - p["target_price"]) >= 0:
+                outcome, at = "TARGET", ts
+    return outcome, at, mfe, mae
+
+
+class TestPathEvaluator(unittest.TestCase):
+    """ทดสอบ path_evaluator.py (first touch + MFE/MAE แบบ vectorized)"""
+
+    def setUp(self):
+        self.bars = {f"S{i}": make_bars(i) for i in range(6)}
+        rng = np.random.default_rng(42)
+        self.predictions = []
+        for i in range(400):
+            symbol = f"S{i % 7}"                      # S6 ไม่มีแท่ง
+            created = datetime(2024, 3, 4, 14, 30, tzinfo=timezone.utc) + pd.Timedelta(minutes=int(rng.integers(0, 20000)))
+            entry = 50 * rng.uniform(0.9, 1.1)
+            direction = rng.choice(["UP", "DOWN", "NEUTRAL"], p=[0.45, 0.45, 0.1])
+            sign = 1 if direction == "UP" else -1
+            self.predictions.append({
+                "id": i, "symbol": symbol.lower() if i % 5 == 0 else symbol, "created_at": created,
+                "time_horizon_days": int(rng.integers(1, 6)), "start_price": entry, "predicted_direction": direction,
+                "target_price": None if i % 11 == 0 else entry * (1 + sign * rng.uniform(0.005, 0.05)),
+                "stop_loss_price": None if i % 13 == 0 else entry * (1 - sign * rng.uniform(0.005, 0.05)),
+            })
+
+    def test_matches_per_bar_reference(self):
+        table = path_evaluator.evaluate_paths(path_evaluator.prediction_arrays(self.predictions), self.bars,
+                                              chunk_rows=64)
+        self.assertEqual(len(table), len(self.predictions))
+        outcomes = set()
+        for p in self.predictions:
+            outcome, at, mfe, mae = reference(p, self.bars.get(p["symbol"].upper(), make_bars(0).iloc[0:0]))
+            row = table.loc[p["id"]]
+            outcomes.add(outcome)
+            self.assertEqual(row["first_touch"], outcome, p["id"])
+            self.assertEqual(None if pd.isna(row["first_touch_at"]) else row["first_touch_at"], at, p["id"])
+            for got, want in ((row["mfe_pct"], mfe), (row["mae_pct"], mae)):
+                if np.isnan(want):
+                    self.assertTrue(np.isnan(got), p["id"])
+                else:
+                    self.assertAlmostEqual(got, want, places=9, msg=p["id"])
+        self.assertEqual(outcomes, {"TARGET", "STOP", "NONE", "NO_DATA"})
+        print("✅ [PathEvaluator] vectorized เท่ากับการไล่ทีละแท่ง: ผ่าน")
+
+    def test_same_bar_touch_counts_as_stop(self):
+        index = pd.date_range("2024-03-04 09:30", periods=3, freq="5min", tz="America/New_York")
+        bars = {"X": pd.DataFrame({"High": [100.5, 103.0, 104.0], "Low": [99.5, 97.0, 99.0]}, index=index)}
+        p = {"id": 1, "symbol": "X", "created_at": index[0], "time_horizon_days": 1, "start_price": 100.0,
+             "predicted_direction": "UP", "target_price": 102.0, "stop_loss_price": 98.0}
+        row = path_evaluator.evaluate_paths(path_evaluator.prediction_arrays([p]), bars).loc[1]
+        self.assertEqual((row["first_touch"], row["first_touch_at"]), ("STOP", index[1]))
+        self.assertAlmostEqual(row["mfe_pct"], 4.0)
+        self.assertAlmostEqual(row["mae_pct"], -3.0)
+        print("✅ [PathEvaluator] แท่งเดียวแตะทั้งคู่นับเป็น STOP: ผ่าน")
+
+    @patch('path_evaluator.save_path_results')
+    @patch('path_evaluator.download')
+    @patch('path_evaluator.get_path_candidates')
+    def test_run_downloads_once_per_interval_and_saves_once(self, mock_candidates, mock_download, mock_save):
+        mock_candidates.return_value = self.predictions
+        columns = pd.MultiIndex.from_product([list(self.bars), ["Open", "High", "Low", "Close", "Volume"]])
+        data = pd.concat(self.bars.values(), axis=1)
+        data.columns = columns
+        mock_download.return_value = data
+
+        with patch('path_evaluator.INTRADAY_LIMITS', [("5m", 10**6)]):
+            table = path_evaluator.run_path_evaluation(rescore=True)
+
+        mock_download.assert_called_once()
+        mock_save.assert_called_once()
+        saved = mock_save.call_args.args[0]
+        self.assertEqual(len(saved), (table["first_touch"] != "NO_DATA").sum())
+        self.assertNotIn("NO_DATA", {row[1] for row in saved})
+        print("✅ [PathEvaluator] download ครั้งเดียว + บันทึกครั้งเดียว: ผ่าน")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=0)
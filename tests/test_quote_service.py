@@ -0,0 +1,97 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+
+import numpy as np
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+import quote_service
+
+
+def av_response(payload):
+    res = MagicMock()
+    res.json.return_value = payload
+    return res
+
+
+def yf_frame(prices):
+    """ผลหน้าตาเดียวกับ yf.download(group_by="ticker") แท่งสุดท้ายของบางตัวเป็น NaN"""
+    index = pd.date_range("2024-03-12 09:30", periods=3, freq="1min", tz="America/New_York")
+    columns = pd.MultiIndex.from_product([list(prices), ["Open", "High", "Low", "Close", "Volume"]])
+    data = pd.DataFrame(1.0, index=index, columns=columns)
+    for symbol, price in prices.items():
+        data[(symbol, "Close")] = [price - 1, price, np.nan]
+    return data
+
+
+@patch('quote_service.acquire')
+@patch('quote_service.ALPHA_VANTAGE_API_KEY', "KEY")
+@patch('quote_service.QUOTE_USE_ALPHAVANTAGE', True)
+class TestQuoteService(unittest.TestCase):
+    """ทดสอบ quote_service.py (ราคาแบบ batch + cache + fallback)"""
+
+    def setUp(self):
+        quote_service.clear()
+        quote_service._av_disabled = False
+        self.persisted = {}
+        self.patchers = [
+            patch('quote_service.cache_get', side_effect=lambda ns, key: self.persisted.get((ns, key))),
+            patch('quote_service.cache_set', side_effect=lambda ns, key, value, ttl: self.persisted.update(
+                {(ns, key): value})),
+        ]
+        for p in self.patchers:
+            p.start()
+
+    def tearDown(self):
+        for p in reversed(self.patchers):
+            p.stop()
+        quote_service._av_disabled = False
+
+    @patch('quote_service.download')
+    @patch('quote_service.http_client.get')
+    def test_one_bulk_call_then_fallback_and_cache(self, mock_get, mock_download, mock_acquire):
+        mock_get.return_value = av_response({"endpoint": "Realtime Bulk Quotes", "data": [
+            {"symbol": "TSLA", "close": "251.30"}, {"symbol": "AAPL", "close": "189.90"}]})
+        mock_download.return_value = yf_frame({"NVDA": 900.0})
+
+        prices = quote_service.get_quotes(["tsla", "AAPL", "NVDA", "GENERAL", "", "TSLA", "ZZZZ"])
+
+        self.assertEqual(prices, {"TSLA": 251.3, "AAPL": 189.9, "NVDA": 900.0, "ZZZZ": 0.0})
+        mock_get.assert_called_once()
+        self.assertEqual(mock_get.call_args.kwargs["params"]["symbol"], "TSLA,AAPL,NVDA,ZZZZ")
+        self.assertEqual(mock_download.call_args.args[0], ["NVDA", "ZZZZ"])
+
+        # ภายใน TTL อ่านจาก cache (ตัวที่ดึงไม่ได้ต้องลองใหม่)
+        self.assertEqual(quote_service.get_quote("aapl"), 189.9)
+        self.assertEqual(quote_service.get_quote("GENERAL"), 0.0)
+        mock_get.assert_called_once()
+        print("✅ [QuoteService] bulk quote ครั้งเดียว + fallback yfinance + cache: ผ่าน")
+
+    @patch('quote_service.download')
+    @patch('quote_service.http_client.get')
+    def test_premium_only_endpoint_disables_alphavantage(self, mock_get, mock_download, mock_acquire):
+        mock_get.return_value = av_response({"Information": "This is a premium endpoint."})
+        mock_download.return_value = yf_frame({"TSLA": 250.0, "AAPL": 190.0})
+
+        self.assertEqual(quote_service.get_quotes(["TSLA", "AAPL"]), {"TSLA": 250.0, "AAPL": 190.0})
+        quote_service.clear()
+        quote_service.get_quotes(["TSLA"])
+
+        mock_get.assert_called_once()       # ไม่เผา quota Alpha Vantage ซ้ำ
+        self.assertEqual(mock_download.call_count, 2)
+
+        # process ใหม่ (flag ใน memory หาย) ยังอ่านได้จาก ttl_cache ว่าปิดอยู่
+        quote_service._av_disabled = False
+        quote_service.clear()
+        quote_service.get_quotes(["TSLA"])
+        mock_get.assert_called_once()
+        print("✅ [QuoteService] key ฟรีปิด Alpha Vantage แล้วใช้ yfinance: ผ่าน")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=0)
@@ -0,0 +1,36 @@
+import unittest
+import sys
+import os
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from rate_limiter import TokenBucket, parse_quota
+
+
+class TestTokenBucket(unittest.TestCase):
+    """ทดสอบ rate_limiter.py (token bucket แยกตาม provider)"""
+
+    def test_parse_quota(self):
+        self.assertEqual(parse_quota("60/min"), (60, 60.0))
+        self.assertEqual(parse_quota("25/day"), (25, 86400.0))
+        print("✅ [RateLimiter] parse_quota: ผ่าน")
+
+    def test_burst_then_wait_for_refill(self):
+        bucket = TokenBucket(capacity=2, period=0.2)  # เติม 1 token ทุก 0.1 วินาที
+
+        start = time.monotonic()
+        self.assertTrue(bucket.acquire())
+        self.assertTrue(bucket.acquire())
+        self.assertLess(time.monotonic() - start, 0.05)  # burst ได้ถึง capacity ทันที
+
+        self.assertFalse(bucket.acquire(timeout=0.01))   # token หมด รอไม่ทัน
+        self.assertTrue(bucket.acquire(timeout=1.0))     # รอเติมแล้วได้
+        self.assertGreaterEqual(time.monotonic() - start, 0.08)
+        print("✅ [RateLimiter] burst + รอเติม token: ผ่าน")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=0)
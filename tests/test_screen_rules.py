@@ -0,0 +1,77 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+import indicator_state
+import screen_rules
+
+
+class TestScreenRules(unittest.TestCase):
+    """ทดสอบ screen_rules.py (rule engine แบบ vectorized)"""
+
+    def setUp(self):
+        self.features = pd.DataFrame({
+            "pct_change": [5.0, -4.0, 1.0, np.nan],
+            "volume_ratio": [2.0, 0.5, 3.0, 1.0],
+            "gap_pct": [np.nan, 6.0, -5.0, 10.0],
+            "float_multiplier": [1.5, 1.0, 0.8, 1.2],
+            "rsi14": [75.0, 25.0, 28.0, np.nan],
+        }, index=["AAA", "BBB", "CCC", "DDD"])
+
+    def test_default_screens_match_fixed_criteria(self):
+        screens = [screen_rules.compile_screen(name, **rule) for name, rule in screen_rules.DEFAULT_SCREENS.items()]
+        screens.append(screen_rules.compile_screen("bounce", "rsi14 < 30 and not pct_change < 0 or 0 < gap_pct < 8",
+                                                   "volume_ratio", top=1))
+        results = screen_rules.evaluate_screens(self.features, screens)
+
+        movers = results["movers"]
+        self.assertEqual(list(movers.index), ["AAA", "BBB"])
+        self.assertEqual(movers.loc["AAA", "score"], 5.0 * 2.0 * 1.5)
+        self.assertEqual(movers.loc["BBB", "score"], 4.0 * 1.0 * 1.0)  # volume_ratio ต่ำกว่า 1 ถูก floor
+        self.assertEqual(list(results["premarket_gaps"].index), ["DDD", "BBB", "CCC"])
+        # CCC (rsi<30, ขึ้น) กับ BBB (gap 6%) ผ่าน -> top 1 ตาม volume_ratio
+        self.assertEqual(list(results["bounce"].index), ["CCC"])
+        print("✅ [ScreenRules] หลาย screen ในรอบเดียว + เกณฑ์เดิม: ผ่าน")
+
+    def test_rejects_unsafe_or_unknown_expressions(self):
+        for expr in ["__import__('os')", "pct_change.real", "unknown_col > 1", "abs(x=pct_change)",
+                     "pct_change > 'a'", "[pct_change]", "pct_change >"]:
+            with self.assertRaises(ValueError, msg=expr):
+                screen_rules.compile_expression(expr)
+        print("✅ [ScreenRules] ปฏิเสธนิพจน์ที่ไม่ปลอดภัย: ผ่าน")
+
+    @patch('screen_rules.get_float_m', side_effect=lambda t: 10.0 if t == "AAA" else None)
+    def test_build_features_from_one_load(self, mock_float):
+        days = pd.bdate_range(end="2024-03-12", periods=60)
+        daily = {t: pd.DataFrame({"Open": 1.0, "High": 1.0, "Low": 1.0, "Volume": 1.0,
+                                  "Close": np.linspace(10, 10 + k, 60)}, index=days)
+                 for k, t in enumerate(["AAA", "BBB"])}
+        empty = pd.DataFrame(columns=["Open", "High", "Low", "Close", "Volume"])
+        bars = {"daily": daily, "intraday": {t: empty for t in daily}, "extended": {t: empty for t in daily}}
+
+        with tempfile.TemporaryDirectory() as tmp, \
+                patch('indicator_state._store', indicator_state.IndicatorStateStore(os.path.join(tmp, "state.json"))), \
+                patch('indicator_state.read_timeframes', side_effect=lambda t, **kw: {"daily": daily[t]}), \
+                patch('screen_rules.load_timeframes', return_value=bars) as mock_load:
+            features = screen_rules.build_features(["AAA", "BBB"])
+
+        mock_load.assert_called_once()
+        self.assertEqual(list(features.columns), screen_rules.FEATURE_COLUMNS)
+        self.assertEqual(features.loc["AAA", "float_multiplier"], 1.5)
+        self.assertTrue(np.isnan(features.loc["BBB", "float_m"]))
+        self.assertAlmostEqual(features.loc["BBB", "price"], 11.0)
+        self.assertAlmostEqual(features.loc["BBB", "rsi14"], 100.0)
+        print("✅ [ScreenRules] feature frame จากการโหลดครั้งเดียว: ผ่าน")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=0)
@@ -0,0 +1,170 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import json
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+import indicator_state
+import scan_tables
+import screener
+
+
+def make_intraday(seed, sessions=6, today_bars=30, drop_ratio=0.05):
+    rng = np.random.default_rng(seed)
+    days = pd.bdate_range(end=pd.Timestamp("2024-03-12"), periods=sessions)  # คร่อมวันเปลี่ยน DST
+    offsets = pd.timedelta_range("09:30:00", periods=78, freq="5min")
+    index = pd.DatetimeIndex([d + o for d in days for o in offsets]).tz_localize("America/New_York")
+    volume = rng.integers(0, 10_000, size=len(index)).astype("float64")
+    df = pd.DataFrame({"Open": 1.0, "High": 1.0, "Low": 1.0, "Close": 1.0, "Volume": volume}, index=index)
+    df = df.iloc[:len(index) - (78 - today_bars)]
+    return df[rng.random(len(df)) > drop_ratio]
+
+
+class TestPaceNormalizedVolume(unittest.TestCase):
+    """ทดสอบว่า pace_normalized_volume_ratios (vectorized) ให้ผลเท่ากับ _pace_normalized_volume_ratio"""
+
+    def test_matches_per_ticker_function(self):
+        frames = {f"T{i}": make_intraday(i, today_bars=1 + i * 7 % 77) for i in range(12)}
+
+        # กรณีขอบ: มีวันเดียว, ว่าง, มี NaN ในแถว, วันนี้ volume 0 ทั้งหมด, ประวัติสั้นกว่า lookback
+        frames["ONE_DAY"] = make_intraday(100, sessions=1)
+        frames["EMPTY"] = make_intraday(101).iloc[0:0]
+        with_nan = make_intraday(102)
+        with_nan.iloc[5:40, with_nan.columns.get_loc("Close")] = np.nan
+        frames["NAN_ROWS"] = with_nan
+        zero_today = make_intraday(103)
+        zero_today.loc[zero_today.index.normalize() == zero_today.index[-1].normalize(), "Volume"] = 0.0
+        frames["ZERO_TODAY"] = zero_today
+        frames["SHORT"] = make_intraday(104, sessions=3)
+
+        vectorized = scan_tables.pace_normalized_volume_ratios(frames)
+
+        for ticker, df in frames.items():
+            expected = scan_tables._pace_normalized_volume_ratio(df)
+            self.assertAlmostEqual(vectorized[ticker], expected, places=9, msg=ticker)
+        print("✅ [Screener] vectorized volume ratio เท่ากับแบบเดิมทุกตัว: ผ่าน")
+
+
+def make_daily(seed, n_days, close_nan_at=None):
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(end=pd.Timestamp("2024-03-12"), periods=n_days)
+    close = 10 + rng.standard_normal(n_days).cumsum()
+    df = pd.DataFrame({"Open": close, "High": close, "Low": close, "Close": close,
+                       "Volume": 1000.0}, index=index)
+    if close_nan_at is not None:
+        df.iloc[close_nan_at, df.columns.get_loc("Close")] = np.nan
+    return df
+
+
+class TestColumnarScan(unittest.TestCase):
+    """ทดสอบแกนสแกน columnar เทียบกับการคำนวณทีละ ticker แบบเดิม"""
+
+    def test_mover_table_matches_per_ticker_logic(self):
+        daily = {f"D{i}": make_daily(i, 8 + i % 5, close_nan_at=-1 if i % 4 == 0 else None) for i in range(10)}
+        daily["SHORT"] = make_daily(50, 4)
+        intraday = {t: make_intraday(i) for i, t in enumerate(daily)}
+
+        # ส่งแบบ MultiIndex (หน้าตาผล yf.download group_by="ticker") ก็ต้องได้ผลเดียวกัน
+        table = scan_tables.compute_mover_table(pd.concat(daily, axis=1, sort=True), intraday)
+
+        for ticker, df in daily.items():
+            df = df.dropna()
+            if len(df) < 5:
+                self.assertNotIn(ticker, table.index)
+                continue
+            pct = (df["Close"].iloc[-1] - df["Close"].iloc[-2]) / df["Close"].iloc[-2] * 100
+            ratio = scan_tables._pace_normalized_volume_ratio(intraday[ticker])
+            self.assertAlmostEqual(table.loc[ticker, "pct_change"], pct, places=9)
+            self.assertAlmostEqual(table.loc[ticker, "base_score"], abs(pct) * max(ratio, 1.0), places=9)
+            self.assertEqual(table.loc[ticker, "passed"], abs(pct) >= scan_tables.MIN_PCT_CHANGE)
+        print("✅ [Screener] compute_mover_table ตรงกับสูตรเดิม: ผ่าน")
+
+    def test_gap_table_uses_previous_regular_close(self):
+        daily = {"AAA": make_daily(1, 5), "BBB": make_daily(2, 1)}
+        ext_index = pd.date_range("2024-03-12 16:00", periods=3, freq="5min", tz="America/New_York")
+        prev_close = daily["AAA"]["Close"].iloc[-2]
+        extended = {t: pd.DataFrame({"Open": 1.0, "High": 1.0, "Low": 1.0,
+                                     "Close": [1.0, 1.0, prev_close * 1.1], "Volume": 1.0}, index=ext_index)
+                    for t in daily}
+
+        table = scan_tables.compute_gap_table(daily, extended)
+
+        self.assertAlmostEqual(table.loc["AAA", "gap_pct"], 10.0, places=9)
+        self.assertTrue(table.loc["AAA", "passed"])
+        self.assertNotIn("BBB", table.index)
+        print("✅ [Screener] compute_gap_table เทียบกับราคาปิดวันก่อน: ผ่าน")
+
+
+class TestShardedScan(unittest.TestCase):
+    """ทดสอบ scan แบบแบ่งก้อน: ผล top-K ต้องเท่ากับการสแกนก้อนเดียว"""
+
+    def setUp(self):
+        self.daily = {f"S{i:03d}": make_daily(200 + i, 10) for i in range(40)}
+        self.intraday = {t: make_intraday(300 + i) for i, t in enumerate(self.daily)}
+
+    def fake_load_timeframes(self, tickers, daily_period="1mo", intraday_period="6d", extended_period="2d",
+                             dtype="float64"):
+        return {"daily": {t: self.daily[t].astype(dtype) for t in tickers},
+                "intraday": {t: self.intraday[t].astype(dtype) for t in tickers},
+                "extended": {t: self.intraday[t].astype(dtype) for t in tickers}}
+
+    @patch('screen_rules.get_float_m', side_effect=lambda t: 10.0 if t.endswith("7") else None)
+    def test_chunked_top_k_matches_single_chunk(self, mock_float):
+        tickers = list(self.daily)
+        with tempfile.TemporaryDirectory() as tmp, \
+                patch('indicator_state._store', indicator_state.IndicatorStateStore(os.path.join(tmp, "state.json"))), \
+                patch('indicator_state.read_timeframes', side_effect=lambda t, **kw: {"daily": self.daily[t]}), \
+                patch('screener.load_timeframes', side_effect=self.fake_load_timeframes):
+            single = screener._sharded_scan(tickers, screener._score_mover_chunk, "test",
+                                            top_k=1000, chunk_size=1000, workers=1)
+            unlimited = screener._sharded_scan(tickers, screener._score_mover_chunk, "test", chunk_size=7, workers=2)
+            sharded = screener._sharded_scan(tickers, screener._score_mover_chunk, "test",
+                                             top_k=5, chunk_size=7, workers=3, max_rss_mb=0)
+
+        self.assertGreater(len(single), 5)
+        self.assertEqual([r["ticker"] for r in sharded], [r["ticker"] for r in single[:5]])
+        self.assertEqual(screener.last_scan_stats["chunks"], 6)
+        self.assertEqual(screener.last_scan_stats["passed"], len(single))
+        self.assertEqual(screener.last_scan_stats["dropped"], len(single) - 5)
+        # ค่าเริ่มต้น SCAN_TOP_K = 0 ไม่ตัดตัวที่ผ่านเกณฑ์ทิ้ง
+        self.assertEqual([r["ticker"] for r in unlimited], [r["ticker"] for r in single])
+        self.assertGreater(screener.last_scan_stats["peak_rss_mb"], 0)
+
+        # screen "movers" ค่าเริ่มต้นต้องได้ตัวผ่าน/คะแนนเท่าเกณฑ์เดิม (MIN_PCT_CHANGE, base_score x float)
+        table = scan_tables.compute_mover_table(self.daily, self.intraday, dtype=scan_tables.SCAN_DTYPE)
+        expected = {t: round(float(row["base_score"]) * (1.5 if t.endswith("7") else 1.0), 2)
+                    for t, row in table[table["passed"]].iterrows()}
+        self.assertEqual({r["ticker"]: r["momentum_score"] for r in single}, expected)
+        print("✅ [Screener] sharded scan + heap top-K: ผ่าน")
+
+    @patch('screen_rules.get_float_m', return_value=None)
+    def test_scans_use_screen_rules(self, mock_float):
+        with tempfile.TemporaryDirectory() as tmp, \
+                patch('indicator_state._store', indicator_state.IndicatorStateStore(os.path.join(tmp, "state.json"))), \
+                patch('indicator_state.read_timeframes', side_effect=lambda t, **kw: {"daily": self.daily[t]}), \
+                patch('screener.load_timeframes', side_effect=self.fake_load_timeframes):
+            rules = os.path.join(tmp, "rules.json")
+            with open(rules, "w") as f:
+                json.dump({"movers": {"where": "pct_change > 0", "score": "pct_change"}}, f)
+            with patch('screen_rules.SCREEN_RULES_PATH', rules):
+                movers = screener.scan_movers(list(self.daily), top_k=1000)
+                gaps = screener.scan_premarket_gaps(list(self.daily), top_k=1000)
+
+        # ไฟล์ rule กำหนด movers ทับได้ ส่วน premarket_gaps ที่ไม่ได้กำหนดใช้เกณฑ์เดิม
+        self.assertTrue(movers and all(r["pct_change"] > 0 for r in movers))
+        self.assertEqual([r["momentum_score"] for r in movers], sorted((r["pct_change"] for r in movers), reverse=True))
+        self.assertTrue(all(abs(r["gap_pct"]) >= scan_tables.MIN_GAP_PCT for r in gaps))
+        self.assertEqual(set(gaps[0]), {"ticker", "gap_pct", "float_multiplier", "momentum_score"})
+        print("✅ [Screener] scan คัดตัวผ่านด้วย screen_rules (ไฟล์ rule กำหนดทับได้): ผ่าน")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=0)
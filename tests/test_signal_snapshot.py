@@ -0,0 +1,56 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+import get_fundamentals
+import signal_snapshot
+
+RATE_LIMITED = {"error": "API limit reached."}
+
+
+class TestSignalSnapshot(unittest.TestCase):
+    """ทดสอบ signal_snapshot.py: แหล่งที่ตอบ error/ไม่ทัน deadline ต้องได้ N/A / 0 ไม่ล้มทั้ง ticker"""
+
+    def test_finnhub_error_payload_degrades_to_na(self):
+        self.assertEqual(get_fundamentals.format_analyst_recommendation(RATE_LIMITED), "Analyst Rating: N/A")
+        self.assertEqual(get_fundamentals.format_insider_sentiment(RATE_LIMITED), "Insider Activity: N/A")
+        self.assertEqual(get_fundamentals.format_earnings_calendar([]), "No upcoming earnings within 14 days.")
+        self.assertEqual(get_fundamentals.fundamental_score_from_data(RATE_LIMITED, RATE_LIMITED), 0)
+        self.assertEqual(get_fundamentals.fundamental_score_from_data(
+            {"data": [{"change": 10}]}, [{"buy": 5, "sell": 1}]), 2)
+
+        payloads = {name: RATE_LIMITED for name in signal_snapshot.FINNHUB_PAYLOADS}
+        snapshot = signal_snapshot.SignalSnapshot("TSLA", payloads, market_snapshot={})
+        with patch('signal_snapshot.FINNHUB_API_KEY', "key"), \
+                patch('signal_snapshot.get_macro_signal_score', return_value=1):
+            signals = snapshot.signals()
+
+        self.assertIn("Analyst Rating: N/A", signals["fundamental_info"])
+        self.assertEqual(signals["fundamental_score"], 0)
+        self.assertEqual(signals["macro_score"], 1)
+        print("✅ [SignalSnapshot] Finnhub ตอบ error -> N/A / 0: ผ่าน")
+
+    def test_late_or_failing_source_falls_back(self):
+        late = list(signal_snapshot.FINNHUB_PAYLOADS) + ["technical"]
+        snapshot = signal_snapshot.SignalSnapshot("TSLA", {"stocktwits": None, "sec_filings": None}, late=late,
+                                                  market_snapshot={})
+        with patch('signal_snapshot.FINNHUB_API_KEY', "key"), \
+                patch('signal_snapshot.get_macro_signal_score', side_effect=KeyError("indices")):
+            signals = snapshot.signals()
+
+        self.assertEqual(signals["technical"], ("N/A", 0))
+        self.assertEqual(signals["fundamental_info"], "N/A")
+        self.assertEqual(signals["fundamental_score"], 0)
+        self.assertEqual(signals["macro_score"], 0)          # แปลงไม่ได้ -> 0 แหล่งอื่นยังได้ค่าตามปกติ
+        self.assertEqual(set(signals), {"technical", "fundamental_info", "fundamental_score", "macro_score",
+                                        "social_score", "social_info", "dilution_score", "dilution_info"})
+        print("✅ [SignalSnapshot] แหล่งที่ไม่ทัน/แปลงไม่ได้ไม่ล้มทั้ง ticker: ผ่าน")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=0)
@@ -0,0 +1,59 @@
+import unittest
+import sys
+import os
+import csv
+import tempfile
+
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+import stream_screener
+
+
+def write_feed(path):
+    """2 session: วันแรกราคา 10 ทั้งวัน, วันที่สอง pre-market กระโดด 5% แล้วช่วงปกติขึ้นต่อจนเกิน 3%"""
+    rows = []
+    for day, prices in (("2024-03-11", None), ("2024-03-12", [10.0, 10.1, 10.2, 10.4, 10.5])):
+        if prices:
+            rows.append((pd.Timestamp(f"{day} 08:00", tz="America/New_York"), "ABC", 10.5, 500))
+        for i in range(5):
+            ts = pd.Timestamp(f"{day} 09:30", tz="America/New_York") + pd.Timedelta(minutes=5 * i)
+            rows.append((ts, "ABC", prices[i] if prices else 10.0, 2000 if prices else 1000))
+            rows.append((ts, "XYZ", 20.0, 1000))
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["ts", "ticker", "open", "high", "low", "close", "volume"])
+        for ts, ticker, price, volume in rows:
+            writer.writerow([ts.isoformat(), ticker, price, price, price, price, volume])
+    return len(rows)
+
+
+class TestStreamScreener(unittest.TestCase):
+    """ทดสอบ stream_screener.py (state แบบ incremental + replay feed)"""
+
+    def test_replay_emits_once_per_session_and_kind(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "bars.csv")
+            total = write_feed(path)
+            seen = []
+            screener = stream_screener.StreamScreener(on_candidate=seen.append)
+            stats = stream_screener.run_stream(stream_screener.ReplayFeed(path, speed=0), screener)
+
+        self.assertEqual(stats["bars"], total)
+        self.assertEqual([(c["ticker"], c["kind"]) for c in seen], [("ABC", "gap"), ("ABC", "move")])
+        gap, move = seen
+        self.assertEqual(gap["pct_change"], 5.0)
+        # แท่ง 09:45 = 10.4 (+4%) เป็นแท่งแรกที่ข้าม 3% -> แจ้งครั้งเดียว ไม่แจ้งซ้ำที่ 10.5
+        self.assertEqual(move["pct_change"], 4.0)
+        self.assertTrue(move["bar_time"].startswith("2024-03-12T09:45"))
+        # volume สะสมถึง 09:45 = 4 x 2000 เทียบกับ 4 x 1000 ของวันก่อน
+        self.assertEqual(move["volume_ratio"], 2.0)
+        self.assertEqual(stats["candidates"], 2)
+        print("✅ [StreamScreener] replay + แจ้ง candidate ครั้งเดียวต่อ session: ผ่าน")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=0)
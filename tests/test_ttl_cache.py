@@ -0,0 +1,70 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import tempfile
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+import ttl_cache
+
+
+class TestTTLCache(unittest.TestCase):
+    """ทดสอบ ttl_cache.py (cache บน disk แบบมี TTL + จำกัดขนาด)"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.patches = [
+            patch('ttl_cache.CACHE_ENABLED', True),
+            patch('ttl_cache.CACHE_PATH', os.path.join(self.tmpdir.name, "cache.sqlite3")),
+            patch('ttl_cache._conn', None),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        if ttl_cache._conn is not None:
+            ttl_cache._conn.close()
+        for p in reversed(self.patches):
+            p.stop()
+        self.tmpdir.cleanup()
+
+    def test_get_set_and_expiry(self):
+        ttl_cache.cache_set("fred", "UNRATE", {"value": "4.1"}, ttl=60)
+        self.assertEqual(ttl_cache.cache_get("fred", "UNRATE"), {"value": "4.1"})
+        self.assertIsNone(ttl_cache.cache_get("fred", "CPIAUCSL"))
+
+        with patch('ttl_cache.time.time', return_value=ttl_cache.time.time() + 61):
+            self.assertIsNone(ttl_cache.cache_get("fred", "UNRATE"))
+        print("✅ [TTLCache] get/set + หมดอายุตาม TTL: ผ่าน")
+
+    def test_evicts_least_recently_used_when_over_size(self):
+        with patch('ttl_cache.CACHE_MAX_BYTES', 250):
+            ttl_cache.cache_set("ns", "a", "x" * 100, ttl=60)
+            ttl_cache.cache_set("ns", "b", "y" * 100, ttl=60)
+            ttl_cache.cache_get("ns", "a")  # a ถูกใช้ล่าสุด -> b ต้องโดน evict ก่อน
+            ttl_cache.cache_set("ns", "c", "z" * 100, ttl=60)
+
+        self.assertIsNotNone(ttl_cache.cache_get("ns", "a"))
+        self.assertIsNone(ttl_cache.cache_get("ns", "b"))
+        self.assertIsNotNone(ttl_cache.cache_get("ns", "c"))
+        print("✅ [TTLCache] evict ตัวที่ไม่ได้ใช้นานสุดเมื่อเกินขนาด: ผ่าน")
+
+    def test_cached_decorator_skips_empty_results(self):
+        calls = []
+
+        @ttl_cache.cached("trending", ttl=60)
+        def fetch(flag):
+            calls.append(flag)
+            return ["TSLA"] if flag else []
+
+        fetch(True); fetch(True)
+        fetch(False); fetch(False)
+        self.assertEqual(calls, [True, False, False])
+        print("✅ [TTLCache] @cached ไม่ cache ผลว่าง: ผ่าน")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=0)
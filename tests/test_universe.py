@@ -0,0 +1,59 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import tempfile
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+import universe
+
+
+class TestUniverseManager(unittest.TestCase):
+    """ทดสอบ universe.py (watchlist ตาม mtime + trending ตาม TTL + metadata)"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.watchlist = os.path.join(self.tmpdir.name, "watchlist.txt")
+        self.state = os.path.join(self.tmpdir.name, "state.json")
+        self._write_watchlist("# comment\ntsla\nAAPL\n")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _write_watchlist(self, text, mtime=None):
+        with open(self.watchlist, "w") as f:
+            f.write(text)
+        if mtime is not None:
+            os.utime(self.watchlist, (mtime, mtime))
+
+    @patch('universe.get_trending_symbols')
+    def test_reloads_on_mtime_and_caches_trending(self, mock_trending):
+        mock_trending.return_value = ["gme", "TSLA"]
+        manager = universe.UniverseManager(self.watchlist, trending_ttl=600, state_path=self.state)
+
+        self.assertEqual(manager.get(), ["TSLA", "AAPL", "GME"])
+        self.assertEqual(manager.get(), ["TSLA", "AAPL", "GME"])
+        self.assertEqual(mock_trending.call_count, 1)
+
+        with patch('universe.open', side_effect=AssertionError("ไม่ควรอ่านไฟล์ซ้ำ"), create=True):
+            manager.get()  # mtime เดิม -> ไม่อ่านไฟล์
+
+        self._write_watchlist("TSLA\nGME\nNVDA\n", mtime=os.path.getmtime(self.watchlist) + 10)
+        self.assertEqual(manager.get(include_trending=False), ["TSLA", "GME", "NVDA"])
+
+        members = manager.members()
+        self.assertEqual(members["GME"]["source"], "watchlist")   # trending -> ถูกใส่ watchlist ภายหลัง
+        self.assertEqual(members["AAPL"]["source"], "watchlist")
+        self.assertIn("added_at", members["NVDA"])
+
+        # process ใหม่ต้องจำ metadata เดิมได้
+        reloaded = universe.UniverseManager(self.watchlist, state_path=self.state)
+        self.assertEqual(reloaded.members()["AAPL"]["added_at"], members["AAPL"]["added_at"])
+        print("✅ [Universe] reload ตาม mtime + cache trending + metadata: ผ่าน")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=0)
@@ -0,0 +1,100 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+import verify_bot
+
+
+def daily_download(closes):
+    """ผลหน้าตาเดียวกับ yf.download(group_by="ticker") daily: closes = {symbol: [ราคาปิด]} ตั้งแต่ 2024-03-04"""
+    days = pd.bdate_range("2024-03-04", periods=len(next(iter(closes.values()))))
+    columns = pd.MultiIndex.from_product([list(closes), ["Open", "High", "Low", "Close", "Volume"]])
+    data = pd.DataFrame(1.0, index=days, columns=columns)
+    for symbol, values in closes.items():
+        data[(symbol, "Close")] = values
+    return data
+
+
+def prediction(id, symbol, created_at, horizon, start_price, direction):
+    return {"id": id, "symbol": symbol, "created_at": created_at, "time_horizon_days": horizon,
+            "start_price": Decimal(str(start_price)), "predicted_direction": direction}
+
+
+class TestBulkVerification(unittest.TestCase):
+    """ทดสอบ verify_bot โหมด bulk (download ครั้งเดียว, ราคาปิด ณ วันครบ horizon, UPDATE ครั้งเดียว)"""
+
+    @patch('verify_bot.get_accuracy_stats', return_value=(10, 7))
+    @patch('verify_bot.send_line_push')
+    @patch('verify_bot.update_verifications')
+    @patch('verify_bot.download')
+    @patch('verify_bot.get_due_predictions')
+    def test_bulk_uses_close_at_each_horizon(self, mock_due, mock_download, mock_update, mock_line, mock_stats):
+        # 2024-03-04 (จ.) ... 2024-03-15 (ศ.)
+        mock_download.return_value = daily_download({
+            "TSLA": [100, 101, 102, 103, 104, 110, 111, 112, 113, 90],
+            "AAPL": [50, 50, 50, 50, 50, 50, 50, 50, 50, 50],
+        })
+        created = datetime(2024, 3, 4, 15, 0, tzinfo=timezone.utc)     # 10:00 NY วันจันทร์
+        mock_due.return_value = [
+            prediction(1, "TSLA", created, 3, 100, "UP"),        # พฤ. 7 มี.ค. -> 103
+            prediction(2, "TSLA", created, 5, 100, "UP"),        # เสาร์ -> session ศ. 8 มี.ค. -> 104
+            prediction(3, "aapl", created, None, 50, "DOWN"),    # ไม่ระบุ = 1 วัน -> 50 (NEUTRAL)
+            prediction(4, "TSLA", created, 11, 100, "DOWN"),     # ศ. 15 มี.ค. ยังไม่ปิดตลาด -> รอบหน้า
+            prediction(5, "NOPE", created, 1, 10, "UP"),         # ไม่มีข้อมูล
+        ]
+
+        with patch('verify_bot._last_closed_session', return_value=pd.Timestamp("2024-03-14")):
+            verify_bot.run_verification(bulk=True)
+
+        mock_download.assert_called_once()
+        self.assertEqual(sorted(mock_download.call_args.args[0]), ["AAPL", "NOPE", "TSLA"])
+        mock_update.assert_called_once_with([(1, 103.0, True), (2, 104.0, True), (3, 50.0, False)])
+        mock_line.assert_called_once()
+        self.assertIn("ตรวจ 3 รายการ ถูก 2", mock_line.call_args.args[0])
+        print("✅ [VerifyBot] bulk verification ราคาปิด ณ วันครบ horizon: ผ่าน")
+
+    @patch('verify_bot.download')
+    def test_horizon_never_before_prediction_session(self, mock_download):
+        # ศ. 8 มี.ค. 16:30 NY (หลังตลาดปิด) horizon 1 วัน = เสาร์ -> ต้องใช้ราคาปิดวันจันทร์ 11 มี.ค.
+        after_close = prediction(1, "TSLA", datetime(2024, 3, 8, 21, 30, tzinfo=timezone.utc), 1, 100, "UP")
+        before_close = prediction(2, "TSLA", datetime(2024, 3, 8, 15, 0, tzinfo=timezone.utc), 1, 100, "UP")
+        # พ. 6 มี.ค. หลังตลาดปิด -> พฤ. 7 มี.ค. แต่วันนั้นไม่มีแท่ง (วันหยุด) -> session ถัดไป ศ. 8 มี.ค.
+        holiday = prediction(3, "TSLA", datetime(2024, 3, 6, 21, 30, tzinfo=timezone.utc), 1, 100, "UP")
+        self.assertEqual(verify_bot.horizon_session(after_close), pd.Timestamp("2024-03-11"))
+        self.assertEqual(verify_bot.horizon_session(before_close), pd.Timestamp("2024-03-09"))
+
+        data = daily_download({"TSLA": [100, 101, 102, 103, 104, 110, 111]})
+        mock_download.return_value = data.drop(pd.Timestamp("2024-03-07"))
+        items = [after_close, before_close, holiday]
+
+        # รันเย็นวันเสาร์: รายการก่อนปิดตลาดได้ราคาปิดวันศุกร์ ส่วนรายการหลังปิดตลาดยัง PENDING (รอวันจันทร์)
+        closes = verify_bot.fetch_horizon_closes(items, pd.Timestamp("2024-03-09 18:00", tz="America/New_York"))
+        self.assertEqual(closes, {2: 104.0, 3: 104.0})
+        closes = verify_bot.fetch_horizon_closes(items, pd.Timestamp("2024-03-11 18:00", tz="America/New_York"))
+        self.assertEqual(closes, {1: 110.0, 2: 104.0, 3: 104.0})
+
+        # ก่อนวันศุกร์ปิด: รายการที่ session แรกเป็นวันหยุดต้องรอ ไม่ย้อนไปใช้ราคาปิดวันพุธ
+        closes = verify_bot.fetch_horizon_closes([holiday], pd.Timestamp("2024-03-08 12:00", tz="America/New_York"))
+        self.assertEqual(closes, {})
+        print("✅ [VerifyBot] วันครบ horizon ไม่ก่อน session ของคำทำนาย: ผ่าน")
+
+    def test_last_closed_session(self):
+        ny = "America/New_York"
+        self.assertEqual(verify_bot._last_closed_session(pd.Timestamp("2024-03-14 15:59", tz=ny)),
+                         pd.Timestamp("2024-03-13"))
+        self.assertEqual(verify_bot._last_closed_session(pd.Timestamp("2024-03-14 18:00", tz=ny)),
+                         pd.Timestamp("2024-03-14"))
+        print("✅ [VerifyBot] session ที่ปิดแล้วล่าสุด: ผ่าน")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=0)
@@ -0,0 +1,143 @@
+"""Cache ข้อมูลจาก API ภายนอกลง disk (SQLite ไฟล์เดียว) แบบมี TTL แยกตาม endpoint + จำกัดขนาดรวม
+ข้อมูลที่เปลี่ยนรายเดือน/รายวัน (FRED, analyst rating, SEC filings) ไม่ต้องดึงใหม่ทุกรอบสแกน 5 นาที
+และเพราะเก็บบน disk (mount volume ร่วมกันใน docker-compose) restart scheduler/webhook แล้ว cache ยังอุ่นอยู่
+
+ใช้งาน:
+    data = cache_get("fred", series_id)
+    cache_set("fred", series_id, data, ttl=86400)
+หรือครอบฟังก์ชันด้วย @cached("stocktwits_trending", ttl=300)
+ค่า None ไม่ถูก cache (ถือว่าดึงไม่สำเร็จ รอบหน้าต้องลองใหม่)"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+import functools
+
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "1") != "0"
+CACHE_PATH = os.getenv("CACHE_PATH", "cache/data_cache.sqlite3")
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# ตอน evict ลดให้เหลือสัดส่วนนี้ของ CACHE_MAX_BYTES (กันการ evict ทีละนิดทุกครั้งที่ set)
+EVICT_TARGET_RATIO = 0.9
+
+_conn = None
+_lock = threading.Lock()
+
+
+def _get_conn():
+    global _conn
+    if _conn is None:
+        directory = os.path.dirname(CACHE_PATH)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # scheduler และ webhook อาจเปิดไฟล์เดียวกันพร้อมกัน -> WAL ให้อ่าน/เขียนข้าม process ได้ไม่ล็อกกัน
+        _conn = sqlite3.connect(CACHE_PATH, check_same_thread=False, timeout=10)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+        """)
+        _conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_last_access ON cache (last_access)")
+        _conn.commit()
+    return _conn
+
+
+def cache_get(namespace, key):
+    """คืนค่าที่ cache ไว้ถ้ายังไม่หมดอายุ ไม่งั้นคืน None"""
+    if not CACHE_ENABLED:
+        return None
+    now = time.time()
+    try:
+        with _lock:
+            conn = _get_conn()
+            row = conn.execute(
+                "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?",
+                (namespace, str(key)),
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                conn.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (namespace, str(key)))
+                conn.commit()
+                return None
+            conn.execute("UPDATE cache SET last_access = ? WHERE namespace = ? AND key = ?",
+                         (now, namespace, str(key)))
+            conn.commit()
+        return json.loads(row[0])
+    except Exception as e:
+        print(f"⚠️ Cache Read Error ({namespace}): {e}")
+        return None
+
+
+def cache_set(namespace, key, value, ttl):
+    """เก็บค่า (ต้อง serialize เป็น JSON ได้) อายุ ttl วินาที แล้ว evict ตัวที่ไม่ได้ใช้นานสุดถ้าเกินขนาด"""
+    if not CACHE_ENABLED or value is None or ttl <= 0:
+        return
+    now = time.time()
+    try:
+        payload = json.dumps(value)
+        with _lock:
+            conn = _get_conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, size, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (namespace, str(key), payload, len(payload), now + ttl, now),
+            )
+            _evict(conn, now)
+            conn.commit()
+    except Exception as e:
+        print(f"⚠️ Cache Write Error ({namespace}): {e}")
+
+
+def _evict(conn, now):
+    conn.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+    if total <= CACHE_MAX_BYTES:
+        return
+
+    target = CACHE_MAX_BYTES * EVICT_TARGET_RATIO
+    rows = conn.execute("SELECT namespace, key, size FROM cache ORDER BY last_access ASC").fetchall()
+    victims = []
+    for namespace, key, size in rows:
+        if total <= target:
+            break
+        victims.append((namespace, key))
+        total -= size
+    conn.executemany("DELETE FROM cache WHERE namespace = ? AND key = ?", victims)
+
+
+def cache_clear(namespace=None):
+    """ล้าง cache ทั้งหมด หรือเฉพาะ namespace"""
+    with _lock:
+        conn = _get_conn()
+        if namespace is None:
+            conn.execute("DELETE FROM cache")
+        else:
+            conn.execute("DELETE FROM cache WHERE namespace = ?", (namespace,))
+        conn.commit()
+
+
+def cached(namespace, ttl):
+    """decorator: cache ผลลัพธ์ของฟังก์ชันตาม argument (ค่า None/ค่าว่างไม่ถูก cache)"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = json.dumps([args, sorted(kwargs.items())], default=str)
+            hit = cache_get(namespace, key)
+            if hit is not None:
+                return hit
+            result = fn(*args, **kwargs)
+            if result:
+                cache_set(namespace, key, result, ttl)
+            return result
+        return wrapper
+    return decorator
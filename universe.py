@@ -0,0 +1,125 @@
+"""Universe ของ screener แบบอยู่ยาวใน memory (ตัวเดียวต่อ process ใช้ร่วมกันทั้ง scanner และ /scan ของ webhook)
+- อ่าน watchlist_universe.txt ใหม่เฉพาะเมื่อ mtime ของไฟล์เปลี่ยน
+- trending จาก StockTwits เก็บไว้ TRENDING_TTL วินาที ไม่ยิงทุกรอบสแกน
+- จำว่าแต่ละ ticker เข้ามาเมื่อไหร่/จากไหน (watchlist หรือ trending) บันทึกลง UNIVERSE_STATE_PATH
+  ตัว trending ที่หลุดไปแล้ววนกลับมาจะยังถูกจำได้ — แท่งราคาใน bar_store ยังอยู่ จึงต่อเพิ่มแบบ incremental
+  แทนการโหลดประวัติใหม่ทั้งหมด (ticker ที่ไม่เคยเห็นจริงๆ เท่านั้นที่ต้อง backfill เต็ม)"""
+
+import os
+import json
+import time
+import threading
+from datetime import datetime, timezone
+
+from get_social_buzz import get_trending_symbols
+
+UNIVERSE_FILE = "watchlist_universe.txt"
+UNIVERSE_STATE_PATH = os.getenv("UNIVERSE_STATE_PATH", "cache/universe_state.json")
+TRENDING_TTL = int(os.getenv("UNIVERSE_TRENDING_TTL", "900"))
+
+
+class UniverseManager:
+    def __init__(self, path=UNIVERSE_FILE, trending_ttl=TRENDING_TTL, state_path=UNIVERSE_STATE_PATH):
+        self.path = path
+        self.trending_ttl = trending_ttl
+        self.state_path = state_path
+        self._watchlist = []
+        self._mtime = None
+        self._trending = []
+        self._trending_at = None
+        self._members = self._load_state()
+        self._lock = threading.Lock()
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_state(self):
+        directory = os.path.dirname(self.state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self._members, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.state_path)
+
+    def _refresh_watchlist(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            print(f"❌ ไม่พบไฟล์ {self.path}")
+            self._watchlist, self._mtime = [], None
+            return
+
+        if mtime == self._mtime:
+            return
+        with open(self.path, "r") as f:
+            self._watchlist = list(dict.fromkeys(
+                line.strip().upper() for line in f if line.strip() and not line.strip().startswith("#")))
+        self._mtime = mtime
+        print(f"📋 โหลด watchlist ใหม่ ({len(self._watchlist)} ตัว)")
+
+    def _refresh_trending(self):
+        if self._trending_at is not None and time.monotonic() - self._trending_at < self.trending_ttl:
+            return
+        trending = get_trending_symbols()
+        if trending:
+            self._trending = list(dict.fromkeys(t.upper() for t in trending))
+            print(f"📈 เพิ่ม {len(self._trending)} ตัวที่ trending จาก StockTwits เข้า universe")
+        # ดึงไม่ได้ก็ถือว่าลองแล้ว (ใช้ชุดเดิมต่อ) ไม่ยิงซ้ำทุกรอบตอน StockTwits ล่ม
+        self._trending_at = time.monotonic()
+
+    def _track(self, tickers, source):
+        now = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        changed = False
+        for ticker in tickers:
+            member = self._members.get(ticker)
+            if member is None:
+                self._members[ticker] = {"added_at": now, "source": source, "last_seen": now}
+                changed = True
+            else:
+                # trending ที่ภายหลังถูกใส่ใน watchlist นับเป็น watchlist (เหตุผลที่ยังอยู่ใน universe)
+                if source == "watchlist" and member["source"] != "watchlist":
+                    member["source"] = "watchlist"
+                    changed = True
+                if member.get("last_seen", "")[:10] != now[:10]:
+                    member["last_seen"] = now
+                    changed = True
+        return changed
+
+    def get(self, include_trending=True):
+        """universe ปัจจุบัน (watchlist ก่อน ตามด้วย trending ที่ไม่ซ้ำ)"""
+        with self._lock:
+            self._refresh_watchlist()
+            universe = list(self._watchlist)
+            changed = self._track(self._watchlist, "watchlist")
+            if include_trending:
+                self._refresh_trending()
+                universe = list(dict.fromkeys(universe + self._trending))
+                changed = self._track(self._trending, "trending") or changed
+            if changed:
+                try:
+                    self._save_state()
+                except OSError as e:
+                    print(f"⚠️ บันทึก universe state ไม่ได้: {e}")
+            return universe
+
+    def members(self):
+        """metadata ของทุก ticker ที่เคยอยู่ใน universe: dict ticker -> {"added_at", "source", "last_seen"}"""
+        with self._lock:
+            return {t: dict(m) for t, m in self._members.items()}
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_universe_manager():
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = UniverseManager()
+        return _manager
@@ -1,9 +1,139 @@
 # verify_bot.py
-import requests
-from services import send_line_push, get_current_price, ALPHA_VANTAGE_API_KEY
-from db_handler import get_due_predictions, update_verification, get_accuracy_stats
+import os
+import time
+from datetime import timedelta
 
-def run_verification():
+import numpy as np
+import pandas as pd
+
+from services import send_line_push, get_quotes
+from db_handler import get_due_predictions, update_verification, update_verifications, get_accuracy_stats
+from bar_store import MARKET_TZ, REGULAR_CLOSE, download, ticker_frame
+
+# โหมด bulk: ดึงประวัติทุก symbol ครั้งเดียว ใช้ราคาปิดของ session ที่ครบ horizon จริง อัปเดต DB ครั้งเดียว
+# false = ตรวจทีละรายการด้วยราคาปัจจุบัน (แบบเดิม)
+VERIFY_BULK = os.getenv("VERIFY_BULK", "true").lower() != "false"
+NEUTRAL_BAND_PCT = 0.5          # ต้องขึ้น/ลง เกินนี้ถึงจะนับว่าเป็นเทรนด์ (กรอง Noise)
+MAX_STALE_DAYS = 5              # แท่งล่าสุดก่อนวันครบ horizon เก่ากว่านี้ = ไม่มีข้อมูล (ถูก halt/delist) ข้ามไปก่อน
+SUMMARY_MAX_LINES = 20          # รายการที่แสดงใน LINE สรุป (ที่เหลือบอกแค่จำนวน)
+
+
+def classify(start_price, end_price):
+    """คืน (% เปลี่ยนแปลง, ทิศทางจริง UP/DOWN/NEUTRAL)"""
+    percent_change = ((end_price - start_price) / start_price) * 100
+    if percent_change > NEUTRAL_BAND_PCT:
+        return percent_change, "UP"
+    if percent_change < -NEUTRAL_BAND_PCT:
+        return percent_change, "DOWN"
+    return percent_change, "NEUTRAL"  # ถือว่าราคานิ่งๆ
+
+
+def _ny_time(ts):
+    ts = pd.Timestamp(ts)
+    ts = ts.tz_localize("UTC") if ts.tzinfo is None else ts
+    return ts.tz_convert(MARKET_TZ)
+
+
+def first_session(item):
+    """session แรกที่ปิดหลัง created_at (สร้างหลัง 16:00 NY หรือวันเสาร์/อาทิตย์ = วันทำการถัดไป)"""
+    created = _ny_time(item['created_at'])
+    day = created.tz_localize(None).normalize()
+    if created.time() >= REGULAR_CLOSE:
+        day += pd.Timedelta(days=1)
+    return pd.offsets.BDay().rollforward(day)
+
+
+def horizon_session(item):
+    """วันที่ (เวลา New York) ที่ครบ created_at + time_horizon_days ของคำทำนาย
+    ไม่ก่อน first_session — เช่น ทายวันศุกร์หลังตลาดปิด horizon 1 วัน (= เสาร์) ต้องใช้ราคาปิดวันจันทร์
+    ไม่ใช่ราคาปิดวันศุกร์ที่เกิดก่อนคำทำนาย"""
+    end = _ny_time(item['created_at'] + timedelta(days=item.get('time_horizon_days') or 1))
+    return max(end.tz_localize(None).normalize(), first_session(item))
+
+
+def _last_closed_session(now=None):
+    """วันล่าสุดที่ตลาดปิดไปแล้ว (ก่อน 16:00 NY ของวันนี้ = เมื่อวาน)"""
+    now = pd.Timestamp.now(tz=MARKET_TZ) if now is None else pd.Timestamp(now).tz_convert(MARKET_TZ)
+    today = now.tz_localize(None).normalize()
+    return today if now.time() >= REGULAR_CLOSE else today - pd.Timedelta(days=1)
+
+
+def fetch_horizon_closes(items, now=None):
+    """ราคาปิดของ session ที่ครบ horizon ของทุกรายการ (วันหยุด = session ก่อนหน้า) จาก yf.download daily ครั้งเดียว
+    รายการที่ session นั้นยังไม่ปิดหรือไม่มีข้อมูลจะไม่อยู่ในผล คืน dict id -> ราคาปิด"""
+    sessions = {item['id']: horizon_session(item) for item in items}
+    firsts = {item['id']: first_session(item) for item in items}
+    last_closed = _last_closed_session(now)
+    ready = [item for item in items if sessions[item['id']] <= last_closed]
+    if not ready:
+        return {}
+    symbols = sorted({item['symbol'].upper() for item in ready})
+    start = min(sessions[item['id']] for item in ready) - pd.Timedelta(days=MAX_STALE_DAYS + 2)
+    try:
+        data = download(symbols, "1d", False, start=start.strftime("%Y-%m-%d"))
+    except Exception as e:
+        print(f"❌ Verification download error: {e}")
+        return {}
+
+    by_symbol = {}
+    for item in ready:
+        by_symbol.setdefault(item['symbol'].upper(), []).append(item['id'])
+
+    closes = {}
+    for symbol, ids in by_symbol.items():
+        df = ticker_frame(data, symbol)
+        if df is None:
+            continue
+        series = df["Close"].dropna()
+        days = series.index.tz_localize(None) if series.index.tz is not None else series.index
+        days = days.normalize().to_numpy()
+        targets = np.array([sessions[i] for i in ids], dtype="datetime64[ns]")
+        earliest = np.array([firsts[i] for i in ids], dtype="datetime64[ns]")
+        pos = np.searchsorted(days, targets, side="right") - 1
+        for item_id, target, first, p in zip(ids, targets, earliest, pos):
+            if p >= 0 and days[p] < first:
+                # session แรกหลังคำทำนายเป็นวันหยุด -> ใช้ session ถัดไปที่ปิดแล้ว (ยังไม่มีก็รอรอบหน้า)
+                p = np.searchsorted(days, first)
+                if p == len(days) or days[p] > np.datetime64(last_closed):
+                    continue
+            if p >= 0 and target - days[p] <= np.timedelta64(MAX_STALE_DAYS, "D"):
+                closes[item_id] = float(series.iloc[p])
+    return closes
+
+
+def run_bulk_verification(pending_list, now=None):
+    """ตรวจทุกรายการที่ครบกำหนดในรอบเดียว: download ครั้งเดียว, UPDATE ครั้งเดียว, LINE สรุปครั้งเดียว"""
+    started = time.perf_counter()
+    closes = fetch_horizon_closes(pending_list, now)
+
+    results, lines = [], []
+    for item in pending_list:
+        end_price = closes.get(item['id'])
+        start_price = float(item['start_price'] or 0)
+        if end_price is None or start_price <= 0:
+            continue
+        percent_change, actual_direction = classify(start_price, end_price)
+        is_correct = (item['predicted_direction'] == actual_direction)
+        results.append((item['id'], end_price, is_correct))
+        lines.append(f"{'✅' if is_correct else '❌'} {item['symbol']}: ${start_price:g} -> ${end_price:.2f} "
+                     f"({percent_change:+.2f}%) ทาย {item['predicted_direction']} | จริง {actual_direction}")
+
+    skipped = len(pending_list) - len(results)
+    if results:
+        update_verifications(results)
+        correct = sum(1 for _, _, ok in results if ok)
+        msg = f"📝 ผลการเรียนรู้ AI: ตรวจ {len(results)} รายการ ถูก {correct} ({correct / len(results) * 100:.0f}%)\n"
+        msg += "\n".join(lines[:SUMMARY_MAX_LINES])
+        if len(lines) > SUMMARY_MAX_LINES:
+            msg += f"\n… และอีก {len(lines) - SUMMARY_MAX_LINES} รายการ"
+        send_line_push(msg)
+    print(f"🕵️ Bulk verification: ตรวจ {len(results)} | รอข้อมูล/ข้าม {skipped} | "
+          f"{time.perf_counter() - started:.1f}s")
+    return results
+
+
+def run_verification(bulk=None):
+    bulk = VERIFY_BULK if bulk is None else bulk
     print("🕵️‍♂️ เริ่มตรวจสอบผลการทำนายของ AI (เฉพาะที่ครบ time_horizon_days แล้ว)...")
 
     pending_list = get_due_predictions()
@@ -12,60 +142,54 @@ def run_verification():
         print("✅ ไม่มีรายการที่ครบกรอบเวลาให้ตรวจตอนนี้")
         return
 
-    verified_count = 0
-    
+    if bulk:
+        run_bulk_verification(pending_list)
+    else:
+        _run_verification_one_by_one(pending_list)
+
+    # 5. สรุปภาพรวม
+    total, correct = get_accuracy_stats()
+    if total > 0:
+        accuracy = (correct / total) * 100
+        print(f"📊 ความแม่นยำสะสม: {accuracy:.2f}% ({correct}/{total})")
+
+
+def _run_verification_one_by_one(pending_list):
+    # ราคาปัจจุบันของทุก symbol ที่ครบกำหนดดึงครั้งเดียว (batch)
+    prices = get_quotes([item['symbol'] for item in pending_list])
+
     for item in pending_list:
         ticker = item['symbol']
-        start_price = item['start_price']
+        start_price = float(item['start_price'] or 0)
         predicted = item['predicted_direction']
-        
+
         # 1. เช็คราคาปัจจุบัน (End Price)
-        end_price = get_current_price(ticker)
-        
-        if end_price == 0:
+        end_price = prices.get(ticker.upper(), 0.0)
+
+        if end_price == 0 or start_price <= 0:
             print(f"⚠️ ดึงราคา {ticker} ไม่ได้ ข้ามไปก่อน")
             continue
-        
-
-        # 2. ตรวจคำตอบ (Logic ง่ายๆ)
-
-        # คำนวณ % การเปลี่ยนแปลง
-        percent_change = ((end_price - start_price) / start_price) * 100
-
-        actual_direction = "NEUTRAL"
-        
-        # ต้องขึ้น/ลง เกิน 0.5% ถึงจะนับว่าเป็นเทรนด์ (กรอง Noise)
-        if percent_change > 0.5:
-            actual_direction = "UP"
-        elif percent_change < -0.5:
-            actual_direction = "DOWN"
-        else:
-            actual_direction = "NEUTRAL" # ถือว่าราคานิ่งๆ
-            
+
+        # 2. ตรวจคำตอบ
+        _, actual_direction = classify(start_price, end_price)
+
         # AI ทายถูกไหม?
         is_correct = (predicted == actual_direction)
-        
+
         # 3. อัปเดตลง DB
         update_verification(item['id'], end_price, is_correct)
-        
+
         # 4. (Optional) แจ้งเตือนถ้ารู้ผลแล้ว
         status_icon = "✅ แม่นยำ!" if is_correct else "❌ ผิดพลาด"
         print(f"ผล {ticker}: ทาย {predicted} -> ออก {actual_direction} ({status_icon})")
-        
+
         # ส่งรายงานสรุปเข้า LINE (เฉพาะรายการที่เพิ่งตรวจเสร็จ)
         msg = f"📝 ผลการเรียนรู้ AI ({ticker})\n"
         msg += f"ตอนทาย: ${start_price} -> ตอนนี้: ${end_price}\n"
         msg += f"ทายว่า: {predicted} | ผลจริง: {actual_direction}\n"
         msg += f"สรุป: {status_icon}"
         send_line_push(msg)
-        
-        verified_count += 1
 
-    # 5. สรุปภาพรวม
-    total, correct = get_accuracy_stats()
-    if total > 0:
-        accuracy = (correct / total) * 100
-        print(f"📊 ความแม่นยำสะสม: {accuracy:.2f}% ({correct}/{total})")
 
 if __name__ == "__main__":
-    run_verification()
\ No newline at end of file
+    run_verification()